@@ -0,0 +1,165 @@
+"""
+Read-only JSON API served by asyncio, for clients that keep many searches in flight at once
+(autocomplete, list pages, record data). It runs next to the Flask application:
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Each request awaits its query on a shared asyncio engine instead of holding a worker for its duration.
+Statements and models are shared with main.py (helper/db/queries.py, helper/db/initialise_database.py).
+Requires the `starlette`, `uvicorn` and `asyncpg` packages.
+"""
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from helper import (LIST_PAGE_SIZE, DB_POOL_MODE, DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+                    DB_POOL_RECYCLE, DB_POOL_PRE_PING)
+from helper.db.initialise_database import DATABASE_URL, Person, Region, PersonRegion
+from helper.db.geography import region_key
+from helper.db.pagination import encode_cursor
+from helper.db.pool import create_async_pooled_engine
+from helper.db.queries import (OBJECT_MODELS, fulltext_statement, content_statement, person_search_statement,
+                               name_search_statement, list_statement, search_result, view_statement,
+                               localized_display_columns)
+
+
+async_engine = create_async_pooled_engine(DATABASE_URL, mode=DB_POOL_MODE, size=DB_POOL_SIZE,
+                                          max_overflow=DB_POOL_MAX_OVERFLOW, timeout=DB_POOL_TIMEOUT,
+                                          recycle=DB_POOL_RECYCLE, pre_ping=DB_POOL_PRE_PING)
+async_session = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def use_english(request):
+    return request.query_params.get('lang') == 'en'
+
+
+async def fetch_all(stmt):
+    async with async_session() as session:
+        return (await session.execute(stmt)).all()
+
+
+async def search(request):
+    """
+    Asynchronous counterpart of the JSON branches of /search.
+
+    Query Parameters:
+    - fulltext (str): Ranked full-text search, results carry a highlighted snippet.
+    - content (str): Bibliography substring search.
+    - type (str): 'person' (fullName, or firstName/lastName/patronymic; birthYear, fuzzy),
+      'org', 'doc' or 'field_of_study' (name).
+    - lang (str): 'en' to match and return the English person names.
+
+    Returns:
+    - JSON list of [type, id, display name] (plus the snippet for full-text search).
+    - 400 if birthYear is not a number, 404 if the parameters match no search.
+    """
+    args = request.query_params
+    use_en = use_english(request)
+    if args.get('fulltext'):
+        rows = await fetch_all(fulltext_statement(args.get('fulltext'), use_en))
+        return JSONResponse([search_result('person', row) + [' '.join(row[2].split())] for row in rows])
+    if args.get('content'):
+        rows = await fetch_all(content_statement(args.get('content')))
+        return JSONResponse([search_result('person', row) for row in rows])
+    obj_type = args.get('type')
+    if obj_type == 'person':
+        try:
+            stmt = person_search_statement(args, use_en)
+        except ValueError:
+            raise HTTPException(400, 'birthYear must be a number')
+        rows = await fetch_all(stmt)
+        return JSONResponse([search_result('person', row) for row in rows])
+    if obj_type in ('org', 'doc', 'field_of_study'):
+        rows = await fetch_all(name_search_statement(obj_type, args.get('name')))
+        return JSONResponse([search_result(obj_type, row) for row in rows])
+    raise HTTPException(404)
+
+
+async def list_view(request):
+    """
+    Asynchronous counterpart of /list?format=json.
+
+    Query Parameters:
+    - type (str): 'org', 'person', 'doc' or 'field_of_study'.
+    - sort (str): Field to sort by (default: display name).
+    - after (str): Cursor of the previous page.
+    - limit (int): Page size, capped at and defaulting to LIST_PAGE_SIZE.
+
+    Returns:
+    - JSON {"results": [[type, id, display name], ...], "next": cursor or null}.
+    - 404 if the type, sort, limit or cursor is invalid.
+    """
+    args = request.query_params
+    obj_type = args.get('type')
+    try:
+        limit = int(args.get('limit', LIST_PAGE_SIZE))
+        stmt, column_count, limit = list_statement(obj_type, args.get('sort'), args.get('after'), limit)
+    except (ValueError, LookupError):
+        raise HTTPException(404)
+    rows = await fetch_all(stmt)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(list(rows[-1][column_count:]))
+    return JSONResponse({'results': [search_result(obj_type, row) for row in rows], 'next': next_cursor})
+
+
+async def view(request):
+    """
+    Asynchronous counterpart of the data shown by /view.
+
+    Query Parameters:
+    - type (str): 'org', 'person', 'doc', 'field_of_study' or 'geography'.
+    - id (int or str): Object ID, or the region name for geography.
+    - lang (str): 'en' for the English labels.
+
+    Returns:
+    - JSON {"type": ..., "id": ..., "data": {label: value}}, the same values the page renders.
+    - 404 if the type is unknown or the object does not exist.
+    """
+    obj_type = request.query_params.get('type')
+    obj_id = request.query_params.get('id')
+    use_en = use_english(request)
+    if not obj_id:
+        raise HTTPException(404)
+    if obj_type == 'geography':
+        display_col, sort_col = localized_display_columns(use_en)
+        stmt = (select(Person.id, display_col).join(PersonRegion, PersonRegion.person_id == Person.id)
+                .order_by(sort_col, Person.id))
+        async with async_session() as session:
+            region_stmt = select(Region).where(Region.key == region_key(obj_id))
+            region = (await session.execute(region_stmt)).scalar_one_or_none()
+            if region is None:
+                raise HTTPException(404)
+            rows = (await session.execute(stmt.where(PersonRegion.region_id == region.id))).all()
+        persons = [search_result('person', row) for row in rows]
+        if use_en:
+            data = {'Geographic region': region.name, 'Related researchers': persons}
+        else:
+            data = {'Географический регион': region.name, 'Связанные исследователи': persons}
+        return JSONResponse({'type': obj_type, 'id': region.name, 'data': data})
+    if obj_type not in OBJECT_MODELS or not obj_id.isdigit():
+        raise HTTPException(404)
+    async with async_session() as session:
+        # Every relationship is loaded eagerly, so building the values needs no further IO
+        obj = (await session.execute(view_statement(obj_type, int(obj_id)))).scalar_one_or_none()
+        if obj is None:
+            raise HTTPException(404)
+        data = obj.values_en() if use_en else obj.values_ru()
+    return JSONResponse({'type': obj_type, 'id': int(obj_id), 'data': data})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await async_engine.dispose()
+
+
+app = Starlette(routes=[
+    Route('/api/search', search),
+    Route('/api/list', list_view),
+    Route('/api/view', view),
+], lifespan=lifespan)
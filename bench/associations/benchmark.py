@@ -0,0 +1,135 @@
+"""
+Benchmark of the association tables with and without their indexes and unique constraints.
+
+Two operations are measured:
+- view: loading the record with the most links of every type with its view options, as /view does;
+- delete: deleting a record with its links, as /delete does.
+
+The association tables of the configured database (fill it with bench.corpus.generate) are first
+padded with random synthetic links. Then the operations are timed twice: with the indexes and unique
+constraints, and after they have been dropped. Everything runs in one transaction that is rolled back,
+so the database is left as it was. The tables stay locked until then, so do not run this against a
+database that is in use.
+
+Run from the project directory:
+    python -m bench.associations.benchmark [--links 1000000] [--repeat 5]
+"""
+import argparse
+from sqlalchemy import func, inspect, select
+from sqlalchemy.orm import Session
+from bench.suite import measure
+from helper.db.connections import ASSOCIATIONS, delete_connections, linked_records
+from helper.db.geography import sync_person_regions
+from helper.db.initialise_database import (get_engine, OrganizationMembership, PersonEducation,
+                                           DocumentAuthorship, PersonFieldOfStudy)
+from helper.db.queries import OBJECT_MODELS
+
+
+# Association models, the column holding the ID of the record linked to the person and its table
+TABLES = (
+    (OrganizationMembership, OrganizationMembership.organization_id, 'organization'),
+    (PersonEducation, PersonEducation.organization_id, 'organization'),
+    (DocumentAuthorship, DocumentAuthorship.document_id, 'document'),
+    (PersonFieldOfStudy, PersonFieldOfStudy.field_of_study_id, 'field_of_study'),
+)
+
+
+def pad_links(connection, links):
+    """
+    Adds `links` random links, spread evenly over the association tables. Pairs already linked are skipped.
+    """
+    for model, other_column, other_table in TABLES:
+        table = model.__tablename__
+        result = connection.exec_driver_sql(
+            f'WITH persons AS (SELECT array_agg(id) AS ids FROM person), '
+            f'others AS (SELECT array_agg(id) AS ids FROM {other_table}) '
+            f'INSERT INTO {table} (person_id, {other_column.key}) '
+            f'SELECT persons.ids[1 + floor(random() * cardinality(persons.ids))::int], '
+            f'others.ids[1 + floor(random() * cardinality(others.ids))::int] '
+            f'FROM persons, others, generate_series(1, %(count)s) ON CONFLICT DO NOTHING',
+            {'count': links // len(TABLES)})
+        connection.exec_driver_sql(f'ANALYZE {table}')
+        total = connection.execute(select(func.count()).select_from(model)).scalar_one()
+        print(f'{table}: {result.rowcount} links added, {total} in total')
+
+
+def drop_indexes(connection):
+    """Drops the indexes and unique constraints of the association tables, their primary keys excepted."""
+    inspector = inspect(connection)
+    for model, _, _ in TABLES:
+        table = model.__tablename__
+        for constraint in inspector.get_unique_constraints(table):
+            connection.exec_driver_sql(f'ALTER TABLE {table} DROP CONSTRAINT {constraint["name"]}')
+        for index in inspector.get_indexes(table):
+            if not index.get('duplicates_constraint'):
+                connection.exec_driver_sql(f'DROP INDEX {index["name"]}')
+        connection.exec_driver_sql(f'ANALYZE {table}')
+
+
+def most_linked(connection, obj_type):
+    """Returns the ID of the record of a type with the most links, whose view page is the slowest to load."""
+    counts = [select(own_column.label('id')) for _, own_column, _, _ in ASSOCIATIONS[obj_type]]
+    links = counts[0].union_all(*counts[1:]).subquery()
+    return connection.execute(select(links.c.id).group_by(links.c.id)
+                              .order_by(func.count().desc()).limit(1)).scalar_one()
+
+
+def benchmarks(connection, targets):
+    def view(obj_type, obj_id):
+        model = OBJECT_MODELS[obj_type]
+
+        def load():
+            with Session(bind=connection, join_transaction_mode='create_savepoint') as session:
+                record = session.execute(select(model).where(model.id == obj_id)
+                                         .options(*model.view_options())).scalar_one()
+                record.values_ru()
+        return load
+
+    def delete(obj_type, obj_id):
+        model = OBJECT_MODELS[obj_type]
+
+        # What /delete does; the savepoint of the session is rolled back when it closes
+        def remove():
+            with Session(bind=connection, join_transaction_mode='create_savepoint') as session:
+                record = session.get(model, obj_id)
+                linked_records(session, obj_type, obj_id)
+                delete_connections(session, obj_type, obj_id)
+                if obj_type == 'person':
+                    sync_person_regions(session, obj_id, None)
+                session.delete(record)
+                session.flush()
+        return remove
+
+    results = {}
+    for obj_type, obj_id in targets.items():
+        results[f'view {obj_type} {obj_id}'] = view(obj_type, obj_id)
+    for obj_type in ('person', 'org', 'doc'):
+        results[f'delete {obj_type} {targets[obj_type]}'] = delete(obj_type, targets[obj_type])
+    return results
+
+
+def run(links, repeat):
+    engine = get_engine()
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            pad_links(connection, links)
+            targets = {obj_type: most_linked(connection, obj_type) for obj_type in ASSOCIATIONS}
+            indexed = {name: measure(function, repeat) for name, function in benchmarks(connection, targets).items()}
+            drop_indexes(connection)
+            plain = {name: measure(function, repeat) for name, function in benchmarks(connection, targets).items()}
+        finally:
+            transaction.rollback()
+    print(f'\n{"benchmark":<32} {"no indexes":>12} {"indexes":>12} {"speedup":>8}')
+    for name, result in indexed.items():
+        before, after = plain[name]['median_ms'], result['median_ms']
+        print(f'{name:<32} {before:>10.2f}ms {after:>10.2f}ms {before / after:>7.1f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--links', type=int, default=1_000_000,
+                        help='synthetic links added over the association tables (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per benchmark (default: %(default)s)')
+    args = parser.parse_args()
+    run(args.links, args.repeat)
@@ -0,0 +1,213 @@
+"""
+Synthetic corpus generator: fills the configured database (DATABASE_* settings) with realistic
+persons, organizations, documents and fields of study, so performance can be measured without
+the private data.zip.
+
+Persons get Russian names with transliterations, life dates, regions and Word-style HTML
+biographies; the association tables are dense (several documents, organizations and fields per
+person). Rows are loaded with COPY; most of the loading time is PostgreSQL computing the full-text
+search vector of each person (about 2 ms per person), so a million persons take about half an hour.
+The same --persons and --seed always produce the same data.
+
+All existing records are deleted. Run from the project directory:
+    python -m bench.corpus.generate --persons 10000 [--seed 0] [--yes]
+"""
+import argparse
+import csv
+import io
+import random
+import time
+from datetime import datetime, timedelta
+from transliterate import get_translit_function
+from helper import MULTIPLE_CHOICE_FIELDS
+from helper.db.initialise_database import get_engine
+from helper.db.geography import rebuild_regions
+
+
+translit_ru = get_translit_function('ru')
+
+SURNAMES = ['Иванов', 'Петров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Соколов', 'Михайлов', 'Новиков',
+            'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов', 'Егоров', 'Павлов', 'Козлов',
+            'Степанов', 'Николаев', 'Орлов', 'Андреев', 'Макаров', 'Никитин', 'Захаров', 'Зайцев', 'Соловьёв',
+            'Борисов', 'Яковлев', 'Григорьев', 'Романов', 'Воробьёв', 'Сергеев', 'Кузьмин', 'Фролов',
+            'Александров', 'Дмитриев', 'Королёв', 'Гусев', 'Киселёв', 'Ильин', 'Максимов', 'Поляков', 'Сорокин',
+            'Виноградов', 'Ковалёв', 'Белов', 'Медведев', 'Антонов', 'Тарасов', 'Жуков', 'Баранов', 'Филиппов',
+            'Комаров', 'Давыдов', 'Беляев', 'Герасимов', 'Богданов', 'Осипов', 'Сидоров', 'Матвеев', 'Титов',
+            'Марков', 'Миронов', 'Крылов', 'Куликов', 'Карпов', 'Власов', 'Мельников', 'Денисов', 'Гаврилов',
+            'Тихонов', 'Казаков', 'Афанасьев', 'Данилов', 'Савельев', 'Тимофеев', 'Фомин', 'Чернов', 'Абрамов',
+            'Вернадский', 'Карпинский', 'Ферсман', 'Обручев', 'Архангельский', 'Мушкетов', 'Чернышёв', 'Павлов']
+FIRST_NAMES = ['Александр', 'Алексей', 'Андрей', 'Борис', 'Василий', 'Виктор', 'Владимир', 'Георгий', 'Дмитрий',
+               'Евгений', 'Иван', 'Игорь', 'Константин', 'Леонид', 'Михаил', 'Николай', 'Павел', 'Пётр', 'Сергей',
+               'Юрий', 'Анна', 'Вера', 'Екатерина', 'Елена', 'Мария', 'Наталья', 'Ольга', 'Татьяна']
+PATRONYMICS = ['Александрович', 'Алексеевич', 'Андреевич', 'Борисович', 'Васильевич', 'Викторович',
+               'Владимирович', 'Георгиевич', 'Дмитриевич', 'Иванович', 'Михайлович', 'Николаевич', 'Павлович',
+               'Петрович', 'Сергеевич', 'Юрьевич', None]
+REGIONS = ['Урал', 'Кавказ', 'Крым', 'Кольский полуостров', 'Алтай', 'Саяны', 'Забайкалье', 'Якутия', 'Чукотка',
+           'Камчатка', 'Сахалин', 'Приморье', 'Таймыр', 'Тиман', 'Донбасс', 'Подмосковье', 'Карелия', 'Памир',
+           'Тянь-Шань', 'Казахстан', 'Монголия', 'Прибайкалье', 'Кузбасс', 'Западная Сибирь', 'Восточная Сибирь',
+           'Новая Земля', 'Шпицберген', 'Антарктида', 'Поволжье', 'Печора', 'Енисейский кряж', 'Анабарский массив']
+CITIES = ['Москва', 'Санкт-Петербург', 'Казань', 'Екатеринбург', 'Новосибирск', 'Иркутск', 'Томск', 'Пермь',
+          'Киев', 'Тбилиси', 'Ташкент', 'Владивосток', 'Апатиты', 'Уфа', 'Саратов', 'Воронеж']
+FIELDS_OF_STUDY = ['Геология', 'Минералогия', 'Петрография', 'Палеонтология', 'Стратиграфия', 'Тектоника',
+                   'Геохимия', 'Геофизика', 'Гидрогеология', 'Инженерная геология', 'Вулканология',
+                   'Кристаллография', 'Литология', 'Металлогения', 'Геоморфология', 'Сейсмология',
+                   'Горное дело', 'Маркшейдерия', 'Рудные месторождения', 'Нефтяная геология',
+                   'Угольная геология', 'Четвертичная геология', 'Региональная геология', 'Геохронология',
+                   'Палеогеография', 'Океанология', 'Мерзлотоведение', 'История геологии', 'Геологическая съёмка',
+                   'Метеоритика', 'Геокриология', 'Космическая геология']
+ORG_KINDS = ['Институт', 'Музей', 'Общество', 'Университет', 'Комитет', 'Академия', 'Экспедиция', 'Трест']
+DOC_TYPES = ['Статья', 'Монография', 'Рукопись', 'Письмо', 'Отчёт', 'Учебник']
+LANGUAGES = ['русский', 'русский', 'русский', 'английский', 'немецкий', 'французский']
+WORDS = ('геологический исследование месторождение экспедиция разрез толща порода минерал кристалл район '
+         'хребет свита отложения изучение описание открытие работа кафедра институт профессор академик '
+         'съёмка карта рудник шахта нефть уголь золото медь железо известняк гранит сланец песчаник '
+         'палеозой мезозой кембрий девон юра мел четвертичный тектонический складчатый магматический '
+         'научный первый новый крупный важный полевой региональный опубликовал руководил участвовал '
+         'организовал возглавил окончил защитил избран награждён').split()
+
+# Biographies are assembled from a fixed pool of sentences, which keeps generation fast at large scales
+SENTENCE_POOL_SIZE = 4000
+
+
+def sentence(rnd):
+    words = rnd.choices(WORDS, k=rnd.randint(8, 24))
+    if rnd.random() < 0.3:
+        index = rnd.randrange(len(words))
+        words[index] = rnd.choice(('<i>', '<b>')) + words[index] + rnd.choice(('</i>', '</b>'))
+    return ' '.join(words).capitalize() + '.'
+
+
+def biography_html(rnd, sentences):
+    """A biography in the cleaned Word-export markup the site stores."""
+    paragraphs = [' '.join(rnd.choices(sentences, k=rnd.randint(2, 6))) for _ in range(rnd.randint(2, 8))]
+    return '\n'.join(f'<p class=GIN>{paragraph}</p>' for paragraph in paragraphs)
+
+
+def bibliography_html(rnd, sentences):
+    works = [f'{rnd.randint(1850, 2020)}. {rnd.choice(sentences)} // {rnd.choice(CITIES)}, '
+             f'{rnd.randint(5, 400)} с.' for _ in range(rnd.randint(1, 12))]
+    return '\n'.join(f'<p class=GIN>{work}</p>' for work in works)
+
+
+def life_dates(rnd):
+    birth = datetime(1700, 1, 1) + timedelta(days=rnd.randrange(290 * 365))
+    death = birth + timedelta(days=rnd.randrange(30 * 365, 95 * 365))
+    return birth, (death if death < datetime(2024, 1, 1) else None)
+
+
+def person_rows(rnd, count):
+    sentences = [sentence(rnd) for _ in range(SENTENCE_POOL_SIZE)]
+    degrees = [degree for degree in MULTIPLE_CHOICE_FIELDS['academic_degree'] if degree]
+    for _ in range(count):
+        surname, name, patronymic = rnd.choice(SURNAMES), rnd.choice(FIRST_NAMES), rnd.choice(PATRONYMICS)
+        if name[-1] in 'аяь' and patronymic:
+            patronymic = patronymic[:-2] + 'на'
+        birth, death = life_dates(rnd)
+        biography = biography_html(rnd, sentences)
+        if death and rnd.random() < 0.1:
+            biography += f'\n<p class=GIN>Дата смерти: {death:%d.%m.%Y}</p>'
+        yield (surname, name, patronymic,
+               translit_ru(name, reversed=True), translit_ru(surname, reversed=True),
+               translit_ru(patronymic, reversed=True) if patronymic else None,
+               birth, death, rnd.choice(CITIES), rnd.choice(CITIES) if death else None,
+               rnd.choice(degrees) if rnd.random() < 0.15 else None,
+               ', '.join(rnd.sample(REGIONS, rnd.randint(1, 3))),
+               biography, bibliography_html(rnd, sentences),
+               None, rnd.choice(sentences) if rnd.random() < 0.2 else None)
+
+
+def organization_rows(rnd, count):
+    org_types = [org_type for org_type in MULTIPLE_CHOICE_FIELDS['org_type'] if org_type]
+    for number in range(count):
+        name = f'{rnd.choice(ORG_KINDS)} {rnd.choice(FIELDS_OF_STUDY).lower()} ({rnd.choice(CITIES)}) {number}'
+        yield name, rnd.choice(org_types), sentence(rnd), None
+
+
+def document_rows(rnd, count):
+    for _ in range(count):
+        yield (sentence(rnd).rstrip('.'), rnd.choice(DOC_TYPES), rnd.choice(LANGUAGES),
+               f'{rnd.choice(CITIES)}: {rnd.choice(WORDS).capitalize()}', str(rnd.randint(1750, 2023)), None, None)
+
+
+def association_rows(rnd, owner_count, other_count, low, high):
+    for owner in range(1, owner_count + 1):
+        for other in rnd.sample(range(1, other_count + 1), min(other_count, rnd.randint(low, high))):
+            yield owner, other
+
+
+def copy_rows(cursor, table, columns, rows, batch_size=20000):
+    """Loads rows with COPY in batches, returning the number of rows loaded."""
+    started = time.perf_counter()
+    total = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['' if value is None else value for value in row])
+        total += 1
+        if total % batch_size == 0:
+            _flush(cursor, table, columns, buffer)
+    _flush(cursor, table, columns, buffer)
+    print(f'{table}: {total} rows in {time.perf_counter() - started:.1f}s')
+    return total
+
+
+def _flush(cursor, table, columns, buffer):
+    # Empty unquoted fields are NULL in COPY csv, which is what None is written as
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    buffer.seek(0)
+    buffer.truncate()
+
+
+def generate(persons, seed=0):
+    """
+    Replaces every record in the database with a synthetic corpus.
+    Args:
+        persons (int): Number of persons; the other tables scale with it.
+        seed (int): Seed of the random generator.
+    """
+    rnd = random.Random(seed)
+    organizations = max(20, persons // 20)
+    documents = persons * 2
+    engine = get_engine()
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute('TRUNCATE person, organization, document, field_of_study, organization_membership, '
+                       'person_education, document_authorship, person_field_of_study, region, person_region '
+                       'RESTART IDENTITY CASCADE')
+        copy_rows(cursor, 'field_of_study', ['name'], ((name,) for name in FIELDS_OF_STUDY))
+        copy_rows(cursor, 'person', ['surname', 'name', 'patronymic', 'name_en', 'surname_en', 'patronymic_en',
+                                     'birth_date', 'death_date', 'birth_place', 'death_place', 'academic_degree',
+                                     'area_of_study', 'biography', 'bibliography', 'photo', 'comment'],
+                  person_rows(rnd, persons))
+        copy_rows(cursor, 'organization', ['name', 'org_type', 'history', 'comment'],
+                  organization_rows(rnd, organizations))
+        copy_rows(cursor, 'document', ['name', 'doc_type', 'language', 'source', 'year', 'file', 'comment'],
+                  document_rows(rnd, documents))
+        copy_rows(cursor, 'document_authorship', ['document_id', 'person_id'],
+                  association_rows(rnd, documents, persons, 1, 3))
+        copy_rows(cursor, 'organization_membership', ['person_id', 'organization_id'],
+                  association_rows(rnd, persons, organizations, 1, 3))
+        copy_rows(cursor, 'person_education', ['person_id', 'organization_id'],
+                  association_rows(rnd, persons, organizations, 0, 2))
+        copy_rows(cursor, 'person_field_of_study', ['person_id', 'field_of_study_id'],
+                  association_rows(rnd, persons, len(FIELDS_OF_STUDY), 1, 3))
+        connection.commit()
+    finally:
+        connection.close()
+    with engine.begin() as sa_connection:
+        rebuild_regions(sa_connection)
+        sa_connection.exec_driver_sql('ANALYZE')
+    print('regions rebuilt, tables analyzed')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--persons', type=int, default=10_000, help='number of persons (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: %(default)s)')
+    parser.add_argument('--yes', action='store_true', help='do not ask before deleting the existing records')
+    args = parser.parse_args()
+    if not args.yes:
+        assert input('this deletes every record in the database, proceed? (y/n) ') == 'y'
+    generate(args.persons, args.seed)
@@ -0,0 +1,55 @@
+"""
+Benchmark of helper.cleanup.htmlcleaner.clean_html against the reference implementation.
+
+Documents of increasing size are assembled from the golden corpus, the way long Word-exported
+biographies repeat the same markup, and cleaned with both implementations. Outputs are compared
+before timing.
+
+Run from the project directory:
+    python -m bench.htmlcleaner.benchmark [--sizes 10000 100000 1000000] [--repeat 3]
+"""
+import argparse
+import time
+from helper.cleanup.htmlcleaner import clean_html
+from bench.htmlcleaner.reference import clean_html_reference
+from bench.htmlcleaner.golden import corpus_files, read
+
+
+def build_document(size):
+    """Repeats the bodies of the corpus documents until the text is at least `size` characters long."""
+    parts = [read(path) for path in corpus_files()]
+    chunks = []
+    length = 0
+    while length < size:
+        for part in parts:
+            chunks.append(part)
+            length += len(part)
+    return ''.join(chunks)
+
+
+def best_time(function, text, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='document sizes in characters (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per measurement, best is kept (default: %(default)s)')
+    args = parser.parse_args()
+
+    print(f'{"size":>10} {"reference":>12} {"clean_html":>12} {"speedup":>8}')
+    for size in args.sizes:
+        text = build_document(size)
+        if clean_html(text) != clean_html_reference(text):
+            raise SystemExit(f'outputs differ for a document of {len(text)} characters')
+        reference = best_time(clean_html_reference, text, args.repeat)
+        current = best_time(clean_html, text, args.repeat)
+        print(f'{len(text):>10} {reference * 1000:>10.1f}ms {current * 1000:>10.1f}ms {reference / current:>7.1f}x')
@@ -0,0 +1,94 @@
+"""
+Golden-output check for helper.cleanup.htmlcleaner.clean_html.
+
+Every corpus/<name>.html is cleaned and compared byte for byte with corpus/<name>.expected.html.
+The expected files are produced by the reference implementation, so the check also runs a
+differential test: randomly assembled documents, built from the fragments the rules react to,
+must clean to the same output with both implementations.
+
+Run from the project directory:
+    python -m bench.htmlcleaner.golden             # check
+    python -m bench.htmlcleaner.golden --update    # regenerate the expected files from the reference
+"""
+import argparse
+import random
+import sys
+from pathlib import Path
+from helper.cleanup.htmlcleaner import clean_html
+from bench.htmlcleaner.reference import clean_html_reference
+
+
+CORPUS_DIR = Path(__file__).parent / 'corpus'
+
+FRAGMENTS = [
+    '<span>', '<span lang="RU">', '</span>', '<//span>', '<sp', 'an>', '<div class=WordSection1>', '</div>',
+    '<p>', '</p>', ' <p>', '  </p>', '<p class=MsoNormalCxSpFirst>', '<p class="MsoNormalCxSpMiddle" style=\'x\'>',
+    'MsoNormalCxSpLast', 'MsoNormal', '&nbsp;', '&nb', 'sp;', ' ', '  ', '\u00A0', '\n', '\n\n\n', '"', "'",
+    '<i>', '</i>', '<b>', '</b>', '<em>', '</em>', '\u2013', '&#774', 'текст', 'Иванов', 'word', '<', '>',
+    '<a name="_Toc1">', '<a name', '</a>', '<script>x</script>', '<script', 'script>', '<style>p {a}</style>',
+    '<st', 'yle>', '<title>t</title>', '<title>', '</title>', '<body lang=RU>', '<body lang=RU link=',
+    '<body lang=RU link=blue vlink=#954F72 style=word-wrap:break-word>',
+    '<body lang="RU" link="blue" vlink="purple" style="word-wrap:break-word">',
+    '<body lang=RU link=blue vlink=purple style=word-wrap:break-word>',
+    '<meta name=Generator content="Microsoft Word 15 (filtered)">',
+]
+
+
+def corpus_files():
+    return sorted(path for path in CORPUS_DIR.glob('*.html') if not path.name.endswith('.expected.html'))
+
+
+def expected_path(path):
+    return path.with_name(path.stem + '.expected.html')
+
+
+def read(path):
+    with open(path, encoding='utf-8', newline='') as file:
+        return file.read()
+
+
+def write(path, text):
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        file.write(text)
+
+
+def update():
+    for path in corpus_files():
+        write(expected_path(path), clean_html_reference(read(path)))
+        print(f'updated {expected_path(path).name}')
+
+
+def check_corpus():
+    failures = 0
+    for path in corpus_files():
+        if clean_html(read(path)) != read(expected_path(path)):
+            failures += 1
+            print(f'FAIL {path.name}')
+        else:
+            print(f'ok   {path.name}')
+    return failures
+
+
+def check_random(count, seed):
+    rnd = random.Random(seed)
+    failures = 0
+    for _ in range(count):
+        doc = ''.join(rnd.choice(FRAGMENTS) for _ in range(rnd.randint(1, 80)))
+        if clean_html(doc) != clean_html_reference(doc):
+            failures += 1
+            if failures <= 3:
+                print(f'FAIL random document {doc!r}')
+    print(f'{count - failures} of {count} random documents match the reference')
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--update', action='store_true', help='regenerate the expected outputs from the reference')
+    parser.add_argument('--random', type=int, default=10000, help='random documents to compare (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random documents (default: %(default)s)')
+    args = parser.parse_args()
+    if args.update:
+        update()
+        sys.exit(0)
+    sys.exit(1 if check_corpus() + check_random(args.random, args.seed) else 0)
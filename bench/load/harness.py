@@ -0,0 +1,436 @@
+"""
+HTTP load harness: replays weighted scenarios shaped like the site's traffic against a running
+application and reports latency percentiles, throughput and errors per request kind.
+
+Scenarios:
+    crawler       walks /view pages in id order, like a search engine bot
+    autocomplete  types a name into the connection picker, one /suggest request per key press
+    search        person, organization and document searches
+    list          list pages and their JSON export
+    save          an administrator creating and then editing a document (needs --admin)
+
+Closed loop (default): --workers clients, each sending its next request when the previous one has
+been answered, after an optional --think time. Open loop (--rate): requests arrive at the given rate
+whatever the response times, latency counts from the scheduled arrival so queueing is included.
+
+Start the application against a database filled with bench.corpus.generate, or let --serve start it
+with the threaded development server, then run from the project directory:
+    python -m bench.load.harness --serve --duration 60 --workers 16
+    python -m bench.load.harness --url http://localhost:8080 --rate 200 --mix crawler=8,search=2
+    python -m bench.load.harness --serve --admin <ADMIN_DATA key> --mix save=1,crawler=9
+
+Saving writes documents named 'Нагрузочный тест ...' to the database; only use it on a scratch copy.
+"""
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import re
+import secrets
+import ssl
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+from bench.suite import RESULTS_DIR, git_commit
+
+
+DEFAULT_MIX = {'crawler': 5, 'autocomplete': 3, 'search': 2, 'list': 1, 'save': 0}
+PERCENTILES = (50, 95, 99)
+SAVE_NAME = 'Нагрузочный тест'
+
+
+class Client:
+    """
+    Keep-alive HTTP connection of one simulated user, recording every request in the shared statistics.
+    A connection the server has closed is reopened for the next request.
+    """
+
+    def __init__(self, url, stats, cookie=None, timeout=30):
+        parts = urlsplit(url)
+        self.https = parts.scheme == 'https'
+        self.netloc = parts.netloc
+        self.stats = stats
+        self.cookie = cookie
+        self.timeout = timeout
+        self.connection = None
+
+    def _connect(self):
+        if self.https:
+            # Local servers use self-signed certificates ('adhoc' in main.py)
+            return http.client.HTTPSConnection(self.netloc, timeout=self.timeout,
+                                               context=ssl._create_unverified_context())
+        return http.client.HTTPConnection(self.netloc, timeout=self.timeout)
+
+    def request(self, label, path, method='GET', form=None, started=None):
+        """
+        Sends a request and reads the whole response.
+        Args:
+            label (str): Request kind the result is recorded under.
+            path (str): Path with query string.
+            method (str): HTTP method.
+            form (dict): Form fields, sent url-encoded.
+            started (float): perf_counter time the request was due, for open-loop runs; defaults to now.
+        Returns:
+            tuple: (status, body), status 0 if the request failed.
+        """
+        headers = {}
+        body = None
+        if form is not None:
+            body = urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        started = time.perf_counter() if started is None else started
+        for attempt in range(2):
+            try:
+                if self.connection is None:
+                    self.connection = self._connect()
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                if response.will_close:
+                    self.close()
+                self.stats.record(label, response.status, len(data), time.perf_counter() - started)
+                return response.status, data
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                # A kept-alive connection closed by the server is retried once on a new one
+                self.close()
+                if attempt:
+                    self.stats.record(label, 0, 0, time.perf_counter() - started, error=type(e).__name__)
+            except (OSError, http.client.HTTPException) as e:
+                self.close()
+                self.stats.record(label, 0, 0, time.perf_counter() - started, error=type(e).__name__)
+                break
+        return 0, b''
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Stats:
+    """Latencies, statuses and errors per request kind, ignoring what happens during the warm-up."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.recording = False
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(Counter)
+        self.bytes = Counter()
+
+    def record(self, label, status, size, duration, error=None):
+        if not self.recording:
+            return
+        with self._lock:
+            self.latencies[label].append(duration)
+            self.bytes[label] += size
+            if error is not None:
+                self.errors[label][error] += 1
+            elif status >= 400:
+                self.errors[label][f'HTTP {status}'] += 1
+
+    def summary(self, elapsed):
+        """Returns the report of every request kind and of all requests together."""
+        def describe(latencies, errors, size):
+            ordered = sorted(latencies)
+            count = len(ordered)
+            error_count = sum(errors.values())
+            result = {'requests': count, 'throughput_rps': round(count / elapsed, 2), 'errors': error_count,
+                      'error_rate': round(error_count / count, 4) if count else 0, 'error_kinds': dict(errors),
+                      'bytes': size}
+            for percentile in PERCENTILES:
+                # Nearest-rank percentile
+                index = max(0, -(-percentile * count // 100) - 1)
+                result[f'p{percentile}_ms'] = round(ordered[index] * 1000, 2) if count else None
+            result['max_ms'] = round(ordered[-1] * 1000, 2) if count else None
+            return result
+
+        with self._lock:
+            report = {label: describe(self.latencies[label], self.errors[label], self.bytes[label])
+                      for label in sorted(self.latencies)}
+            report['all'] = describe([duration for durations in self.latencies.values() for duration in durations],
+                                     sum(self.errors.values(), Counter()), sum(self.bytes.values()))
+        return report
+
+
+class Corpus:
+    """Ids and names to build requests from, read through the application's own JSON list export."""
+
+    def __init__(self, url, sample):
+        self.ids = {}
+        self.names = {}
+        client = Client(url, Stats())
+        for obj_type in ('person', 'org', 'doc', 'field_of_study'):
+            rows, after = [], None
+            while len(rows) < sample:
+                query = {'type': obj_type, 'format': 'json', 'limit': min(sample - len(rows), 2000)}
+                if after:
+                    query['after'] = after
+                status, body = client.request('corpus', '/list?' + urlencode(query))
+                if status != 200:
+                    raise SystemExit(f'cannot read the {obj_type} list from {url}: status {status}')
+                page = json.loads(body)
+                rows.extend(page['results'])
+                after = page['next']
+                if not after:
+                    break
+            self.ids[obj_type] = sorted(row[1] for row in rows)
+            self.names[obj_type] = [row[2] for row in rows if row[2]]
+        client.close()
+        if not self.ids['person']:
+            raise SystemExit('the database has no persons, fill it with bench.corpus.generate first')
+
+
+# Scenarios: each call is one user action, sending one or more requests
+
+def crawler(client, rng, corpus, state, started):
+    obj_type = rng.choices(('person', 'org', 'doc'), weights=(6, 2, 2))[0]
+    if not corpus.ids[obj_type]:
+        obj_type = 'person'
+    ids = corpus.ids[obj_type]
+    # Each crawler walks the ids in order from its own starting point
+    position = state.setdefault(obj_type, rng.randrange(len(ids)))
+    state[obj_type] = (position + 1) % len(ids)
+    client.request(f'view {obj_type}', f'/view?{urlencode({"type": obj_type, "id": ids[position]})}', started=started)
+
+
+def autocomplete(client, rng, corpus, state, started):
+    obj_type = rng.choices(('person', 'org', 'doc'), weights=(6, 2, 2))[0]
+    names = corpus.names[obj_type] or corpus.names['person']
+    text = rng.choice(names)
+    for length in range(2, min(len(text), 8) + 1):
+        client.request('suggest', '/suggest?' + urlencode({'type': obj_type, 'q': text[:length]}), started=started)
+        started = None
+        time.sleep(rng.uniform(0.05, 0.2))
+
+
+def search(client, rng, corpus, state, started):
+    name = rng.choice(corpus.names['person'])
+    surname = name.split()[0]
+    kind = rng.choices(('quicksearch', 'prefix', 'full name', 'name'), weights=(4, 2, 2, 2))[0]
+    if kind == 'quicksearch':
+        query = {'type': 'person', 'quicksearch': 'quicksearch', 'fullName': surname}
+    elif kind == 'prefix':
+        query = {'type': 'person', 'fullName': surname[:rng.randint(2, max(2, len(surname)))]}
+    elif kind == 'full name':
+        query = {'type': 'person', 'fullName': name}
+    else:
+        obj_type = rng.choice(('org', 'doc'))
+        names = corpus.names[obj_type] or ['Гео']
+        query = {'type': obj_type, 'name': rng.choice(names).split()[0]}
+    client.request(f'search {kind}', '/search?' + urlencode(query), started=started)
+
+
+def list_pages(client, rng, corpus, state, started):
+    obj_type = rng.choice(('person', 'org', 'doc', 'field_of_study'))
+    if rng.random() < 0.2:
+        client.request('list json', '/list?' + urlencode({'type': obj_type, 'format': 'json'}), started=started)
+    else:
+        client.request('list html', '/list?' + urlencode({'type': obj_type}), started=started)
+
+
+def save(client, rng, corpus, state, started):
+    form = {'name': f'{SAVE_NAME} {secrets.token_hex(4)}', 'doc_type': 'Статья', 'year': str(rng.randint(1800, 2020))}
+    if 'doc_id' in state:
+        form['id'] = state['doc_id']
+    status, body = client.request('save', '/save?type=doc', method='POST', form=form, started=started)
+    # The first save creates this user's document, the following ones edit it
+    found = re.search(rb'id=(\d+)', body) if status == 200 else None
+    if found and 'doc_id' not in state:
+        state['doc_id'] = found.group(1).decode()
+
+
+SCENARIOS = {'crawler': crawler, 'autocomplete': autocomplete, 'search': search, 'list': list_pages, 'save': save}
+
+
+def parse_mix(text):
+    if not text:
+        return {name: weight for name, weight in DEFAULT_MIX.items() if weight > 0}
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        if name not in SCENARIOS:
+            raise SystemExit(f'unknown scenario {name!r}, expected one of {", ".join(SCENARIOS)}')
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def admin_cookie(user_id):
+    """
+    Signs a Flask-Login session for an administrator with this environment's SECRET_KEY, which the
+    server must share (--serve sees to that).
+    Args:
+        user_id (str): Key of the administrator in ADMIN_DATA.
+    Returns:
+        str: Cookie header value.
+    """
+    import main
+
+    app = main.create_app()
+    value = app.session_interface.get_signing_serializer(app).dumps({'_user_id': user_id, '_fresh': True})
+    return f'{app.config["SESSION_COOKIE_NAME"]}={value}'
+
+
+def serve(port):
+    """Starts the application with the threaded development server and waits until it answers."""
+    command = ('import main; from werkzeug.serving import run_simple; '
+               f'run_simple("127.0.0.1", {port}, main.create_app(), threaded=True)')
+    server = subprocess.Popen([sys.executable, '-c', command], env=os.environ.copy(),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection(f'127.0.0.1:{port}', timeout=1)
+            connection.request('GET', '/health')
+            connection.getresponse().read()
+            connection.close()
+            return server, url
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.2)
+    server.kill()
+    raise SystemExit('the application did not start, run it directly to see why')
+
+
+def run_closed(args, corpus, stats, mix, cookie):
+    """Each worker runs scenarios back to back, pausing --think seconds (on average) between them."""
+    stop = threading.Event()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        client = Client(args.url, stats, cookie)
+        state = {}
+        while not stop.is_set():
+            scenario = SCENARIOS[rng.choices(list(mix), weights=list(mix.values()))[0]]
+            scenario(client, rng, corpus, state, None)
+            if args.think:
+                stop.wait(rng.expovariate(1 / args.think))
+        client.close()
+
+    threads = [threading.Thread(target=worker, args=(args.seed + number,), daemon=True)
+               for number in range(args.workers)]
+    return threads, stop
+
+
+def run_open(args, corpus, stats, mix, cookie):
+    """Scenarios start at Poisson-distributed times at --rate per second, served by up to --workers clients."""
+    stop = threading.Event()
+    due = queue.Queue()
+
+    def schedule():
+        rng = random.Random(args.seed)
+        next_start = time.perf_counter()
+        while not stop.is_set():
+            next_start += rng.expovariate(args.rate)
+            delay = next_start - time.perf_counter()
+            if delay > 0:
+                stop.wait(delay)
+            due.put((next_start, rng.choices(list(mix), weights=list(mix.values()))[0]))
+
+    def worker(seed):
+        rng = random.Random(seed)
+        client = Client(args.url, stats, cookie)
+        state = {}
+        while not stop.is_set():
+            try:
+                started, name = due.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            SCENARIOS[name](client, rng, corpus, state, started)
+        client.close()
+
+    threads = [threading.Thread(target=schedule, daemon=True)]
+    threads += [threading.Thread(target=worker, args=(args.seed + number,), daemon=True)
+                for number in range(args.workers)]
+    return threads, stop
+
+
+def print_report(report):
+    columns = ('requests', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'error_rate')
+    print(f'\n{"request":<24}' + ''.join(f'{column:>15}' for column in columns))
+    for label, result in report.items():
+        print(f'{label:<24}' + ''.join(f'{"-" if result[column] is None else result[column]:>15}'
+                                       for column in columns))
+    errors = report['all']['error_kinds']
+    if errors:
+        print('errors: ' + ', '.join(f'{kind} x{count}' for kind, count in errors.items()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='application address (default: %(default)s)')
+    parser.add_argument('--serve', action='store_true', help='start the application on --port for the run')
+    parser.add_argument('--port', type=int, default=5055, help='port for --serve (default: %(default)s)')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds (default: %(default)s)')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds first (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent clients (default: %(default)s)')
+    parser.add_argument('--rate', type=float, help='open loop: scenarios started per second')
+    parser.add_argument('--think', type=float, default=0, help='closed loop: mean pause between scenarios')
+    parser.add_argument('--mix', help='scenario weights, e.g. crawler=5,autocomplete=3 (default: %s)'
+                        % ','.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items()))
+    parser.add_argument('--admin', help='ADMIN_DATA key to save as, required by the save scenario')
+    parser.add_argument('--sample', type=int, default=5000, help='ids read per type (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed (default: %(default)s)')
+    parser.add_argument('--output', type=Path, help='result file (default: bench/results/load-<commit>.json)')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    if 'save' in mix and not args.admin:
+        raise SystemExit('the save scenario needs --admin')
+    if args.admin and not os.environ.get('SECRET_KEY'):
+        if not args.serve:
+            raise SystemExit('--admin needs the SECRET_KEY of the server in the environment')
+        os.environ['SECRET_KEY'] = secrets.token_urlsafe(16)
+    cookie = admin_cookie(args.admin) if args.admin else None
+
+    server = None
+    if args.serve:
+        server, args.url = serve(args.port)
+    try:
+        corpus = Corpus(args.url, args.sample)
+        stats = Stats()
+        run = run_open if args.rate else run_closed
+        threads, stop = run(args, corpus, stats, mix, cookie)
+        for thread in threads:
+            thread.start()
+        time.sleep(args.warmup)
+        stats.recording = True
+        started = time.perf_counter()
+        time.sleep(args.duration)
+        stats.recording = False
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=5)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {
+        'commit': git_commit(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'url': args.url,
+        'mode': f'open, {args.rate}/s' if args.rate else f'closed, think {args.think}s',
+        'workers': args.workers,
+        'duration_s': round(elapsed, 2),
+        'mix': mix,
+        'results': stats.summary(elapsed),
+    }
+    print_report(report['results'])
+    output = args.output or RESULTS_DIR / f'load-{report["commit"]}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f'\nresults written to {output}')
@@ -0,0 +1,62 @@
+"""
+Benchmark of worker startup: importing main.py and building the application with create_app().
+
+Every run starts a fresh interpreter, so nothing is cached between runs. The slowest imports of the
+last run are listed from the interpreter's -X importtime report.
+
+Run from the project directory:
+    python -m bench.startup.import_time [--runs 10] [--top 15]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+PROBE = '''
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.create_app()
+created = time.perf_counter()
+print(json.dumps({"import": imported - started, "create_app": created - imported}))
+'''
+
+
+def run_once():
+    """Returns the timings of one fresh interpreter and its -X importtime report."""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE],
+                               capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def slowest_imports(report, top):
+    """Parses an -X importtime report into (cumulative microseconds, module) pairs, slowest first."""
+    imports = []
+    for line in report.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        imports.append((int(cumulative), module.rstrip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters to time (default: %(default)s)')
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list (default: %(default)s)')
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.runs):
+        timing, report = run_once()
+        timings.append(timing)
+    for step in ('import', 'create_app'):
+        values = [timing[step] * 1000 for timing in timings]
+        print(f'{step:>10}: median {statistics.median(values):7.1f}ms  min {min(values):7.1f}ms  '
+              f'max {max(values):7.1f}ms')
+    print('\nslowest imports of the last run (cumulative):')
+    for cumulative, module in slowest_imports(report, args.top):
+        print(f'{cumulative / 1000:>8.1f}ms  {module}')
@@ -0,0 +1,174 @@
+"""
+Microbenchmark suite: HTML and date cleanup, record value dictionaries, list rendering and every
+search branch, measured against the configured database (fill it with bench.corpus.generate).
+
+Results are written as JSON, by default to bench/results/<commit>.json, and can be compared with
+an earlier run:
+    python -m bench.suite [--repeat 5] [--only search] [--output FILE] [--compare bench/results/OLD.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+# Dates in the shapes found in the legacy export
+DATE_SAMPLES = ['1968, 31 января', '1903-12-26', '1883 г., 3 апреля', '12 апр. 1950', '1934. 29 мая', '25-11-1927',
+                '1896, 19 февр.', '19 ноября 1883 г.', 'около 1900', '', 'XIX век', '2005. 15 февраля']
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                               text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('-dirty' if dirty else '')
+
+
+def measure(function, repeat):
+    """Runs `function` once to warm up, then `repeat` times; returns the timings in milliseconds."""
+    function()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {'min_ms': round(min(timings), 3), 'median_ms': round(statistics.median(timings), 3),
+            'max_ms': round(max(timings), 3), 'runs': repeat}
+
+
+def cleanup_benchmarks():
+    from helper.cleanup.htmlcleaner import clean_html
+    from bench.htmlcleaner.benchmark import build_document
+    from misc.convert import clean_date
+
+    small, large = build_document(10_000), build_document(100_000)
+    dates = DATE_SAMPLES * 100
+    return {
+        'clean_html 10KB': lambda: clean_html(small),
+        'clean_html 100KB': lambda: clean_html(large),
+        f'clean_date x{len(dates)}': lambda: [clean_date(date) for date in dates],
+    }
+
+
+def values_benchmarks():
+    from sqlalchemy import select
+    from sqlalchemy.orm import Session
+    from helper.db.initialise_database import get_engine
+    from helper.db.queries import OBJECT_MODELS
+
+    benchmarks = {}
+    with Session(get_engine()) as session:
+        for obj_type in ('person', 'org', 'doc', 'field_of_study'):
+            model = OBJECT_MODELS[obj_type]
+            records = session.scalars(select(model).order_by(model.id).limit(200)
+                                      .options(*model.view_options())).all()
+            # Bind the records as defaults, the loop variable changes
+            benchmarks[f'values_ru {obj_type} x{len(records)}'] = \
+                lambda records=records: [record.values_ru() for record in records]
+            benchmarks[f'values_en {obj_type} x{len(records)}'] = \
+                lambda records=records: [record.values_en() for record in records]
+    return benchmarks
+
+
+def route_benchmarks():
+    import main
+
+    client = main.app.test_client()
+
+    def get(url):
+        def request():
+            response = client.get(url)
+            response.get_data()
+            response.close()
+            if response.status_code != 200:
+                raise RuntimeError(f'{url} answered {response.status_code}')
+        return request
+
+    return {
+        'list person html': get('/list?type=person'),
+        'list person json 2000': get('/list?type=person&format=json&limit=2000'),
+        'list org html': get('/list?type=org'),
+        'list_custom geography': get('/list_custom?type=geography'),
+        'list_custom academicians': get('/list_custom?type=acad_corresponding_members'),
+        'search quicksearch': get('/search?type=person&quicksearch=1&fullName=Иванов'),
+        'search fulltext': get('/search?type=person&fulltext=месторождение'),
+        'search content': get('/search?type=person&content=геолог'),
+        'search person prefix': get('/search?type=person&fullName=Ив'),
+        'search person full name': get('/search?type=person&fullName=Иванов Иван'),
+        'search person fields': get('/search?type=person&lastName=Пет&firstName=Ив&birthYear=1850'),
+        'search person fuzzy': get('/search?type=person&fullName=Ивонов&fuzzy=1'),
+        'search name org': get('/search?type=org&name=Инст'),
+        'search name doc': get('/search?type=doc&name=Гео'),
+    }
+
+
+def person_count():
+    from sqlalchemy import select, func
+    from sqlalchemy.orm import Session
+    from helper.db.initialise_database import get_engine, Person
+
+    with Session(get_engine()) as session:
+        return session.execute(select(func.count()).select_from(Person)).scalar_one()
+
+
+def run(repeat, only=None):
+    results = {}
+    for group in (cleanup_benchmarks, values_benchmarks, route_benchmarks):
+        for name, function in group().items():
+            if only and only not in name:
+                continue
+            try:
+                results[name] = measure(function, repeat)
+                print(f'{name:<40} {results[name]["median_ms"]:>10.2f}ms')
+            except Exception as e:
+                results[name] = {'error': f'{type(e).__name__}: {e}'.splitlines()[0]}
+                print(f'{name:<40} {results[name]["error"]}')
+    return results
+
+
+def compare(old, new):
+    print(f'\n{"benchmark":<40} {"before":>10} {"after":>10} {"change":>8}')
+    for name, result in new['results'].items():
+        before = old['results'].get(name, {}).get('median_ms')
+        after = result.get('median_ms')
+        if before is None or after is None:
+            continue
+        print(f'{name:<40} {before:>8.2f}ms {after:>8.2f}ms {after / before:>7.2f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per benchmark (default: %(default)s)')
+    parser.add_argument('--only', help='run the benchmarks whose name contains this text')
+    parser.add_argument('--output', type=Path, help='result file (default: bench/results/<commit>.json)')
+    parser.add_argument('--compare', type=Path, help='earlier result file to compare with')
+    args = parser.parse_args()
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'database': os.environ.get('DATABASE_NAME'),
+        'persons': person_count(),
+        'results': run(args.repeat, args.only),
+    }
+    output = args.output or RESULTS_DIR / f'{commit}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f'\nresults written to {output}')
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            compare(json.load(file), report)
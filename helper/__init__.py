@@ -32,7 +32,22 @@ MULTIPLE_CHOICE_FIELDS = {
                  'Музеи', 'Координирующие организации', 'Академии',
                  'Научные общества', 'Высшие учебные заведения', 'Прочие']
 }
-FILE_FIELDS = ['file']
+# Columns holding uploaded files, shown as file inputs in the edit form
+FILE_FIELDS = ['file', 'photo']
+
+# Columns computed by the database, never shown in or saved from the edit form
+GENERATED_FIELDS = ['search_vector', 'display_name', 'display_name_en', 'sort_name', 'sort_name_en']
+
+# Maximum number of rows on one page of /list
+LIST_PAGE_SIZE = 2000
+
+# Maximum number of persons returned by a full-text search
+FULLTEXT_RESULTS_LIMIT = 100
+
+# Autocomplete: default and maximum number of suggestions, seconds before the index is reloaded
+SUGGEST_LIMIT = 10
+SUGGEST_MAX_LIMIT = 50
+SUGGEST_MAX_AGE = 300
 
 
 CONNECTION_TYPE_MAPPING = {
@@ -65,3 +80,48 @@ TITLE_CONVERTER_LIST = {
     'doc': 'Документы',
     'field_of_study': 'Области исследования'
 }
+
+# Rendered /view pages: in-process LRU capacity and expiry (seconds), optional shared Redis backend and its expiry
+PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', 1024))
+PAGE_CACHE_LOCAL_TTL = int(os.environ.get('PAGE_CACHE_LOCAL_TTL', 300))
+PAGE_CACHE_URL = os.environ.get('PAGE_CACHE_URL')
+PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 3600))
+
+# Database connection pool, per worker process: 'session' pools connections in the application,
+# 'transaction' opens one per checkout and leaves pooling to PgBouncer in transaction pooling mode
+DB_POOL_MODE = os.environ.get('DB_POOL_MODE', 'session')
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+
+# OAuth provider: seconds the discovery document is cached, timeout of requests to the provider
+OAUTH_DISCOVERY_TTL = int(os.environ.get('OAUTH_DISCOVERY_TTL', 3600))
+OAUTH_HTTP_TIMEOUT = int(os.environ.get('OAUTH_HTTP_TIMEOUT', 10))
+
+# Bearer token Prometheus sends to read /metrics; without one, only logged-in users can read it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Development: report query counts in Server-Timing and warn about statements a request repeats at least
+# QUERY_REPEAT_THRESHOLD times (N+1 queries)
+QUERY_DEBUG = os.environ.get('QUERY_DEBUG', 'false').lower() in ('1', 'true', 'yes')
+QUERY_REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD', 5))
+
+# Uploaded files, stored once under their content hash; served by /uploads/ with this cache lifetime (seconds)
+UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'static/uploads')
+UPLOAD_MAX_AGE = int(os.environ.get('UPLOAD_MAX_AGE', 365 * 24 * 3600))
+
+# Person photos: widths of the scaled-down copies made in THUMBNAIL_WORKERS background threads per worker process,
+# and the width photos are shown at on wide screens (CSS pixels)
+THUMBNAIL_WIDTHS = tuple(int(width) for width in os.environ.get('THUMBNAIL_WIDTHS', '160,320,640').split(','))
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+PHOTO_DISPLAY_WIDTH = int(os.environ.get('PHOTO_DISPLAY_WIDTH', 320))
+
+# Seconds browsers and shared caches may reuse anonymous responses before revalidating them (ETag/Last-Modified)
+CACHE_MAX_AGE = {
+    'view': 300,
+    'list': 60,
+    'list_custom': 300,
+    'search': 60,
+}
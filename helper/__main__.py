@@ -1,4 +1,5 @@
-from .db.initialise_database import create_tables, create_database, drop_tables
+from .db.initialise_database import create_tables, create_database, drop_tables, upgrade_tables, get_engine
+from .db.geography import rebuild_regions
 
 if input("Creating database, y to continue: ") == 'y':
     create_database()
@@ -9,4 +10,11 @@ if input("Removing old tables, y to continue: ") == 'y':
 if input("Creating tables, y to continue: ") == 'y':
     create_tables()
 
+if input("Upgrading existing tables (new columns and indexes), y to continue: ") == 'y':
+    upgrade_tables()
+
+if input("Rebuilding the geography index from areas of study, y to continue: ") == 'y':
+    with get_engine().begin() as connection:
+        rebuild_regions(connection)
+
 print('Done creating tables!')
@@ -0,0 +1,114 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from functools import wraps
+
+
+def release_stamp(paths):
+    """
+    Identifies the deployed code and templates, so that validators change with a release.
+    Args:
+        paths (iterable): Files and folders (searched recursively) whose changes make a new release.
+    Returns:
+        tuple: (token, datetime of the newest file in UTC).
+    """
+    stamps = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, folders, files in os.walk(path):
+                # Compiled modules are rewritten by whichever process imports first
+                folders[:] = [name for name in folders if name != '__pycache__']
+                stamps.extend((os.path.join(folder, file), os.stat(os.path.join(folder, file)).st_mtime_ns)
+                              for file in files)
+        elif os.path.exists(path):
+            stamps.append((path, os.stat(path).st_mtime_ns))
+    stamps.sort()
+    token = hashlib.blake2b(repr(stamps).encode(), digest_size=8).hexdigest()
+    newest = max((mtime for _, mtime in stamps), default=0)
+    return token, datetime.fromtimestamp(newest // 10 ** 9, tz=timezone.utc)
+
+
+class ConditionalGet:
+    """
+    Answers conditional GET requests (If-None-Match, If-Modified-Since) with 304 Not Modified before a view
+    queries or renders anything. Validators are derived from the change versions of the tables a response
+    is built from, the release and the variant of the page (locale, logged-in user), so reading them costs
+    one lookup in a small table.
+    """
+
+    def __init__(self, versions_func, release):
+        """
+        Args:
+            versions_func (callable): Takes table names and returns ({table name: version}, last modification
+                datetime or None), or None if the versions cannot be read.
+            release (tuple): (token, datetime) from `release_stamp`.
+        """
+        self.versions_func = versions_func
+        self.release_token, self.release_time = release
+
+    def validators(self, tables, variant):
+        """
+        Returns the weak ETag and Last-Modified date of a response.
+        Args:
+            tables (iterable): Tables the response is built from.
+            variant (tuple): What else the response depends on, e.g. the locale.
+        Returns:
+            tuple: (ETag value without quotes, datetime), or None if the table versions cannot be read.
+        """
+        result = self.versions_func(tuple(sorted(tables)))
+        if result is None:
+            return None
+        versions, modified_at = result
+        digest = hashlib.blake2b(repr((self.release_token, variant, sorted(versions.items()))).encode(),
+                                 digest_size=12)
+        last_modified = max(filter(None, (modified_at, self.release_time)))
+        return digest.hexdigest(), last_modified.replace(microsecond=0)
+
+    @staticmethod
+    def not_modified(request, etag, last_modified):
+        """Tells whether the client's copy is current. If-Modified-Since only counts without If-None-Match."""
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(etag)
+        return request.if_modified_since is not None and last_modified <= request.if_modified_since
+
+    def conditional(self, tables_func, variant_func, max_age):
+        """
+        Decorator adding validators and Cache-Control to a view, and answering 304 when the client's copy is current.
+        Args:
+            tables_func (callable): Takes the query parameters and returns the tables the response is built from,
+                or None for responses that are not validated.
+            variant_func (callable): Returns (variant, private): what else the response depends on, and whether it
+                is specific to the user, in which case caches must not share it and browsers revalidate it.
+            max_age (int): Seconds anonymous responses may be reused without revalidation.
+        """
+        from flask import request, make_response
+
+        def decorator(view_func):
+            @wraps(view_func)
+            def wrapper(*args, **kwargs):
+                tables = tables_func(request.args) if request.method in ('GET', 'HEAD') else None
+                if tables is None:
+                    return view_func(*args, **kwargs)
+                variant, private = variant_func()
+                validators = self.validators(tables, variant)
+                if validators is None:
+                    return view_func(*args, **kwargs)
+                etag, last_modified = validators
+                if self.not_modified(request, etag, last_modified):
+                    response = make_response('', 304)
+                else:
+                    response = make_response(view_func(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                response.set_etag(etag, weak=True)
+                response.last_modified = last_modified
+                if private:
+                    response.cache_control.private = True
+                    response.cache_control.no_cache = True
+                else:
+                    response.cache_control.public = True
+                    response.cache_control.max_age = max_age
+                response.vary.add('Cookie')
+                return response
+            return wrapper
+        return decorator
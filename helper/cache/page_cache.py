@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+
+class LRUBackend:
+    """
+    Bounded in-process cache. The least recently used page is evicted once `max_entries` is reached,
+    and entries older than `ttl` seconds (if given) are treated as missing.
+    Generation counters are kept apart from the pages and never evicted.
+    """
+
+    def __init__(self, max_entries, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def generations(self, *keys):
+        with self._lock:
+            return [self._generations.get(key, 0) for key in keys]
+
+    def bump(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+
+class RedisBackend:
+    """
+    Cache shared by all worker processes, stored in Redis. Requires the `redis` package.
+    Raises:
+        RuntimeError: If the package is not installed, so a misconfigured worker fails when it starts.
+    """
+
+    def __init__(self, url, ttl):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('PAGE_CACHE_URL selects the Redis page cache, but the redis package is not installed '
+                               '(pip install -r requirements.txt)') from None
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value):
+        self._client.set(key, value.encode('utf-8'), ex=self.ttl)
+
+    def generations(self, *keys):
+        return [int(value) if value is not None else 0 for value in self._client.mget(keys)]
+
+    def bump(self, *keys):
+        with self._client.pipeline(transaction=False) as pipeline:
+            for key in keys:
+                pipeline.incr(key)
+            pipeline.execute()
+
+
+class PageCache:
+    """
+    Cache of rendered pages keyed by object type, object ID and locale.
+    Pages are looked up in the in-process backend first and then in the shared backend, if one is
+    configured.
+
+    Pages are stored under the generations of their object and of its type, which invalidation bumps
+    rather than deleting entries: the old entries are no longer looked up and age out. A page whose
+    rendering started before an invalidation is stored under the old generation, so it is never served
+    once the change is visible. The generations live in the shared backend if there is one, so every
+    worker process sees an invalidation at once; otherwise in the in-process backend.
+    Any object with get/set/generations/bump methods can be used as a backend.
+    """
+
+    def __init__(self, local, shared=None):
+        self.local = local
+        self.shared = shared
+
+    @staticmethod
+    def key(obj_type, obj_id, locale):
+        return obj_type, str(obj_id), locale
+
+    @staticmethod
+    def _generation_keys(obj_type, obj_id):
+        return f'generation:{obj_type}', f'generation:{obj_type}:{obj_id}'
+
+    def storage_key(self, key):
+        """
+        Returns where the page of a key is stored at the current generations.
+        Args:
+            key (tuple): Key from `key`.
+        Returns:
+            str: Backend key.
+        """
+        obj_type, obj_id, locale = key
+        type_generation, generation = (self.shared or self.local).generations(
+            *self._generation_keys(obj_type, obj_id))
+        return f'view:{obj_type}:{type_generation}:{obj_id}:{generation}:{locale}'
+
+    def _get(self, storage_key):
+        page = self.local.get(storage_key)
+        if page is None and self.shared is not None:
+            page = self.shared.get(storage_key)
+            if page is not None:
+                self.local.set(storage_key, page)
+        return page
+
+    def _set(self, storage_key, page):
+        self.local.set(storage_key, page)
+        if self.shared is not None:
+            self.shared.set(storage_key, page)
+
+    def get(self, key):
+        return self._get(self.storage_key(key))
+
+    def set(self, key, page):
+        self._set(self.storage_key(key), page)
+
+    def invalidate(self, obj_type, obj_id):
+        """
+        Drops the cached pages of one object in every locale.
+        Args:
+            obj_type (str): Object type.
+            obj_id (int or str): Object ID.
+        """
+        (self.shared or self.local).bump(self._generation_keys(obj_type, obj_id)[1])
+
+    def invalidate_type(self, obj_type):
+        """
+        Drops the cached pages of every object of a type.
+        Args:
+            obj_type (str): Object type.
+        """
+        (self.shared or self.local).bump(self._generation_keys(obj_type, None)[0])
+
+    def cached(self, key_func):
+        """
+        Decorator caching the HTML returned by a view.
+        Args:
+            key_func (callable): Returns the cache key of the current request, or None to bypass the cache.
+        """
+        def decorator(view_func):
+            @wraps(view_func)
+            def wrapper(*args, **kwargs):
+                key = key_func()
+                if key is None:
+                    return view_func(*args, **kwargs)
+                # Read before rendering: a change made meanwhile moves readers on to a new generation
+                storage_key = self.storage_key(key)
+                page = self._get(storage_key)
+                if page is None:
+                    page = view_func(*args, **kwargs)
+                    if isinstance(page, str):
+                        self._set(storage_key, page)
+                return page
+            return wrapper
+        return decorator
+
+
+def create_page_cache(max_entries, shared_url=None, shared_ttl=3600, local_ttl=None):
+    """
+    Builds the page cache from configuration.
+    Args:
+        max_entries (int): Capacity of the in-process LRU.
+        shared_url (str): redis:// URL of the shared backend, or None to cache in-process only.
+        shared_ttl (int): Expiry of shared entries, in seconds.
+        local_ttl (int): Expiry of in-process entries, in seconds, or None for no expiry.
+    Returns:
+        PageCache: The configured cache.
+    """
+    shared = RedisBackend(shared_url, shared_ttl) if shared_url else None
+    return PageCache(LRUBackend(max_entries, ttl=local_ttl), shared=shared)
@@ -1,9 +1,7 @@
 import re
 
 
-def clean_html(txt):
-    try:
-        rightstyle = '''<style>
+RIGHT_STYLE = '''<style>
 <!--
  /* Style Definitions */
 p.GIN
@@ -19,59 +17,93 @@ p.GIN
     font-family:Times New Roman CYR,serif;}
 -->
 </style>'''
-        for i in range(5):
-            txt = re.sub(r'<\/?span[^>]*>', '', txt)
-            txt = re.sub(r'<\/?/span[^>]*>', '', txt)
-            txt = re.sub(r'<\/?div[^>]*>', '', txt)
-            txt = re.sub(r'<style>.*?</style>', rightstyle, txt, flags=re.DOTALL)
-            txt = re.sub(u"\u2013", "-", txt)
-            txt = re.sub(r'<script(.|\n)*script>', '', txt)
-            txt = re.sub(r'<a name[\S\s]*?>([\S\s]*?)<\/a>', r'\1', txt)
-            txt = re.sub('<body lang=RU link=.*?>', '', txt)
-            txt = re.sub('<title>.*?</title>',
-                         '<title>Информационная система: История геологии и горного дела ГИН РАН</title>',
-                         txt, flags=re.DOTALL)
-            while '<body lang=RU link=blue vlink=#954F72 style=word-wrap:break-word>' in txt:
-                txt = txt.replace('<body lang=RU link=blue vlink=#954F72 style=word-wrap:break-word>',
-                                  '<body lang=RU>')
-            while 'MsoNormalCxSpFirst' in txt:
-                txt = txt.replace('MsoNormalCxSpFirst', 'GIN')
-            while 'MsoNormalCxSpMiddle' in txt:
-                txt = txt.replace('MsoNormalCxSpMiddle', 'GIN')
-            while 'MsoNormalCxSpLast' in txt:
-                txt = txt.replace('MsoNormalCxSpLast', 'GIN')
-            while 'MsoNormalCxSpLast' in txt:
-                txt = txt.replace('MsoNormal', 'GIN')
-            while '&nbsp;' in txt:
-                txt = txt.replace('&nbsp;', ' ')
-            while '</i><i>' in txt:
-                txt = txt.replace('</i><i>', '')
-            while '</b><b>' in txt:
-                txt = txt.replace('</b><b>', '')
-            while ' <p>' in txt:
-                txt = txt.replace(' <p>', '<p>')
-            while ' </p>' in txt:
-                txt = txt.replace(' </p>', '</p>')
-            while '"' in txt:
-                txt = txt.replace('"', '')
-            while "'" in txt:
-                txt = txt.replace("'", '')
-            while "&#774" in txt:
-                txt = txt.replace("&#774", 'й')
-            while '<em>' in txt:
-                txt = txt.replace('<em>', '<i>')
-            while '</em>' in txt:
-                txt = txt.replace('</em>', '</i>')
-            while '  ' in txt:
-                txt = txt.replace('  ', ' ')
-            while '\n\n\n' in txt:
-                txt = txt.replace('\n\n\n', '\n\n')
-            while u"\u00A0" in txt:
-                txt = txt.replace(u"\u00A0", ' ')
-            while "<meta name=Generator content=Microsoft Word 15 (filtered)>" in txt:
-                txt = txt.replace("<meta name=Generator content=Microsoft Word 15 (filtered)>", ' ')
-            while "<body lang=RU link=blue vlink=purple style=word-wrap:break-word>" in txt:
-                txt = txt.replace("<body lang=RU link=blue vlink=purple style=word-wrap:break-word>", '<body lang=RU>')
+
+RIGHT_TITLE = '<title>Информационная система: История геологии и горного дела ГИН РАН</title>'
+
+SPAN = re.compile(r'<\/?span[^>]*>')
+DOUBLE_SLASH_SPAN = re.compile(r'<\/?/span[^>]*>')
+DIV = re.compile(r'<\/?div[^>]*>')
+STYLE = re.compile(r'<style>.*?</style>', flags=re.DOTALL)
+ANCHOR = re.compile(r'<a name[\S\s]*?>([\S\s]*?)<\/a>')
+BODY_LINK = re.compile('<body lang=RU link=.*?>')
+TITLE = re.compile('<title>.*?</title>', flags=re.DOTALL)
+
+# Upper bound on the number of passes; real documents stop changing after two or three
+MAX_PASSES = 5
+
+
+def _replace_all(txt, old, new):
+    """Replaces `old` until it no longer occurs, as a replacement can join text into a new occurrence."""
+    while old in txt:
+        txt = txt.replace(old, new)
+    return txt
+
+
+def _remove_scripts(txt):
+    """
+    Removes everything from the first '<script' to the last 'script>', which is what the greedy
+    pattern <script(.|\\n)*script> matches, in linear time instead of backtracking over the whole text.
+    """
+    start = txt.find('<script')
+    if start == -1:
+        return txt
+    end = txt.rfind('script>')
+    if end < start + len('<script'):
+        return txt
+    return txt[:start] + txt[end + len('script>'):]
+
+
+def _clean_pass(txt):
+    """Applies every rule once, in order."""
+    txt = SPAN.sub('', txt)
+    txt = DOUBLE_SLASH_SPAN.sub('', txt)
+    txt = DIV.sub('', txt)
+    txt = STYLE.sub(RIGHT_STYLE, txt)
+    txt = txt.replace('\u2013', '-')
+    txt = _remove_scripts(txt)
+    txt = ANCHOR.sub(r'\1', txt)
+    txt = BODY_LINK.sub('', txt)
+    txt = TITLE.sub(RIGHT_TITLE, txt)
+    txt = _replace_all(txt, '<body lang=RU link=blue vlink=#954F72 style=word-wrap:break-word>', '<body lang=RU>')
+    txt = _replace_all(txt, 'MsoNormalCxSpFirst', 'GIN')
+    txt = _replace_all(txt, 'MsoNormalCxSpMiddle', 'GIN')
+    txt = _replace_all(txt, 'MsoNormalCxSpLast', 'GIN')
+    txt = _replace_all(txt, '&nbsp;', ' ')
+    txt = _replace_all(txt, '</i><i>', '')
+    txt = _replace_all(txt, '</b><b>', '')
+    txt = _replace_all(txt, ' <p>', '<p>')
+    txt = _replace_all(txt, ' </p>', '</p>')
+    txt = _replace_all(txt, '"', '')
+    txt = _replace_all(txt, "'", '')
+    txt = _replace_all(txt, '&#774', 'й')
+    txt = _replace_all(txt, '<em>', '<i>')
+    txt = _replace_all(txt, '</em>', '</i>')
+    txt = _replace_all(txt, '  ', ' ')
+    txt = _replace_all(txt, '\n\n\n', '\n\n')
+    txt = _replace_all(txt, '\u00A0', ' ')
+    txt = _replace_all(txt, '<meta name=Generator content=Microsoft Word 15 (filtered)>', ' ')
+    txt = _replace_all(txt, '<body lang=RU link=blue vlink=purple style=word-wrap:break-word>', '<body lang=RU>')
+    return txt
+
+
+def clean_html(txt):
+    """
+    Cleans up HTML exported from Word: drops spans, divs, scripts, anchors and quotes, replaces the
+    style block and title, renames Word paragraph classes and normalizes whitespace.
+    The rules are applied in passes, as a replacement can create new matches for an earlier rule
+    (e.g. removing quotes completes a tag). Once a pass changes nothing, no later pass would either,
+    so cleaning stops there instead of always running all of them.
+    Args:
+        txt (str): HTML to clean.
+    Returns:
+        str: Cleaned HTML, or `txt` unchanged if it could not be cleaned.
+    """
+    try:
+        for _ in range(MAX_PASSES):
+            cleaned = _clean_pass(txt)
+            if cleaned == txt:
+                break
+            txt = cleaned
         return txt.strip()
     except Exception as e:
         print(f"Error cleaning HTML: {e}")
@@ -0,0 +1,121 @@
+from sqlalchemy import select, insert, delete
+from helper.db.initialise_database import (DocumentAuthorship,
+                                           OrganizationMembership,
+                                           PersonFieldOfStudy,
+                                           PersonEducation)
+
+
+# Association tables of every object type:
+# (model, column holding the object ID, column holding the linked record ID, type of the linked record)
+ASSOCIATIONS = {
+    'person': (
+        (DocumentAuthorship, DocumentAuthorship.person_id, DocumentAuthorship.document_id, 'doc'),
+        (OrganizationMembership, OrganizationMembership.person_id, OrganizationMembership.organization_id, 'org'),
+        (PersonEducation, PersonEducation.person_id, PersonEducation.organization_id, 'org'),
+        (PersonFieldOfStudy, PersonFieldOfStudy.person_id, PersonFieldOfStudy.field_of_study_id, 'field_of_study'),
+    ),
+    'org': (
+        (OrganizationMembership, OrganizationMembership.organization_id, OrganizationMembership.person_id, 'person'),
+        (PersonEducation, PersonEducation.organization_id, PersonEducation.person_id, 'person'),
+    ),
+    'doc': (
+        (DocumentAuthorship, DocumentAuthorship.document_id, DocumentAuthorship.person_id, 'person'),
+    ),
+    'field_of_study': (
+        (PersonFieldOfStudy, PersonFieldOfStudy.field_of_study_id, PersonFieldOfStudy.person_id, 'person'),
+    ),
+}
+
+
+def connection_model(obj_type, connection_type, category):
+    """
+    Returns the association model that stores a connection submitted by the edit form.
+    Args:
+        obj_type (str): Type of the edited record.
+        connection_type (str): Type of the linked record.
+        category (str): Connection category ('education', 'alumni'), may be None.
+    Returns:
+        type: Association model, or None if the connection is not stored for this type.
+    """
+    if obj_type == 'person':
+        if connection_type == 'doc':
+            return DocumentAuthorship
+        if connection_type == 'org':
+            return PersonEducation if category == 'education' else OrganizationMembership
+        if connection_type == 'field_of_study':
+            return PersonFieldOfStudy
+    elif obj_type == 'org':
+        return PersonEducation if category == 'alumni' else OrganizationMembership
+    elif obj_type == 'doc':
+        return DocumentAuthorship
+    return None
+
+
+def parse_connections(obj_type, connections):
+    """
+    Groups the connections submitted by the edit form by association model.
+    Args:
+        obj_type (str): Type of the edited record.
+        connections (list): 'type:id' or 'type:id:category' strings.
+    Returns:
+        dict: Sets of linked record IDs keyed by association model.
+    """
+    wanted = {}
+    for connection in connections:
+        connection_parts = connection.split(':')
+        category = connection_parts[2] if len(connection_parts) > 2 else None
+        model = connection_model(obj_type, connection_parts[0], category)
+        if model is not None:
+            wanted.setdefault(model, set()).add(int(connection_parts[1]))
+    return wanted
+
+
+def sync_connections(session, obj_type, obj_id, connections):
+    """
+    Brings the association rows of a record in line with the submitted connections.
+    Only the differences are written: one DELETE and one multi-row INSERT per association table at most.
+    The caller commits.
+    Args:
+        session (Session): Database session.
+        obj_type (str): Type of the edited record.
+        obj_id (int): ID of the edited record.
+        connections (list): Connections as submitted by the edit form.
+    """
+    wanted = parse_connections(obj_type, connections)
+    for model, own_column, other_column, _ in ASSOCIATIONS.get(obj_type, ()):
+        current = set(session.scalars(select(other_column).where(own_column == obj_id)))
+        submitted = wanted.get(model, set())
+        removed = current - submitted
+        added = submitted - current
+        if removed:
+            session.execute(delete(model).where(own_column == obj_id, other_column.in_(removed)))
+        if added:
+            session.execute(insert(model), [{own_column.key: obj_id, other_column.key: other_id}
+                                            for other_id in added])
+
+
+def delete_connections(session, obj_type, obj_id):
+    """
+    Deletes every association row of a record, before the record itself is deleted.
+    Args:
+        session (Session): Database session.
+        obj_type (str): Type of the record.
+        obj_id (int): ID of the record.
+    """
+    for model, own_column, _, _ in ASSOCIATIONS.get(obj_type, ()):
+        session.execute(delete(model).where(own_column == obj_id))
+
+
+def linked_records(session, obj_type, obj_id):
+    """
+    Finds the records whose view pages list the given record.
+    Args:
+        session (Session): Database session.
+        obj_type (str): Object type ('person', 'org', 'doc', 'field_of_study').
+        obj_id (int): Object ID.
+    Returns:
+        set: (type, id) pairs of the linked records.
+    """
+    return {(linked_type, linked_id)
+            for _, own_column, other_column, linked_type in ASSOCIATIONS.get(obj_type, ())
+            for linked_id in session.scalars(select(other_column).where(own_column == obj_id))}
@@ -0,0 +1,119 @@
+from sqlalchemy import select, insert, update, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from helper.db.initialise_database import Person, Region, PersonRegion
+
+
+def region_key(name):
+    """
+    Returns the canonical form of a region name: surrounding and repeated whitespace removed, lower case.
+    Args:
+        name (str): Region name as written in an area of study.
+    Returns:
+        str: Canonical region name.
+    """
+    return ' '.join(name.split()).lower()
+
+
+def split_regions(area_of_study):
+    """
+    Splits a comma-separated area of study into regions.
+    Args:
+        area_of_study (str): Person.area_of_study, may be None.
+    Returns:
+        dict: Display names keyed by canonical name, in order of appearance, without duplicates or empty parts.
+    """
+    regions = {}
+    for part in (area_of_study or '').split(','):
+        name = ' '.join(part.split())
+        if name:
+            regions.setdefault(region_key(name), name)
+    return regions
+
+
+def _region_ids(session, regions):
+    """Returns the IDs of the given regions keyed by canonical name, creating the missing ones."""
+    if not regions:
+        return {}
+    session.execute(pg_insert(Region).on_conflict_do_nothing(index_elements=[Region.key]),
+                    [{'key': key, 'name': name} for key, name in regions.items()])
+    return dict(session.execute(select(Region.key, Region.id).where(Region.key.in_(regions))).all())
+
+
+def _lock_regions(session, region_ids):
+    """
+    Locks region rows until the end of the transaction, in ID order so that concurrent saves cannot deadlock.
+    A save waiting for the lock then counts with the links of the one holding it, and no region can be
+    deleted while a save links a person to it.
+    Returns:
+        set: IDs of the regions that still exist.
+    """
+    if not region_ids:
+        return set()
+    return set(session.scalars(select(Region.id).where(Region.id.in_(region_ids)).order_by(Region.id)
+                               .with_for_update()))
+
+
+def _update_counts(session, region_ids):
+    """Recounts the persons of the given regions and drops the regions left without any. Lock them first."""
+    if not region_ids:
+        return
+    count = select(func.count()).where(PersonRegion.region_id == Region.id).scalar_subquery()
+    session.execute(update(Region).where(Region.id.in_(region_ids)).values(person_count=count))
+    session.execute(delete(Region).where(Region.id.in_(region_ids), Region.person_count == 0))
+
+
+def sync_person_regions(session, person_id, area_of_study):
+    """
+    Brings the regions of one person in line with their area of study.
+    Only the changed links are written, and only the affected regions are recounted. Their rows stay
+    locked until the caller commits, so concurrent saves touching the same regions wait for each other.
+    Args:
+        session (Session): Database session.
+        person_id (int): Person ID.
+        area_of_study (str): Current area of study of the person, None to unlink the person from every region.
+    """
+    regions = split_regions(area_of_study)
+    region_ids = _region_ids(session, regions)
+    current = set(session.scalars(select(PersonRegion.region_id).where(PersonRegion.person_id == person_id)))
+    locked = _lock_regions(session, set(region_ids.values()) | current)
+    # A concurrent save may have deleted a region on unlinking its last person, before it was locked here
+    while set(region_ids.values()) - locked:
+        recreated = _region_ids(session, {key: regions[key] for key, region_id in region_ids.items()
+                                          if region_id not in locked})
+        region_ids.update(recreated)
+        locked |= _lock_regions(session, set(recreated.values()))
+    wanted = set(region_ids.values())
+    removed = current - wanted
+    added = wanted - current
+    if removed:
+        session.execute(delete(PersonRegion).where(PersonRegion.person_id == person_id,
+                                                   PersonRegion.region_id.in_(removed)))
+    if added:
+        session.execute(insert(PersonRegion), [{'person_id': person_id, 'region_id': region_id}
+                                               for region_id in added])
+    _update_counts(session, removed | added)
+
+
+def rebuild_regions(connection):
+    """
+    Rebuilds the region tables from the areas of study of all persons.
+    Used after bulk imports, which bypass `sync_person_regions`. The caller commits.
+    Args:
+        connection (Connection or Session): Database connection.
+    """
+    connection.execute(delete(PersonRegion))
+    connection.execute(delete(Region))
+    regions = {}  # key -> (display name, person IDs)
+    stmt = select(Person.id, Person.area_of_study).where(Person.area_of_study.isnot(None))
+    for person_id, area_of_study in connection.execute(stmt):
+        for key, name in split_regions(area_of_study).items():
+            regions.setdefault(key, (name, []))[1].append(person_id)
+    if not regions:
+        return
+    rows = connection.execute(insert(Region).returning(Region.key, Region.id),
+                              [{'key': key, 'name': name, 'person_count': len(person_ids)}
+                               for key, (name, person_ids) in regions.items()])
+    region_ids = dict(rows.all())
+    connection.execute(insert(PersonRegion), [{'person_id': person_id, 'region_id': region_ids[key]}
+                                              for key, (_, person_ids) in regions.items()
+                                              for person_id in person_ids])
@@ -1,10 +1,19 @@
-from sqlalchemy import create_engine, ForeignKey
-from sqlalchemy.orm import DeclarativeBase, relationship, Mapped, mapped_column
+from sqlalchemy import (ForeignKey, Computed, Index, UniqueConstraint, BigInteger, DateTime, String, inspect, event,
+                        func, text, delete, literal_column)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.schema import CreateColumn, AddConstraint
+from sqlalchemy.orm import DeclarativeBase, relationship, Mapped, mapped_column, selectinload
+import os
+import threading
 import psycopg2
 from psycopg2 import sql
 from datetime import datetime
 from helper import DATABASE_USER, DATABASE_PASSWORD, DATABASE_NAME, DATABASE_HOST, DATABASE_PORT
+from helper import (DB_POOL_MODE, DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+                    DB_POOL_PRE_PING)
 from helper.cleanup.clean_dict import clean_dict
+from helper.db.pool import create_pooled_engine
+from helper.db.query_counter import instrument
 
 
 DATABASE_URL = f"postgresql://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
@@ -56,7 +65,109 @@ def create_database():
     conn.close()
 
 
-engine = create_engine(DATABASE_URL)
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Returns the engine of this process, creating it on first use.
+    Returns:
+        Engine: The engine, with the pool configured by the DB_POOL_* settings.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_pooled_engine(DATABASE_URL, mode=DB_POOL_MODE, size=DB_POOL_SIZE,
+                                               max_overflow=DB_POOL_MAX_OVERFLOW, timeout=DB_POOL_TIMEOUT,
+                                               recycle=DB_POOL_RECYCLE, pre_ping=DB_POOL_PRE_PING)
+                instrument(_engine)
+    return _engine
+
+
+def _dispose_engine_after_fork():
+    """
+    A forked process must not use the pooled connections of its parent, whose sockets it shares.
+    They are dropped without being closed, which would end them for the parent too.
+    """
+    if _engine is not None:
+        _engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dispose_engine_after_fork)
+
+
+def strip_html_sql(column):
+    """
+    Returns an immutable SQL expression with the plain text of an HTML column.
+    Style and script blocks, comments, tags and entities are replaced with spaces.
+    Args:
+        column (str): Name of the column holding HTML.
+    Returns:
+        str: SQL expression.
+    """
+    return (f"regexp_replace(regexp_replace(coalesce({column}, ''), "
+            r"'<(style|script).*?</\1>|<!--.*?-->', ' ', 'gi'), "
+            r"'<[^>]*>|&[a-z]+;', ' ', 'gi')")
+
+
+# Plain text of a person's bibliography and biography, used for full-text search snippets
+PERSON_SEARCH_TEXT_SQL = f"{strip_html_sql('bibliography')} || ' ' || {strip_html_sql('biography')}"
+
+# Bibliography outranks biography; both are stemmed as Russian and as English
+PERSON_SEARCH_VECTOR_SQL = (
+    f"setweight(to_tsvector('russian', {strip_html_sql('bibliography')}), 'A') || "
+    f"setweight(to_tsvector('english', {strip_html_sql('bibliography')}), 'A') || "
+    f"setweight(to_tsvector('russian', {strip_html_sql('biography')}), 'B') || "
+    f"setweight(to_tsvector('english', {strip_html_sql('biography')}), 'B')"
+)
+
+
+def display_name_sql(*parts):
+    """
+    Returns an immutable SQL expression joining the non-empty parts of a name with spaces.
+    Args:
+        parts (str): SQL expressions of the parts, in display order.
+    Returns:
+        str: SQL expression, never NULL.
+    """
+    # Every part brings its own leading space, the first one is cut off
+    return 'substr(' + ' || '.join(f"coalesce(' ' || nullif({part}, ''), '')" for part in parts) + ', 2)'
+
+
+def sort_key_sql(expression):
+    """
+    Returns the sort key of a display name: lower case, with ё sorted as е as in Russian dictionaries.
+    Compared byte by byte (collation "C"), which puts Cyrillic and Latin letters in alphabetical order.
+    """
+    return f"translate(lower({expression}), 'ё', 'е')"
+
+
+def sort_key(text):
+    """Python counterpart of sort_key_sql, to turn search terms into sort key prefixes."""
+    return text.lower().replace('ё', 'е')
+
+
+def sort_key_expression(column):
+    """Counterpart of sort_key_sql for a column in a query, already collated "C"."""
+    return func.translate(func.lower(column), 'ё', 'е').collate('C')
+
+
+def english_name_part(english, russian):
+    """
+    Counterpart of the coalesce(nullif(<part>_en, ''), <part>) parts of PERSON_DISPLAY_NAME_EN_SQL for a query.
+    The empty string is written inline, so the expression matches the indexes built on it whatever the driver.
+    """
+    return func.coalesce(func.nullif(english, literal_column("''")), russian)
+
+
+# Full names as shown to users; the English one falls back to the Cyrillic spelling part by part
+PERSON_DISPLAY_NAME_SQL = display_name_sql('surname', 'name', 'patronymic')
+PERSON_DISPLAY_NAME_EN_SQL = display_name_sql("coalesce(nullif(surname_en, ''), surname)",
+                                              "coalesce(nullif(name_en, ''), name)",
+                                              "coalesce(nullif(patronymic_en, ''), patronymic)")
 
 
 class Base(DeclarativeBase):
@@ -95,7 +206,13 @@ class Person(Base):
         bibliography (str): Bibliography of the person.
         photo (str): Photo of the person.
         comment (str): Additional comments.
+        search_vector (str): Full-text search vector over biography and bibliography, maintained by the database.
+        display_name (str): Full name, maintained by the database.
+        display_name_en (str): Full name in English, in Russian for the parts without an English spelling.
+        sort_name (str): Sort key of display_name, compared with collation "C".
+        sort_name_en (str): Sort key of display_name_en.
     Methods:
+        view_options(): Returns the loader options that load everything values_ru/values_en walk.
         values_ru(): Returns a dictionary of the person's attributes in Russian.
         __str__(): Returns a string representation of the person's full name.
     """
@@ -136,6 +253,25 @@ class Person(Base):
     photo: Mapped[str] = mapped_column(nullable=True)
     comment: Mapped[str] = mapped_column(nullable=True)
 
+    search_vector: Mapped[str] = mapped_column(TSVECTOR, Computed(PERSON_SEARCH_VECTOR_SQL, persisted=True),
+                                               nullable=True, deferred=True)
+
+    display_name: Mapped[str] = mapped_column(Computed(PERSON_DISPLAY_NAME_SQL, persisted=True))
+    display_name_en: Mapped[str] = mapped_column(Computed(PERSON_DISPLAY_NAME_EN_SQL, persisted=True))
+    sort_name: Mapped[str] = mapped_column(String(collation='C'),
+                                           Computed(sort_key_sql(PERSON_DISPLAY_NAME_SQL), persisted=True))
+    sort_name_en: Mapped[str] = mapped_column(String(collation='C'),
+                                              Computed(sort_key_sql(PERSON_DISPLAY_NAME_EN_SQL), persisted=True))
+
+    @classmethod
+    def view_options(cls):
+        return [
+            selectinload(cls.field_of_study).joinedload(PersonFieldOfStudy.field_of_study),
+            selectinload(cls.education).joinedload(PersonEducation.organization),
+            selectinload(cls.organizations).joinedload(OrganizationMembership.organization),
+            selectinload(cls.documents).joinedload(DocumentAuthorship.document),
+        ]
+
     def values_ru(self):
         values = {'Фамилия Имя Отчество': '<b>' + str(self) + '</b>',
                   'Дата рождения': self.birth_date,
@@ -167,7 +303,7 @@ class Person(Base):
         Structure mirrors values_ru and keeps the same data values.
         """
         values = {
-            'Full name': '<b>' + ' '.join(filter(None, (self.surname_en, self.name_en, self.patronymic_en))) + '</b>',
+            'Full name': '<b>' + self.display_name_en + '</b>',
             'Birth date': self.birth_date,
             'Birth place': self.birth_place,
             'Death date': self.death_date,
@@ -198,7 +334,15 @@ class Person(Base):
         return clean_dict(values)
 
     def __str__(self):
-        return ' '.join(filter(None, (self.surname, self.name, self.patronymic)))
+        return self.display_name
+
+
+def person_name_columns():
+    """
+    Returns the Person columns needed to display a related person's name in either language.
+    Used to keep biographies and bibliographies out of queries that only list people.
+    """
+    return (Person.id, Person.display_name, Person.display_name_en)
 
 
 class Organization(Base):
@@ -212,6 +356,8 @@ class Organization(Base):
         history (str): The history of the organization.
         comment (str): Additional comments about the organization.
     Methods:
+        view_options():
+            Returns the loader options that load everything values_ru/values_en walk.
         values_ru():
             Returns a dictionary of the organization's attributes with Russian labels.
         __str__():
@@ -229,6 +375,13 @@ class Organization(Base):
     history: Mapped[str] = mapped_column(nullable=True)
     comment: Mapped[str] = mapped_column(nullable=True)
 
+    @classmethod
+    def view_options(cls):
+        return [
+            selectinload(cls.members).joinedload(OrganizationMembership.person).load_only(*person_name_columns()),
+            selectinload(cls.alumni).joinedload(PersonEducation.person).load_only(*person_name_columns()),
+        ]
+
     def values_ru(self):
         values = {'Название': '<b>' + self.name + '</b>',
                   'Тип организации': self.org_type,
@@ -248,23 +401,17 @@ class Organization(Base):
         Returns a dictionary of the organization's attributes with English labels.
         Mirrors values_ru structure.
         """
-        def person_display(p):
-            last = p.surname_en or p.surname
-            first = p.name_en or p.name
-            patr = p.patronymic_en or p.patronymic
-            return ' '.join(filter(None, (last, first, patr)))
-
         values = {
             'Name': '<b>' + self.name + '</b>',
             'Type of organization': self.org_type,
             'History': self.history,
             'Comment': self.comment,
             'Related persons': sorted(
-                [['person', member.person.id, person_display(member.person)] for member in self.members],
+                [['person', member.person.id, member.person.display_name_en] for member in self.members],
                 key=lambda x: x[2]
             ),
             'Alumni': sorted(
-                [['person', alum.person.id, person_display(alum.person)] for alum in self.alumni],
+                [['person', alum.person.id, alum.person.display_name_en] for alum in self.alumni],
                 key=lambda x: x[2]
             ),
         }
@@ -288,6 +435,8 @@ class Document(Base):
         file (str, optional): File associated with the document.
         comment (str, optional): Additional comments about the document.
     Methods:
+        view_options():
+            Returns the loader options that load everything values_ru/values_en walk.
         values_ru():
             Returns a dictionary of document attributes with Russian keys.
         __str__():
@@ -306,6 +455,10 @@ class Document(Base):
     file: Mapped[str] = mapped_column(nullable=True)
     comment: Mapped[str] = mapped_column(nullable=True)
 
+    @classmethod
+    def view_options(cls):
+        return [selectinload(cls.authors).joinedload(DocumentAuthorship.person).load_only(*person_name_columns())]
+
     def values_ru(self):
         values = {'Авторы':
                   sorted([['person', author.person.id, str(author.person)] for author in self.authors],
@@ -324,15 +477,9 @@ class Document(Base):
         Returns a dictionary of the document's attributes with English labels.
         Mirrors values_ru structure.
         """
-        def person_display(p):
-            last = p.surname_en or p.surname
-            first = p.name_en or p.name
-            patr = p.patronymic_en or p.patronymic
-            return ' '.join(filter(None, (last, first, patr)))
-
         values = {
             'Authors': sorted(
-                [['person', author.person.id, person_display(author.person)] for author in self.authors],
+                [['person', author.person.id, author.person.display_name_en] for author in self.authors],
                 key=lambda x: x[2]
             ),
             'Source': self.source,
@@ -357,6 +504,8 @@ class FieldOfStudy(Base):
         name (str): The name of the field of study, cannot be null.
         comment (str): Additional comments about the field of study.
     Methods:
+        view_options():
+            Returns the loader options that load everything values_ru/values_en walk.
         values_ru():
             Returns a dictionary of the field of study's attributes with Russian labels.
         __str__():
@@ -368,6 +517,10 @@ class FieldOfStudy(Base):
     members: Mapped[list["OrganizationMembership"]] = \
         relationship("PersonFieldOfStudy", back_populates="field_of_study")
 
+    @classmethod
+    def view_options(cls):
+        return [selectinload(cls.members).joinedload(PersonFieldOfStudy.person).load_only(*person_name_columns())]
+
     def values_ru(self):
         values = {
             'Название': self.name,
@@ -381,16 +534,10 @@ class FieldOfStudy(Base):
         Returns a dictionary of the field of study's attributes with English labels.
         Mirrors values_ru structure.
         """
-        def person_display(p):
-            last = p.surname_en or p.surname
-            first = p.name_en or p.name
-            patr = p.patronymic_en or p.patronymic
-            return ' '.join(filter(None, (last, first, patr)))
-
         values = {
             'Name': self.name,
             'Related persons': sorted(
-                [['person', member.person.id, person_display(member.person)] for member in self.members],
+                [['person', member.person.id, member.person.display_name_en] for member in self.members],
                 key=lambda x: x[2]
             ),
         }
@@ -411,6 +558,7 @@ class OrganizationMembership(Base):
         organization (Organization): The relationship to the Organization model.
     """
     __tablename__ = 'organization_membership'
+    __table_args__ = (UniqueConstraint('person_id', 'organization_id'),)
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     person_id: Mapped[int] = mapped_column(ForeignKey('person.id'))
     organization_id: Mapped[int] = mapped_column(ForeignKey('organization.id'))
@@ -430,6 +578,7 @@ class PersonEducation(Base):
         organization (Organization): The relationship to the Organization model.
     """
     __tablename__ = 'person_education'
+    __table_args__ = (UniqueConstraint('person_id', 'organization_id'),)
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     person_id: Mapped[int] = mapped_column(ForeignKey('person.id'))
     organization_id: Mapped[int] = mapped_column(ForeignKey('organization.id'))
@@ -449,6 +598,7 @@ class DocumentAuthorship(Base):
         document (Document): The relationship to the Document model, representing the authored document.
     """
     __tablename__ = 'document_authorship'
+    __table_args__ = (UniqueConstraint('person_id', 'document_id'),)
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     person_id: Mapped[int] = mapped_column(ForeignKey('person.id'))
     document_id: Mapped[int] = mapped_column(ForeignKey('document.id'))
@@ -468,6 +618,7 @@ class PersonFieldOfStudy(Base):
         field_of_study (FieldOfStudy): The relationship to the FieldOfStudy model.
     """
     __tablename__ = 'person_field_of_study'
+    __table_args__ = (UniqueConstraint('person_id', 'field_of_study_id'),)
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     person_id: Mapped[int] = mapped_column(ForeignKey('person.id'))
     field_of_study_id: Mapped[int] = mapped_column(ForeignKey('field_of_study.id'))
@@ -476,17 +627,261 @@ class PersonFieldOfStudy(Base):
     field_of_study: Mapped["FieldOfStudy"] = relationship("FieldOfStudy")
 
 
+class Region(Base):
+    """
+    Represents a geographic region a person worked in, derived from Person.area_of_study.
+    Attributes:
+        id (int): The primary key of the region.
+        key (str): Canonical form of the name (see helper.db.geography.region_key), unique.
+        name (str): Display name of the region.
+        person_count (int): Number of persons linked to the region, kept up to date on every change.
+    """
+    __tablename__ = 'region'
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    key: Mapped[str] = mapped_column(nullable=False, unique=True)
+    name: Mapped[str] = mapped_column(nullable=False)
+    person_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default='0')
+
+
+class PersonRegion(Base):
+    """
+    Represents the relationship between a person and a region of their area of study.
+    Attributes:
+        id (int): The primary key for the person-region relationship.
+        person_id (int): The foreign key referencing the person.
+        region_id (int): The foreign key referencing the region.
+        person (Person): The relationship to the Person model.
+        region (Region): The relationship to the Region model.
+    """
+    __tablename__ = 'person_region'
+    __table_args__ = (UniqueConstraint('person_id', 'region_id'),)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    person_id: Mapped[int] = mapped_column(ForeignKey('person.id'))
+    region_id: Mapped[int] = mapped_column(ForeignKey('region.id'))
+
+    person: Mapped["Person"] = relationship("Person")
+    region: Mapped["Region"] = relationship("Region")
+
+
+class TableVersion(Base):
+    """
+    Represents the change counter of a table, read to answer conditional requests without querying the table.
+    Triggers bump it when a transaction that changed rows of the table commits, whichever program runs it.
+    Attributes:
+        table_name (str): The primary key, name of the counted table.
+        version (int): Number of committed transactions that changed the table so far.
+        modified_at (datetime): Start of the last transaction that changed the table.
+    """
+    __tablename__ = 'table_version'
+    table_name: Mapped[str] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default='0')
+    modified_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class TableVersionChange(Base):
+    """
+    Represents a table changed by a transaction in progress, whose counter is bumped when the transaction commits.
+    The rows are deleted at commit, so the table is empty between transactions.
+    Attributes:
+        txid (int): Part of the primary key, ID of the transaction.
+        table_name (str): Part of the primary key, name of the changed table.
+    """
+    __tablename__ = 'table_version_change'
+    txid: Mapped[int] = mapped_column(BigInteger, primary_key=True, server_default=text('txid_current()'))
+    table_name: Mapped[str] = mapped_column(primary_key=True)
+
+
+# Tables whose changes are counted in table_version
+VERSIONED_TABLES = ('person', 'organization', 'document', 'field_of_study', 'organization_membership',
+                    'person_education', 'document_authorship', 'person_field_of_study', 'region', 'person_region')
+
+
+def _lower_pattern_index(name, column):
+    """Index on lower(column) usable by the lower(column) LIKE 'prefix%' and lower(column) = ... filters."""
+    return Index(name, func.lower(column).label('lower_value'), postgresql_ops={'lower_value': 'text_pattern_ops'})
+
+
+def _lower_trigram_index(name, column):
+    """Trigram index on lower(column) usable by the lower(column) % ... similarity filter of fuzzy searches."""
+    return Index(name, func.lower(column).label('lower_value'), postgresql_using='gin',
+                 postgresql_ops={'lower_value': 'gin_trgm_ops'})
+
+
+Index('ix_person_search_vector', Person.search_vector, postgresql_using='gin')
+
+# Prefix and equality filters of the person searches
+_lower_pattern_index('ix_person_surname_lower', Person.surname)
+_lower_pattern_index('ix_person_name_lower', Person.name)
+# The English searches match the English parts with the Cyrillic spelling as fallback, as they are displayed
+_lower_pattern_index('ix_person_surname_en_or_ru_lower', english_name_part(Person.surname_en, Person.surname))
+_lower_pattern_index('ix_person_name_en_or_ru_lower', english_name_part(Person.name_en, Person.name))
+# Fuzzy surname searches
+_lower_trigram_index('ix_person_surname_trgm', Person.surname)
+_lower_trigram_index('ix_person_surname_en_or_ru_trgm', english_name_part(Person.surname_en, Person.surname))
+# ORDER BY sort_name of the searches and the /list keyset, and sort_name LIKE 'prefix%' of the name searches
+Index('ix_person_sort_name', Person.sort_name, Person.id)
+Index('ix_person_sort_name_en', Person.sort_name_en, Person.id)
+
+# Indexes of earlier versions that nothing uses any more, dropped by upgrade_tables
+OBSOLETE_INDEXES = ('ix_person_surname_c', 'ix_person_surname_en_c', 'ix_organization_name_lower_c',
+                    'ix_document_name_lower_c', 'ix_field_of_study_name_lower_c', 'ix_person_surname_en_lower',
+                    'ix_person_name_en_lower', 'ix_person_surname_en_trgm')
+
+# Prefix filters of the name searches, and their ORDER BY and the /list keyset on the sort key of the name
+for _model in (Organization, Document, FieldOfStudy):
+    _lower_pattern_index(f'ix_{_model.__tablename__}_name_lower', _model.name)
+    Index(f'ix_{_model.__tablename__}_name_sort', sort_key_expression(_model.name), _model.id)
+
+# Persons of a region (the unique constraint covers the regions of a person) and the most popular regions
+Index('ix_person_region_region', PersonRegion.region_id, PersonRegion.person_id)
+Index('ix_region_person_count', Region.person_count.desc(), Region.name)
+
+# The other side of every association: members and alumni of an organization, authors of a document,
+# persons of a field of study. The unique constraints on (person_id, ...) cover the person side.
+Index('ix_organization_membership_organization', OrganizationMembership.organization_id,
+      OrganizationMembership.person_id)
+Index('ix_person_education_organization', PersonEducation.organization_id, PersonEducation.person_id)
+Index('ix_document_authorship_document', DocumentAuthorship.document_id, DocumentAuthorship.person_id)
+Index('ix_person_field_of_study_field', PersonFieldOfStudy.field_of_study_id, PersonFieldOfStudy.person_id)
+
+
+@event.listens_for(Base.metadata, 'before_create')
+def _create_extensions(target, connection, **kw):
+    """Trigram indexes need the pg_trgm extension."""
+    connection.exec_driver_sql('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+
+@event.listens_for(Base.metadata, 'after_create')
+def _create_version_triggers(target, connection, **kw):
+    """
+    Counts the committed changes to every versioned table in table_version.
+
+    Statement triggers note the tables a transaction changed in table_version_change, and only when the
+    statement changed rows (its transition table is not empty), so bulk loads cost one note per table.
+    A deferred trigger on the notes bumps the counters at commit, in the order of the table names: the
+    counter rows stay locked only while the transaction commits, and concurrent transactions always
+    lock them in the same order, so they cannot deadlock on them.
+
+    The triggers are dropped and created again rather than replaced, which PostgreSQL 13 and earlier
+    cannot do.
+    """
+    connection.execute(text('''
+        CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            changed boolean;
+        BEGIN
+            -- Each branch only names the transition table its trigger has
+            IF TG_OP = 'TRUNCATE' THEN
+                changed := true;
+            ELSIF TG_OP = 'DELETE' THEN
+                changed := EXISTS (SELECT FROM old_rows);
+            ELSE
+                changed := EXISTS (SELECT FROM new_rows);
+            END IF;
+            IF changed THEN
+                INSERT INTO table_version_change (table_name) VALUES (TG_TABLE_NAME) ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END
+        $$'''))
+    connection.execute(text('''
+        CREATE OR REPLACE FUNCTION apply_table_version_changes() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            changed text;
+        BEGIN
+            FOR changed IN SELECT table_name FROM table_version_change WHERE txid = NEW.txid ORDER BY table_name LOOP
+                INSERT INTO table_version (table_name, version, modified_at) VALUES (changed, 1, now())
+                ON CONFLICT (table_name) DO UPDATE SET version = table_version.version + 1, modified_at = now();
+            END LOOP;
+            DELETE FROM table_version_change WHERE txid = NEW.txid;
+            RETURN NULL;
+        END
+        $$'''))
+    connection.execute(text('DROP TRIGGER IF EXISTS table_version_change_apply ON table_version_change'))
+    connection.execute(text('CREATE CONSTRAINT TRIGGER table_version_change_apply '
+                            'AFTER INSERT ON table_version_change DEFERRABLE INITIALLY DEFERRED '
+                            'FOR EACH ROW EXECUTE FUNCTION apply_table_version_changes()'))
+    # Transition tables are only available to triggers of a single event
+    events = (('insert', 'INSERT', 'REFERENCING NEW TABLE AS new_rows'),
+              ('update', 'UPDATE', 'REFERENCING NEW TABLE AS new_rows'),
+              ('delete', 'DELETE', 'REFERENCING OLD TABLE AS old_rows'),
+              ('truncate', 'TRUNCATE', ''))
+    for table_name in VERSIONED_TABLES:
+        # Trigger of earlier versions, bumping the counter after every statement
+        connection.execute(text(f'DROP TRIGGER IF EXISTS {table_name}_version ON {table_name}'))
+        for suffix, event_name, referencing in events:
+            connection.execute(text(f'DROP TRIGGER IF EXISTS {table_name}_version_{suffix} ON {table_name}'))
+            connection.execute(text(f'CREATE TRIGGER {table_name}_version_{suffix} AFTER {event_name} ON {table_name} '
+                                    f'{referencing} FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()'))
+        connection.execute(text('INSERT INTO table_version (table_name) VALUES (:table_name) ON CONFLICT DO NOTHING'),
+                           {'table_name': table_name})
+
+
 def create_tables():
     """
     Creates all tables defined in the metadata.
     """
-    Base.metadata.create_all(engine)
+    Base.metadata.create_all(get_engine())
     print('Tables created.')
 
 
+def _delete_duplicates(connection, table, columns):
+    """
+    Deletes the rows repeating the values of `columns` of a row with a lower ID, so that a unique constraint
+    on them can be added.
+    Args:
+        connection (Connection): Database connection.
+        table (Table): Table with an `id` column.
+        columns (ColumnCollection): Columns of the constraint.
+    Returns:
+        int: Number of deleted rows.
+    """
+    earlier = table.alias('earlier')
+    stmt = delete(table).where(table.c.id > earlier.c.id,
+                               *(table.c[column.name] == earlier.c[column.name] for column in columns))
+    return connection.execute(stmt).rowcount
+
+
+def upgrade_tables():
+    """
+    Brings the tables of an existing database up to date with the metadata.
+    Missing tables are created, missing columns are added and missing indexes are built.
+    Missing unique constraints are added once the duplicate rows they forbid are deleted, the first one is kept.
+    The triggers counting changes in table_version are (re)created and obsolete indexes are dropped.
+    Existing columns are never altered or dropped.
+    """
+    Base.metadata.create_all(get_engine())
+    with get_engine().begin() as connection:
+        inspector = inspect(connection)
+        for table in Base.metadata.sorted_tables:
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_ddl = CreateColumn(column).compile(connection)
+                    connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD {column_ddl}')
+                    print(f'Added column {table.name}.{column.name}.')
+            existing_unique = {tuple(constraint['column_names'])
+                               for constraint in inspector.get_unique_constraints(table.name)}
+            for constraint in table.constraints:
+                if not isinstance(constraint, UniqueConstraint) or tuple(constraint.columns.keys()) in existing_unique:
+                    continue
+                deleted = _delete_duplicates(connection, table, constraint.columns)
+                connection.execute(AddConstraint(constraint))
+                print(f'Added unique constraint on {table.name} ({", ".join(constraint.columns.keys())}), '
+                      f'{deleted} duplicate rows deleted.')
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    print(f'Created index {index.name}.')
+        for index_name in OBSOLETE_INDEXES:
+            connection.exec_driver_sql(f'DROP INDEX IF EXISTS {index_name}')
+    print('Tables upgraded.')
+
+
 def drop_tables():
     """
     Drops all tables defined in the metadata.
     """
-    Base.metadata.drop_all(engine)
+    Base.metadata.drop_all(get_engine())
     print('Tables dropped.')
@@ -0,0 +1,70 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_, tuple_
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and '$dt' in value:
+        return datetime.fromisoformat(value['$dt'])
+    return value
+
+
+def encode_cursor(values):
+    """
+    Encodes the sort key values of the last row of a page into an opaque cursor string.
+    Args:
+        values (list): Sort key values, in the same order as the ORDER BY keys.
+    Returns:
+        str: URL-safe cursor string.
+    """
+    payload = json.dumps([_encode_value(v) for v in values], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor produced by `encode_cursor`.
+    Args:
+        cursor (str): Cursor string taken from the request.
+    Returns:
+        list: Sort key values, or None if the cursor is malformed.
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(payload.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(values, list):
+        return None
+    return [_decode_value(v) for v in values]
+
+
+def keyset_condition(keys, values, nullable=False):
+    """
+    Builds a WHERE clause selecting the rows that sort strictly after `values`.
+    All keys are assumed to be sorted ascending, the last key must be unique (usually the primary key).
+    Non-nullable keys are compared as a single row value, which PostgreSQL can resolve with one index scan.
+    Args:
+        keys (list): ORDER BY expressions.
+        values (list): Sort key values of the last row of the previous page.
+        nullable (bool): Whether the leading key may be NULL (sorted last, as PostgreSQL does by default).
+    Returns:
+        ColumnElement: The filter condition.
+    """
+    if len(keys) != len(values):
+        raise ValueError('cursor does not match the sort keys')
+    if not nullable:
+        return tuple_(*keys) > tuple_(*values)
+    lead, rest = keys[0], keys[1:]
+    lead_value, rest_values = values[0], values[1:]
+    after_rest = tuple_(*rest) > tuple_(*rest_values)
+    if lead_value is None:
+        return and_(lead.is_(None), after_rest)
+    return or_(lead > lead_value, and_(lead == lead_value, after_rest), lead.is_(None))
@@ -0,0 +1,143 @@
+import threading
+import time
+from uuid import uuid4
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, NullPool
+
+
+class PoolMeasurements:
+    """Checkout counters of one pool."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked_out = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+class _MeasuredPool:
+    """
+    Pool mixin counting checkouts and measuring how long each one waits for a connection.
+    The counters belong to the pool, so they are per process and start over when the engine is disposed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.measurements = PoolMeasurements()
+
+    def _do_get(self):
+        measurements = self.measurements
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            with measurements.lock:
+                measurements.timeouts += 1
+            raise
+        waited = time.perf_counter() - started
+        with measurements.lock:
+            measurements.checked_out += 1
+            measurements.checkouts += 1
+            measurements.wait_total += waited
+            measurements.wait_max = max(measurements.wait_max, waited)
+        return connection
+
+    def _do_return_conn(self, record):
+        with self.measurements.lock:
+            self.measurements.checked_out = max(self.measurements.checked_out - 1, 0)
+        super()._do_return_conn(record)
+
+
+class MeasuredQueuePool(_MeasuredPool, QueuePool):
+    pass
+
+
+class MeasuredNullPool(_MeasuredPool, NullPool):
+    pass
+
+
+def create_pooled_engine(url, mode='session', size=5, max_overflow=10, timeout=30, recycle=1800, pre_ping=True):
+    """
+    Creates the engine with the configured connection pool.
+    Args:
+        url (str): Database URL.
+        mode (str): 'session' keeps a pool of connections in every process. 'transaction' opens a connection
+            per checkout and closes it on checkin, leaving pooling to PgBouncer in transaction pooling mode.
+        size (int): Connections kept open per process ('session' mode).
+        max_overflow (int): Connections opened beyond `size` under load and closed once returned ('session' mode).
+        timeout (int): Seconds to wait for a free connection before failing ('session' mode).
+        recycle (int): Seconds after which a connection is replaced, -1 to keep connections forever ('session' mode).
+        pre_ping (bool): Test connections on checkout and replace the ones the server has closed.
+    Returns:
+        Engine: The engine.
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    if mode == 'session':
+        return create_engine(url, poolclass=MeasuredQueuePool, pool_size=size, max_overflow=max_overflow,
+                             pool_timeout=timeout, pool_recycle=recycle, pool_pre_ping=pre_ping)
+    if mode == 'transaction':
+        # Connections never outlive a checkout, so there is nothing to recycle or ping
+        return create_engine(url, poolclass=MeasuredNullPool)
+    raise ValueError(f"Unknown pool mode {mode!r}, expected 'session' or 'transaction'")
+
+
+def create_async_pooled_engine(url, mode='session', size=5, max_overflow=10, timeout=30, recycle=1800, pre_ping=True):
+    """
+    Creates an asyncio engine over asyncpg with the same pool settings as `create_pooled_engine`.
+    Requires the `asyncpg` package.
+    Args:
+        url (str): Database URL, the driver is replaced by asyncpg.
+        mode (str): 'session' or 'transaction', see `create_pooled_engine`.
+        size, max_overflow, timeout, recycle, pre_ping: See `create_pooled_engine`.
+    Returns:
+        AsyncEngine: The engine.
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+    url = make_url(url).set(drivername='postgresql+asyncpg')
+    if mode == 'session':
+        return create_async_engine(url, pool_size=size, max_overflow=max_overflow, pool_timeout=timeout,
+                                   pool_recycle=recycle, pool_pre_ping=pre_ping)
+    if mode == 'transaction':
+        # asyncpg prepares every statement; PgBouncer may run the next one on another server connection,
+        # so prepared statements must not be cached and their names must not repeat
+        return create_async_engine(url, poolclass=NullPool,
+                                   connect_args={'statement_cache_size': 0,
+                                                 'prepared_statement_name_func': lambda: f'__asyncpg_{uuid4()}__'})
+    raise ValueError(f"Unknown pool mode {mode!r}, expected 'session' or 'transaction'")
+
+
+def pool_stats(engine):
+    """
+    Returns the connection pool statistics of the current process.
+    Args:
+        engine (Engine): Engine created by `create_pooled_engine`.
+    Returns:
+        dict: Pool class, connections checked out and idle, configured size and overflow in use,
+            number of checkouts and timeouts, average and maximum checkout wait in milliseconds.
+    """
+    pool = engine.pool
+    result = {'class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        result.update(size=pool.size(), idle=pool.checkedin(), overflow=max(pool.overflow(), 0),
+                      checked_out=pool.checkedout())
+    else:
+        result.update(size=None, idle=0, overflow=None)
+    measurements = getattr(pool, 'measurements', None)
+    if measurements is not None:
+        with measurements.lock:
+            checkouts = measurements.checkouts
+            result.setdefault('checked_out', measurements.checked_out)
+            result.update(
+                checkouts=checkouts,
+                timeouts=measurements.timeouts,
+                wait_avg_ms=round(measurements.wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                wait_max_ms=round(measurements.wait_max * 1000, 3),
+            )
+    return result
@@ -0,0 +1,32 @@
+"""
+pytest fixtures keeping routes within a query budget. Enable them with
+`pytest -p helper.db.pytest_plugin`, or `pytest_plugins = ['helper.db.pytest_plugin']` in a conftest.py:
+
+    def test_person_page(client, query_budget):
+        with query_budget(6):
+            assert client.get('/view?type=person&id=1').status_code == 200
+"""
+from contextlib import contextmanager
+import pytest
+from helper.db.initialise_database import get_engine
+from helper.db.query_counter import count_queries, instrument
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Returns a context manager failing the test when its block executes more than `max_queries` statements,
+    or any single statement at least `max_repeats` times (an N+1 pattern), if given.
+    The block's QueryStats are yielded for further assertions.
+    """
+    instrument(get_engine())
+
+    @contextmanager
+    def budget(max_queries, max_repeats=None):
+        with count_queries(track_statements=True) as stats:
+            yield stats
+        assert stats.count <= max_queries, f'query budget of {max_queries} exceeded: {stats.report()}'
+        if max_repeats is not None:
+            assert not stats.repeated(max_repeats), f'statements repeated {max_repeats}+ times: {stats.report()}'
+
+    return budget
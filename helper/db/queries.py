@@ -0,0 +1,257 @@
+from sqlalchemy import select, func, extract, and_, literal_column
+from helper import FULLTEXT_RESULTS_LIMIT, LIST_PAGE_SIZE
+from helper.db.initialise_database import (Organization, Person, Document, FieldOfStudy, PERSON_SEARCH_TEXT_SQL,
+                                           english_name_part, sort_key, sort_key_expression)
+from helper.db.pagination import decode_cursor, keyset_condition
+
+
+# Statements behind the read endpoints, shared by the Flask views in main.py and the asyncio API in api.py
+
+OBJECT_MODELS = {'org': Organization, 'person': Person, 'doc': Document, 'field_of_study': FieldOfStudy}
+
+
+def localized_name_parts(use_en):
+    """
+    Returns the person name parts in display order. The English parts fall back to the Russian spelling,
+    as the English display name does.
+    Args:
+        use_en (bool): Use the English parts.
+    Returns:
+        tuple: (surname, name, patronymic) expressions.
+    """
+    if use_en:
+        return (english_name_part(Person.surname_en, Person.surname), english_name_part(Person.name_en, Person.name),
+                english_name_part(Person.patronymic_en, Person.patronymic))
+    return Person.surname, Person.name, Person.patronymic
+
+
+def localized_display_columns(use_en):
+    """
+    Returns the stored display name and sort key columns of persons.
+    Args:
+        use_en (bool): Use the English columns.
+    Returns:
+        tuple: (display name, sort key) columns.
+    """
+    if use_en:
+        return Person.display_name_en, Person.sort_name_en
+    return Person.display_name, Person.sort_name
+
+
+def fulltext_statement(content, use_en):
+    """
+    Builds the ranked full-text search over biographies and bibliographies.
+    Args:
+        content (str): Search query, in web search syntax.
+        use_en (bool): Return the English names.
+    Returns:
+        Select: Rows of (id, display name, highlighted snippet), best matches first.
+    """
+    display_col, _ = localized_display_columns(use_en)
+    tsquery = func.websearch_to_tsquery('russian', content).op('||')(func.websearch_to_tsquery('english', content))
+    rank = func.ts_rank_cd(Person.search_vector, tsquery).label('rank')
+    ranked = (
+        select(Person.id, rank)
+        .where(Person.search_vector.op('@@')(tsquery))
+        .order_by(rank.desc(), Person.id)
+        .limit(FULLTEXT_RESULTS_LIMIT)
+        .subquery()
+    )
+    # Snippets are only built for the rows that made the cut
+    snippet = func.ts_headline('russian', literal_column(PERSON_SEARCH_TEXT_SQL), tsquery,
+                               'StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15')
+    return (
+        select(Person.id, display_col, snippet)
+        .join(ranked, Person.id == ranked.c.id)
+        .order_by(ranked.c.rank.desc(), Person.id)
+    )
+
+
+def content_statement(content):
+    """
+    Builds the bibliography substring search.
+    Args:
+        content (str): Substring to look for.
+    Returns:
+        Select: Rows of (id, display name).
+    """
+    return (
+        select(Person.id, Person.display_name)
+        .where(Person.bibliography.ilike(f'%{content}%'))
+        .order_by(Person.sort_name, Person.id)
+    )
+
+
+def person_search_statement(args, use_en):
+    """
+    Builds the person attribute search.
+    Name prefixes are looked up in the sort key index, which also returns the rows in display order;
+    the parts of a full name are then compared one by one.
+    With fuzzy=1 the surname is matched by trigram similarity (typos tolerated) and the other parts by prefix.
+    Args:
+        args (Mapping): Query parameters: fullName, or firstName/lastName/patronymic; birthYear, fuzzy.
+        use_en (bool): Match and return the English names.
+    Returns:
+        Select: Rows of (id, display name).
+    Raises:
+        ValueError: If birthYear is not a number.
+    """
+    last_col, first_col, patr_col = localized_name_parts(use_en)
+    display_col, sort_col = localized_display_columns(use_en)
+    fuzzy = bool(args.get('fuzzy'))
+    where_stmt = []
+    surname_term = None
+    if len(set(args.keys()).intersection({'firstName', 'lastName', 'patronymic'})) == 0:
+        query = args.get('fullName')
+        if query is not None:
+            parts = query.split()
+            if fuzzy and 1 <= len(parts) <= 3:
+                surname_term = parts[0].lower()
+                where_stmt.append(func.lower(last_col).op('%')(surname_term))
+                for col, part in zip((first_col, patr_col), parts[1:]):
+                    where_stmt.append(func.lower(col).startswith(part.lower()))
+            elif len(parts) == 1:
+                where_stmt.append(sort_col.startswith(sort_key(parts[0]), autoescape=True))
+            elif len(parts) in (2, 3):
+                where_stmt.append(sort_col.startswith(sort_key(' '.join(parts)), autoescape=True))
+                for col, part in zip((last_col, first_col, patr_col), parts):
+                    where_stmt.append(func.lower(col) == part.lower())
+    else:
+        firstname = args.get('firstName')
+        lastname = args.get('lastName')
+        patronymic = args.get('patronymic')
+        if firstname:
+            where_stmt.append(func.lower(first_col).startswith(firstname.lower()))
+        if lastname and fuzzy:
+            surname_term = lastname.lower()
+            where_stmt.append(func.lower(last_col).op('%')(surname_term))
+        elif lastname:
+            where_stmt.append(sort_col.startswith(sort_key(lastname), autoescape=True))
+        if patronymic:
+            where_stmt.append(func.lower(patr_col).startswith(patronymic.lower()))
+
+    year_query = args.get('birthYear')
+    if year_query is not None:
+        where_stmt.append(extract('year', Person.birth_date) == int(year_query))
+
+    final_where = and_(*where_stmt) if where_stmt else True
+    order_by = [sort_col, Person.id]
+    if surname_term is not None:
+        # Closest spellings first
+        order_by.insert(0, func.similarity(func.lower(last_col), surname_term).desc())
+    return (
+        select(Person.id, display_col)
+        .where(final_where)
+        .order_by(*order_by)
+    )
+
+
+def name_search_statement(obj_type, query):
+    """
+    Builds the name prefix search of organizations, documents and fields of study.
+    Args:
+        obj_type (str): 'org', 'doc' or 'field_of_study'.
+        query (str): Name prefix, empty or None to list everything.
+    Returns:
+        Select: Rows of (id, name).
+    """
+    obj = OBJECT_MODELS[obj_type]
+    stmt = select(obj.id, obj.name)
+    if query:
+        stmt = stmt.where(func.lower(obj.name).startswith(query.lower()))
+    return stmt.order_by(sort_key_expression(obj.name), obj.id)
+
+
+def search_result(obj_type, row):
+    """
+    Converts a row of a search or list statement into the [type, id, display name] triple shown to users.
+    Args:
+        obj_type (str): Object type.
+        row (Row): (id, display name, ...).
+    Returns:
+        list: [type, id, display name].
+    """
+    return [obj_type, row[0], row[1]]
+
+
+# Fields /list can be sorted by; the first one is the default, the display name
+LIST_SORT_FIELDS = {
+    'person': ('surname', 'name', 'patronymic', 'surname_en', 'name_en', 'patronymic_en', 'birth_date', 'death_date',
+               'birth_place', 'death_place', 'academic_degree'),
+    'org': ('name', 'org_type'),
+    'doc': ('name', 'doc_type', 'language', 'source', 'year'),
+    'field_of_study': ('name',),
+}
+
+
+def _cursor_matches(values, key_types, nullable):
+    """Tells whether decoded cursor values have the Python types of the sort keys, so they can be compared in SQL."""
+    for position, (value, expected) in enumerate(zip(values, key_types)):
+        if value is None:
+            if not (nullable and position == 0):
+                return False
+            continue
+        if isinstance(value, bool) or not isinstance(value, expected):
+            return False
+    return True
+
+
+def list_statement(obj_type, sort_field=None, after=None, limit=None):
+    """
+    Builds one keyset-paginated page of /list.
+    Args:
+        obj_type (str): Object type ('org', 'person', 'doc', 'field_of_study').
+        sort_field (str): One of LIST_SORT_FIELDS, None for the display name.
+        after (str): Cursor of the previous page, or None for the first page.
+        limit (int): Page size, capped at LIST_PAGE_SIZE, or None for no limit.
+    Returns:
+        tuple: (statement, number of leading result columns, page size). The statement selects one row
+            more than the page size, the rows end with the sort key values to encode the next cursor from.
+    Raises:
+        LookupError: If the type, sort field or cursor is invalid.
+    """
+    if obj_type not in OBJECT_MODELS:
+        raise LookupError(f'unknown type {obj_type!r}')
+    obj = OBJECT_MODELS[obj_type]
+    sort_field = sort_field or LIST_SORT_FIELDS[obj_type][0]
+    if sort_field not in LIST_SORT_FIELDS[obj_type]:
+        raise LookupError(f'unknown sort field {sort_field!r}')
+    sort_column = obj.__table__.columns[sort_field]
+    nullable = sort_column.nullable
+    if obj_type == 'person':
+        columns = [Person.id, Person.display_name]
+        if sort_field == 'surname':
+            # The display name starts with the surname, its sort key is indexed
+            sort_keys = [Person.sort_name, Person.id]
+        else:
+            sort_keys = [getattr(Person, sort_field), Person.id]
+    else:
+        columns = [obj.id, obj.name]
+        sort_keys = [sort_key_expression(getattr(obj, sort_field)), obj.id]
+
+    stmt = select(*columns, *[key.label(f'sort_key_{i}') for i, key in enumerate(sort_keys)]).order_by(*sort_keys)
+    if after:
+        cursor_values = decode_cursor(after)
+        if (cursor_values is None or len(cursor_values) != len(sort_keys)
+                or not _cursor_matches(cursor_values, (sort_column.type.python_type, int), nullable)):
+            raise LookupError('invalid cursor')
+        stmt = stmt.where(keyset_condition(sort_keys, cursor_values, nullable=nullable))
+    if limit is not None:
+        limit = max(1, min(limit, LIST_PAGE_SIZE))
+        # One extra row tells whether a next page exists
+        stmt = stmt.limit(limit + 1)
+    return stmt, len(columns), limit
+
+
+def view_statement(obj_type, obj_id):
+    """
+    Builds the query loading a record with every relationship its values_ru/values_en methods walk,
+    so a page costs a fixed number of queries and no lazy loads are needed.
+    Args:
+        obj_type (str): Object type ('org', 'person', 'doc', 'field_of_study').
+        obj_id (int): Object ID.
+    Returns:
+        Select: The statement, yielding the record or nothing.
+    """
+    obj = OBJECT_MODELS[obj_type]
+    return select(obj).where(obj.id == obj_id).options(*obj.view_options())
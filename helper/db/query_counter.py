@@ -0,0 +1,139 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+
+
+class QueryStats:
+    """
+    Queries issued inside one `count_queries` block.
+    Attributes:
+        count (int): Number of statements executed.
+        duration (float): Seconds spent executing them, as seen by the driver.
+        statements (Counter): Executions per SQL text, only filled when tracking statements.
+        parent (QueryStats): Enclosing count, which sees the same queries (e.g. a test around a request).
+    """
+
+    def __init__(self, track_statements=False, parent=None):
+        self.parent = parent
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter() if track_statements else None
+
+    def repeated(self, threshold):
+        """
+        Returns the statements executed at least `threshold` times, the usual sign of an N+1 pattern:
+        the same SELECT run once per row of a previous result instead of once for all of them.
+        Args:
+            threshold (int): Executions from which a statement counts as repeated.
+        Returns:
+            list: (count, SQL text) pairs, most repeated first. Empty unless statements are tracked.
+        """
+        if self.statements is None:
+            return []
+        return [(count, statement) for statement, count in self.statements.most_common() if count >= threshold]
+
+    def report(self, threshold=2):
+        """Returns a readable summary, listing the repeated statements."""
+        lines = [f'{self.count} queries in {self.duration * 1000:.1f}ms']
+        for count, statement in self.repeated(threshold):
+            lines.append(f'{count}x {" ".join(statement.split())[:300]}')
+        return '\n'.join(lines)
+
+
+# Statistics being recorded in the current request, test or task; None when nothing is counting
+_current = ContextVar('higeo_query_stats', default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault('higeo_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    started = conn.info.get('higeo_query_started')
+    duration = time.perf_counter() - started.pop() if started else 0.0
+    while stats is not None:
+        stats.duration += duration
+        stats.count += 1
+        if stats.statements is not None:
+            stats.statements[statement] += 1
+        stats = stats.parent
+
+
+def instrument(engine):
+    """
+    Makes `count_queries` see the statements executed on an engine. Without an active count the
+    listeners return immediately, so an instrumented engine costs almost nothing.
+    Args:
+        engine (Engine): The engine to instrument; instrumenting it again has no effect.
+    """
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+@contextmanager
+def count_queries(track_statements=False):
+    """
+    Counts the queries executed on instrumented engines inside the block, in this thread or task.
+    Args:
+        track_statements (bool): Also count executions per SQL text, for `QueryStats.repeated`.
+    Yields:
+        QueryStats: Filled in as queries run.
+    """
+    stats = QueryStats(track_statements, parent=_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def init_query_counting(app, debug=False, repeat_threshold=5):
+    """
+    With `debug`, counts the queries of every request of a Flask application, reports them in a
+    Server-Timing header (shown by the browser's developer tools) and prints a warning about statements
+    repeated at least `repeat_threshold` times in one request. Without it nothing is installed: the
+    header would tell every visitor about the database.
+    Queries run while a streamed response is sent are not in the header, but are in the warning.
+    Args:
+        app (Flask): The application.
+        debug (bool): Count queries, report them and warn about N+1 patterns.
+        repeat_threshold (int): Executions from which a statement counts as repeated.
+    """
+    from flask import g, request
+
+    if not debug:
+        return
+
+    @app.before_request
+    def start_counting():
+        stats = QueryStats(track_statements=True, parent=_current.get())
+        g.query_stats = stats
+        g.query_stats_token = _current.set(stats)
+
+    @app.after_request
+    def add_server_timing(response):
+        stats = g.get('query_stats')
+        if stats is not None:
+            response.headers.add('Server-Timing', f'db;desc="{stats.count} queries";dur={stats.duration * 1000:.1f}')
+        return response
+
+    @app.teardown_request
+    def stop_counting(exc=None):
+        stats = g.pop('query_stats', None)
+        token = g.pop('query_stats_token', None)
+        if token is not None:
+            try:
+                _current.reset(token)
+            except ValueError:
+                # Torn down in another context, e.g. after streaming; the value dies with that context
+                pass
+        if stats is not None and stats.repeated(repeat_threshold):
+            print(f'WARNING: possible N+1 queries in {request.method} {request.full_path}: '
+                  f'{stats.report(repeat_threshold)}')
@@ -0,0 +1,68 @@
+from itertools import groupby
+
+
+LIST_COLUMNS = 4
+
+
+def split_columns(items, num_cols=LIST_COLUMNS):
+    """
+    Splits a list of results into columns, filling each column before moving on to the next one.
+    Args:
+        items (list): Results to split.
+        num_cols (int): Number of columns.
+    Returns:
+        list: `num_cols` lists, each holding at most ceil(len(items) / num_cols) results.
+    """
+    items_per_col = (len(items) + num_cols - 1) // num_cols
+    return [items[col * items_per_col:(col + 1) * items_per_col] for col in range(num_cols)]
+
+
+def group_by_letter(results, num_cols=LIST_COLUMNS, sorted_by_name=True):
+    """
+    Groups results by the first letter of their display name.
+    When the results are ordered by display name, buckets are produced lazily and only one of them
+    is held in memory at a time, so the results can come straight from a database cursor.
+    Otherwise all results are collected first and every letter gets a single bucket, in order of
+    first appearance.
+    Args:
+        results (iterable): [type, id, display name] results.
+        num_cols (int): Number of columns to split every bucket into.
+        sorted_by_name (bool): Whether the results are ordered by display name.
+    Yields:
+        tuple: (letter, columns) for every bucket, columns as returned by `split_columns`.
+    """
+    def first_letter(item):
+        # Matches the sort keys, which ignore case and sort ё as е
+        return item[2][:1].upper().replace('Ё', 'Е')
+
+    if sorted_by_name:
+        for letter, items in groupby(results, key=first_letter):
+            yield letter, split_columns(list(items), num_cols)
+        return
+    buckets = {}
+    for item in results:
+        buckets.setdefault(first_letter(item), []).append(item)
+    for letter, items in buckets.items():
+        yield letter, split_columns(items, num_cols)
+
+
+def buffered(chunks, size=16384):
+    """
+    Joins small template chunks into larger writes without holding back more than `size` characters.
+    Args:
+        chunks (iterable): Strings produced by a streamed template.
+        size (int): Number of characters to collect before yielding.
+    Yields:
+        str: Joined chunks.
+    """
+    buffer = []
+    length = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer)
@@ -1,9 +1,10 @@
 from flask import redirect, request, url_for, Blueprint, abort
 from flask_login import login_user, LoginManager, logout_user
 from oauthlib.oauth2 import WebApplicationClient
-from helper import GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_DISCOVERY_URL, ADMIN_DATA
+from helper import (GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_DISCOVERY_URL, ADMIN_DATA,
+                    OAUTH_DISCOVERY_TTL, OAUTH_HTTP_TIMEOUT)
 from helper.login.objects import User
-import requests
+from helper.login.provider import OAuthProvider, ProviderUnavailable
 import json
 
 
@@ -11,11 +12,8 @@ app_login = Blueprint('app_login', __name__)
 login_manager = LoginManager(app_login)
 login_manager.login_view = 'login'
 
-try:
-    google_provider_cfg = requests.get(GOOGLE_DISCOVERY_URL).json()
-except requests.exceptions.ConnectionError:
-    print('WARNING: google authentication is not working. Either no internet connection or google is unreachable')
-    google_provider_cfg = None  # This will throw errors when you try to log in.
+# The discovery document is fetched on the first login, not when a worker starts
+provider = OAuthProvider(GOOGLE_DISCOVERY_URL, ttl=OAUTH_DISCOVERY_TTL, timeout=OAUTH_HTTP_TIMEOUT)
 
 client = WebApplicationClient(GOOGLE_CLIENT_ID)
 
@@ -29,7 +27,11 @@ def load_user(user_id):
 
 @app_login.route('/login', methods=['GET', 'POST'])
 def login():
-    authorization_endpoint = google_provider_cfg["authorization_endpoint"]
+    try:
+        authorization_endpoint = provider.endpoint("authorization_endpoint")
+    except ProviderUnavailable as e:
+        print(f'WARNING: google authentication is not working: {e}')
+        abort(503)
     request_uri = client.prepare_request_uri(
         authorization_endpoint,
         redirect_uri=request.base_url + "/callback",
@@ -46,24 +48,28 @@ def logout():
 @app_login.route("/login/callback")
 def callback():
     code = request.args.get("code")
-    google_provider_cfg = requests.get(GOOGLE_DISCOVERY_URL).json()
-    token_endpoint = google_provider_cfg["token_endpoint"]
+    try:
+        token_endpoint = provider.endpoint("token_endpoint")
+        userinfo_endpoint = provider.endpoint("userinfo_endpoint")
+    except ProviderUnavailable as e:
+        print(f'WARNING: google authentication is not working: {e}')
+        abort(503)
     token_url, headers, body = client.prepare_token_request(
         token_endpoint,
         authorization_response=request.url,
         redirect_url=request.base_url,
         code=code
     )
-    token_response = requests.post(
+    token_response = provider.session.post(
         token_url,
         headers=headers,
         data=body,
-        auth=(GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET)
+        auth=(GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET),
+        timeout=OAUTH_HTTP_TIMEOUT
     )
     client.parse_request_body_response(json.dumps(token_response.json()))
-    userinfo_endpoint = google_provider_cfg["userinfo_endpoint"]
     uri, headers, body = client.add_token(userinfo_endpoint)
-    userinfo_response = requests.get(uri, headers=headers, data=body)
+    userinfo_response = provider.session.get(uri, headers=headers, data=body, timeout=OAUTH_HTTP_TIMEOUT)
 
     if userinfo_response.json().get("email_verified"):
         user_email = userinfo_response.json()["email"]
@@ -74,7 +80,7 @@ def callback():
         if value == user_email:
             user = User(key, value)
             login_user(user)
-            return redirect(url_for('search'))
+            return redirect(url_for('views.search'))
     else:
         abort(403)
 
@@ -0,0 +1,112 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class ProviderUnavailable(Exception):
+    """Raised when a provider document has never been fetched and cannot be fetched now."""
+
+
+class _CachedDocument:
+    """
+    JSON document fetched on first use and kept for `ttl` seconds. Once expired, the old copy is still
+    returned while a background thread fetches the new one, and kept if that fetch fails.
+    """
+
+    def __init__(self, fetch, ttl):
+        self._fetch = fetch
+        self.ttl = ttl
+        # (document, monotonic time it was fetched), replaced as a whole so readers never see half of an update
+        self._entry = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self):
+        entry = self._entry
+        if entry is None:
+            with self._lock:
+                if self._entry is None:
+                    self._store(self._fetch())
+                entry = self._entry
+            return entry[0]
+        if time.monotonic() - entry[1] > self.ttl:
+            self._refresh_in_background()
+        return entry[0]
+
+    def refresh(self):
+        """Fetches the document now. On failure the old copy is kept and the error is raised."""
+        value = self._fetch()
+        with self._lock:
+            self._store(value)
+
+    def _store(self, value):
+        self._entry = (value, time.monotonic())
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self.refresh()
+        except ProviderUnavailable as e:
+            print(f'WARNING: could not refresh the identity provider configuration, keeping the old one: {e}')
+        finally:
+            self._refreshing = False
+
+
+class OAuthProvider:
+    """
+    OpenID Connect provider: its discovery document, fetched lazily through one pooled HTTP session
+    and cached. Every endpoint comes from the discovery document, so pointing the discovery URL at a
+    local stand-in identity provider is enough to test the login flow.
+    """
+
+    def __init__(self, discovery_url, ttl=3600, timeout=10, session=None):
+        self.discovery_url = discovery_url
+        self.timeout = timeout
+        self.session = session or self._create_session()
+        self._discovery = _CachedDocument(lambda: self._get_json(self.discovery_url), ttl)
+
+    @staticmethod
+    def _create_session():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _get_json(self, url):
+        if not url:
+            raise ProviderUnavailable('no URL configured')
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise ProviderUnavailable(f'{url}: {e}') from e
+
+    def config(self):
+        """
+        Returns the discovery document.
+        Returns:
+            dict: Provider configuration (authorization_endpoint, token_endpoint, userinfo_endpoint, jwks_uri, ...).
+        Raises:
+            ProviderUnavailable: If the document has never been fetched and the provider cannot be reached.
+        """
+        return self._discovery.get()
+
+    def endpoint(self, name):
+        """
+        Returns one endpoint of the discovery document, e.g. 'token_endpoint'.
+        Raises:
+            ProviderUnavailable: If the provider cannot be reached or does not advertise the endpoint.
+        """
+        url = self.config().get(name)
+        if not url:
+            raise ProviderUnavailable(f'{name} is missing from the discovery document')
+        return url
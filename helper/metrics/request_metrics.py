@@ -0,0 +1,221 @@
+import threading
+import time
+from bisect import bisect_left
+
+
+# Upper bounds of the histogram buckets: request duration in seconds, response size in bytes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# WSGI environ key holding the (route, mode) labels of a request once it has been routed
+LABELS_KEY = 'higeo.metrics_labels'
+
+
+def search_mode(args):
+    """
+    Names the branch of /search that serves a request, mirroring the order of the checks in the view.
+    Args:
+        args (MultiDict): Query parameters.
+    Returns:
+        str: 'form', 'quicksearch', 'fulltext', 'content', 'person', 'name' or 'other'.
+    """
+    if not args or not args.get('type'):
+        return 'form'
+    if args.get('quicksearch') and args.get('type') == 'person':
+        return 'quicksearch'
+    if args.get('fulltext'):
+        return 'fulltext'
+    if args.get('content'):
+        return 'content'
+    if args.get('type') == 'person':
+        return 'person'
+    if args.get('type') in ('org', 'doc', 'field_of_study'):
+        return 'name'
+    return 'other'
+
+
+class _Histogram:
+    """Cumulative bucket counts, sum and count of observed values."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.buckets):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class RequestMetrics:
+    """
+    Per-route request metrics of this process: latency and response size histograms, responses by
+    status and requests in flight, labelled by route and (for /search) search mode.
+    Recording a request costs one lock acquisition and a few additions.
+    Each worker process keeps its own metrics; Prometheus tells workers apart by their instance address.
+    """
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, size_buckets=SIZE_BUCKETS):
+        self.latency_buckets = latency_buckets
+        self.size_buckets = size_buckets
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._size = {}
+        self._statuses = {}
+        self._in_flight = {}
+
+    def begin(self, labels):
+        with self._lock:
+            self._in_flight[labels] = self._in_flight.get(labels, 0) + 1
+
+    def end(self, labels, status, size, duration):
+        """
+        Records a finished request.
+        Args:
+            labels (tuple): (route, mode) passed to `begin`.
+            status (str): Status code.
+            size (int): Bytes sent in the response body.
+            duration (float): Seconds from the start of the request until the response was sent.
+        """
+        with self._lock:
+            self._in_flight[labels] -= 1
+            latency = self._latency.get(labels)
+            if latency is None:
+                latency = self._latency[labels] = _Histogram(self.latency_buckets)
+                self._size[labels] = _Histogram(self.size_buckets)
+            latency.observe(duration)
+            self._size[labels].observe(size)
+            key = labels + (status,)
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+
+    def render(self):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        Returns:
+            str: The metrics.
+        """
+        def label_text(route, mode):
+            return f'route="{route}",mode="{mode}"'
+
+        lines = []
+        with self._lock:
+            lines.append('# HELP higeo_request_duration_seconds Time until the response has been sent.')
+            lines.append('# TYPE higeo_request_duration_seconds histogram')
+            for labels, histogram in sorted(self._latency.items()):
+                lines.extend(histogram.lines('higeo_request_duration_seconds', label_text(*labels)))
+            lines.append('# HELP higeo_response_size_bytes Size of the response body.')
+            lines.append('# TYPE higeo_response_size_bytes histogram')
+            for labels, histogram in sorted(self._size.items()):
+                lines.extend(histogram.lines('higeo_response_size_bytes', label_text(*labels)))
+            lines.append('# HELP higeo_responses_total Responses by status code.')
+            lines.append('# TYPE higeo_responses_total counter')
+            for (route, mode, status), count in sorted(self._statuses.items()):
+                lines.append(f'higeo_responses_total{{{label_text(route, mode)},status="{status}"}} {count}')
+            lines.append('# HELP higeo_requests_in_flight Requests being processed.')
+            lines.append('# TYPE higeo_requests_in_flight gauge')
+            for labels, count in sorted(self._in_flight.items()):
+                lines.append(f'higeo_requests_in_flight{{{label_text(*labels)}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+class _MeasuredResponse:
+    """Response body that counts the bytes sent and reports when the server closes it."""
+
+    def __init__(self, app_iter, on_close):
+        self._app_iter = app_iter
+        self._on_close = on_close
+        self.size = 0
+
+    def __iter__(self):
+        for chunk in self._app_iter:
+            self.size += len(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            if hasattr(self._app_iter, 'close'):
+                self._app_iter.close()
+        finally:
+            self._on_close(self.size)
+
+
+class MetricsMiddleware:
+    """
+    WSGI middleware timing every request until its body has been sent, so streamed pages are measured
+    in full. Requests are only recorded once the application has labelled them (see `init_metrics`).
+    Files the application returns through the server's `wsgi.file_wrapper` (uploads, static files) are
+    passed through untouched, so the server can still send them with sendfile; they are recorded when
+    the application returns them, with the size of their Content-Length header.
+    """
+
+    def __init__(self, wsgi_app, metrics):
+        self.wsgi_app = wsgi_app
+        self.metrics = metrics
+
+    def __call__(self, environ, start_response):
+        started = time.perf_counter()
+        status = []
+        content_length = []
+
+        def measured_start_response(status_line, headers, exc_info=None):
+            status[:] = [status_line.split(' ', 1)[0]]
+            content_length[:] = [value for name, value in headers if name.lower() == 'content-length']
+            return start_response(status_line, headers, exc_info)
+
+        def finish(size):
+            labels = environ.get(LABELS_KEY)
+            if labels is not None:
+                self.metrics.end(labels, status[0] if status else '500', size, time.perf_counter() - started)
+
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        wrapped_files = []
+        if file_wrapper is not None:
+            def recording_file_wrapper(*args, **kwargs):
+                wrapped = file_wrapper(*args, **kwargs)
+                wrapped_files.append(wrapped)
+                return wrapped
+            environ['wsgi.file_wrapper'] = recording_file_wrapper
+
+        try:
+            app_iter = self.wsgi_app(environ, measured_start_response)
+        except Exception:
+            finish(0)
+            raise
+        finally:
+            # Servers recognise file responses with isinstance(app_iter, environ['wsgi.file_wrapper'])
+            if file_wrapper is not None:
+                environ['wsgi.file_wrapper'] = file_wrapper
+        if any(app_iter is wrapped for wrapped in wrapped_files):
+            finish(int(content_length[0]) if content_length and content_length[0].isdigit() else 0)
+            return app_iter
+        return _MeasuredResponse(app_iter, finish)
+
+
+def init_metrics(app, metrics):
+    """
+    Records the requests of a Flask application in `metrics`.
+    Args:
+        app (Flask): The application.
+        metrics (RequestMetrics): Where to record.
+    """
+    from flask import request
+
+    @app.before_request
+    def label_request():
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        labels = (route, search_mode(request.args) if route == '/search' else '')
+        request.environ[LABELS_KEY] = labels
+        metrics.begin(labels)
+
+    app.wsgi_app = MetricsMiddleware(app.wsgi_app, metrics)
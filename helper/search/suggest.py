@@ -0,0 +1,182 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from sqlalchemy import select
+from helper.db.initialise_database import Person, Organization, Document, FieldOfStudy, sort_key
+
+
+class PrefixIndex:
+    """
+    In-memory prefix index over display names, one sorted array per object type.
+    A lookup is a binary search followed by a scan over the matching entries, so it only costs
+    O(log n + limit). Single changes are applied in place, by binary search, under the lock readers take.
+    Changes made while the whole index is being rebuilt are applied to the rebuilt index as well,
+    so they are not lost if the data it was rebuilt from predates them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # type -> sorted list of (key, id, display)
+        self._keys = {}  # (type, id) -> key
+        self._changes = None  # changes made during a rebuild: (type, id, display or None to remove)
+
+    @staticmethod
+    def make_key(display):
+        """Folds a name like the sort keys of the database: spaces collapsed, lower case, ё as е."""
+        return sort_key(' '.join(display.split()))
+
+    def replace(self, items):
+        """
+        Replaces the whole index. Changes made through `put` and `remove` while `items` is being read
+        are applied again once it is installed.
+        Args:
+            items (iterable): (type, id, display name) tuples, read lazily.
+        """
+        with self._lock:
+            self._changes = []
+        try:
+            entries = {}
+            keys = {}
+            for obj_type, obj_id, display in items:
+                key = self.make_key(display)
+                entries.setdefault(obj_type, []).append((key, obj_id, display))
+                keys[(obj_type, obj_id)] = key
+            for type_entries in entries.values():
+                type_entries.sort()
+        except BaseException:
+            with self._lock:
+                self._changes = None
+            raise
+        with self._lock:
+            changes, self._changes = self._changes, None
+            self._entries = entries
+            self._keys = keys
+            for obj_type, obj_id, display in changes:
+                self._apply(obj_type, obj_id, display)
+
+    def put(self, obj_type, obj_id, display):
+        """
+        Adds an object to the index, or updates its display name.
+        Args:
+            obj_type (str): Object type ('person', 'org', 'doc', 'field_of_study').
+            obj_id (int): Object ID.
+            display (str): Display name.
+        """
+        with self._lock:
+            self._apply(obj_type, obj_id, display)
+
+    def remove(self, obj_type, obj_id):
+        """
+        Removes an object from the index, if it is there.
+        Args:
+            obj_type (str): Object type.
+            obj_id (int): Object ID.
+        """
+        with self._lock:
+            self._apply(obj_type, obj_id, None)
+
+    def _apply(self, obj_type, obj_id, display):
+        """Removes the object, then inserts it again unless `display` is None. Must hold the lock."""
+        if self._changes is not None:
+            self._changes.append((obj_type, obj_id, display))
+        type_entries = self._entries.setdefault(obj_type, [])
+        key = self._keys.pop((obj_type, obj_id), None)
+        if key is not None:
+            i = bisect_left(type_entries, (key, obj_id))
+            if i < len(type_entries) and type_entries[i][:2] == (key, obj_id):
+                del type_entries[i]
+        if display is not None:
+            key = self.make_key(display)
+            insort(type_entries, (key, obj_id, display))
+            self._keys[(obj_type, obj_id)] = key
+
+    def search(self, obj_type, prefix, limit):
+        """
+        Finds the objects whose display name starts with `prefix`, ignoring case, repeated spaces and ё/е.
+        Args:
+            obj_type (str): Object type.
+            prefix (str): Typed text.
+            limit (int): Maximum number of results.
+        Returns:
+            list: [type, id, display name] results in alphabetical order.
+        """
+        prefix = self.make_key(prefix)
+        results = []
+        with self._lock:
+            type_entries = self._entries.get(obj_type, [])
+            i = bisect_left(type_entries, (prefix,))
+            while i < len(type_entries) and len(results) < limit and type_entries[i][0].startswith(prefix):
+                results.append([obj_type, type_entries[i][1], type_entries[i][2]])
+                i += 1
+        return results
+
+
+class SuggestService:
+    """
+    Autocomplete over person, organization, document and field of study names.
+    The index is loaded from the database on first use. Once it is older than `max_age` seconds it
+    is reloaded by a background thread, which picks up changes made by other worker processes while
+    requests keep using the old one. Changes made by this process are applied right away through
+    `put` and `remove`.
+    """
+
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self.index = PrefixIndex()
+        self._loaded_at = None
+        self._load_lock = threading.Lock()
+        self._reloading = False
+
+    def load(self, session):
+        """
+        Reloads the whole index from the database.
+        Args:
+            session (Session): Database session.
+        """
+        def items():
+            for row in session.execute(select(Person.id, Person.display_name)):
+                yield 'person', row[0], row[1]
+            for obj_type, obj in (('org', Organization), ('doc', Document), ('field_of_study', FieldOfStudy)):
+                for row in session.execute(select(obj.id, obj.name)):
+                    yield obj_type, row[0], row[1]
+
+        self.index.replace(items())
+        self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self, session_factory):
+        """
+        Loads the index if it was never loaded, or starts reloading it in the background if it has gone stale.
+        Args:
+            session_factory (callable): Returns a new database session.
+        """
+        if self._loaded_at is None:
+            with self._load_lock:
+                if self._loaded_at is None:
+                    with session_factory() as session:
+                        self.load(session)
+            return
+        if time.monotonic() - self._loaded_at < self.max_age:
+            return
+        with self._load_lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, args=(session_factory,), daemon=True).start()
+
+    def _reload(self, session_factory):
+        try:
+            with session_factory() as session:
+                self.load(session)
+        except Exception as e:
+            print(f'WARNING: could not reload the suggestion index, keeping the old one: {type(e).__name__}: {e}')
+        finally:
+            self._reloading = False
+
+    def suggest(self, obj_type, prefix, limit):
+        return self.index.search(obj_type, prefix, limit)
+
+    def put(self, obj_type, obj_id, display):
+        self.index.put(obj_type, obj_id, display)
+
+    def remove(self, obj_type, obj_id):
+        self.index.remove(obj_type, obj_id)
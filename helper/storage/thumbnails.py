@@ -0,0 +1,175 @@
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from helper.storage.uploads import is_stored_name, stored_path, upload_url
+
+
+# Derivative formats: file extension, Pillow format and encoder options. Browsers without WebP get the JPEG.
+FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'bmp', 'tif', 'tiff', 'webp'}
+
+# EXIF orientations that turn the image by 90 degrees, swapping its width and height
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def is_image(name):
+    """Tells whether a stored name is an image derivatives can be made of."""
+    return is_stored_name(name) and name.rsplit('.', 1)[-1] in IMAGE_EXTENSIONS
+
+
+def derivative_name(name, width, extension):
+    """
+    Returns the stored name of a derivative: '<hash of the original>-<width>w.<extension>'.
+    Args:
+        name (str): Stored name of the original.
+        width (int): Width in pixels.
+        extension (str): 'webp' or 'jpg'.
+    Returns:
+        str: Stored name, in the same subfolder as the original.
+    """
+    return f'{name.split(".", 1)[0]}-{width}w.{extension}'
+
+
+def _save_atomically(image, path, image_format, options):
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix='.derivative-', delete=False) as temporary:
+        try:
+            image.save(temporary, format=image_format, **options)
+        except BaseException:
+            temporary.close()
+            os.unlink(temporary.name)
+            raise
+    os.chmod(temporary.name, 0o644)
+    os.replace(temporary.name, path)
+
+
+def generate_derivatives(name, folder, widths, force=False):
+    """
+    Writes the scaled-down WebP and JPEG copies of a stored image, for every width smaller than the image.
+    JPEG originals are decoded at a reduced scale when the largest width allows it, which makes large
+    scans several times cheaper to process.
+    Args:
+        name (str): Stored name of the original.
+        folder (str): Upload folder.
+        widths (tuple): Widths in pixels.
+        force (bool): Rewrite derivatives that already exist.
+    Returns:
+        list: Widths of the derivatives the image has.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(stored_path(name, folder)) as original:
+        width, height = original.size
+        if original.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS:
+            width, height = height, width
+        targets = sorted(target for target in widths if target < width)
+        missing = [target for target in targets
+                   if force or not all(os.path.exists(stored_path(derivative_name(name, target, extension), folder))
+                                       for extension, _, _ in FORMATS)]
+        if not missing:
+            return targets
+        # The decoder may halve the size while both sides stay at least as large as the largest derivative
+        original.draft('RGB', (max(missing), max(missing)))
+        image = ImageOps.exif_transpose(original)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        for target in missing:
+            resized = image.resize((target, max(1, round(height * target / width))), Image.Resampling.LANCZOS)
+            for extension, image_format, options in FORMATS:
+                _save_atomically(resized, stored_path(derivative_name(name, target, extension), folder),
+                                 image_format, options)
+    return targets
+
+
+def available_widths(value, folder, widths):
+    """
+    Returns the widths of the derivatives written so far of a stored photo.
+    Args:
+        value (str): Value of Person.photo.
+        folder (str): Upload folder.
+        widths (tuple): Derivative widths in pixels.
+    Returns:
+        list: Widths in increasing order, empty for files that are not images.
+    """
+    if not is_image(value):
+        return []
+    return [width for width in sorted(widths)
+            if os.path.exists(stored_path(derivative_name(value, width, 'jpg'), folder))]
+
+
+def responsive_image(value, folder, widths, display_width):
+    """
+    Describes how to show a photo: its derivatives as `srcset` candidates when they exist, the original otherwise.
+    Args:
+        value (str): Value of Person.photo.
+        folder (str): Upload folder.
+        widths (tuple): Derivative widths in pixels.
+        display_width (int): Width the photo is shown at on wide screens, in CSS pixels.
+    Returns:
+        dict: 'src' (fallback URL), 'webp_srcset', 'jpeg_srcset' and 'sizes', the last three empty without derivatives.
+    """
+    photo = {'src': upload_url(value), 'webp_srcset': '', 'jpeg_srcset': '', 'sizes': ''}
+    available = available_widths(value, folder, widths)
+    if available:
+        photo['webp_srcset'] = ', '.join(f'{upload_url(derivative_name(value, width, "webp"))} {width}w'
+                                         for width in available)
+        photo['jpeg_srcset'] = ', '.join(f'{upload_url(derivative_name(value, width, "jpg"))} {width}w'
+                                         for width in available)
+        photo['sizes'] = f'(min-width: 576px) {display_width}px, 100vw'
+    return photo
+
+
+class ThumbnailPool:
+    """
+    Generates derivatives in background threads, so saving a photo does not wait for them. Pillow releases
+    the GIL while it decodes, scales and encodes, so the threads work in parallel.
+    Every process starts its own threads on first use, forked workers included.
+    """
+
+    def __init__(self, folder, widths, workers):
+        self.folder = folder
+        self.widths = widths
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='thumbnails')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _generate(self, name, force, on_done):
+        try:
+            generate_derivatives(name, self.folder, self.widths, force)
+        except Exception as e:
+            print(f'WARNING: cannot make thumbnails of {name}: {type(e).__name__}: {e}')
+            return False
+        if on_done is not None:
+            on_done()
+        return True
+
+    def submit(self, name, force=False, on_done=None):
+        """
+        Queues the derivatives of a stored image; other files are ignored.
+        Args:
+            name (str): Stored name.
+            force (bool): Rewrite derivatives that already exist.
+            on_done (callable): Called without arguments once they are written, e.g. to drop cached pages.
+        Returns:
+            Future: True when the derivatives were written, False if the image could not be read;
+                None if the file is not an image.
+        """
+        if not is_image(name):
+            return None
+        return self._get_executor().submit(self._generate, name, force, on_done)
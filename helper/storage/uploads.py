@@ -0,0 +1,109 @@
+import hashlib
+import os
+import re
+import tempfile
+
+
+# Bytes read and hashed at a time while an upload is written
+CHUNK_SIZE = 64 * 1024
+
+# Stored names: SHA-256 of the content in hex, then the lower-cased extension of the original file.
+# Scaled-down copies of an image add their width: '<sha256>-320w.webp'.
+_STORED_NAME = re.compile(r'^[0-9a-f]{64}(-[0-9]{1,5}w)?(\.[a-z0-9]{1,10})?$')
+_EXTENSION = re.compile(r'^[a-z0-9]{1,10}$')
+
+
+def is_stored_name(value):
+    """
+    Tells whether a value of Person.photo or Document.file references content-addressed storage, rather than
+    a legacy path or an external URL.
+    Args:
+        value (str): Column value.
+    Returns:
+        bool: True for '<sha256>.<extension>' names.
+    """
+    return isinstance(value, str) and _STORED_NAME.match(value) is not None
+
+
+def stored_path(name, folder):
+    """
+    Returns where a stored file lives. Files are spread over 256 subfolders by the first two hex digits
+    of their hash, so no folder grows too large to list.
+    Args:
+        name (str): Stored name.
+        folder (str): Upload folder.
+    Returns:
+        str: Path of the file.
+    """
+    return os.path.join(folder, name[:2], name)
+
+
+def _extension(filename):
+    extension = os.path.splitext(filename or '')[1][1:].lower()
+    return extension if _EXTENSION.match(extension) else ''
+
+
+def store_stream(stream, filename, folder):
+    """
+    Streams a file into the upload folder in chunks while hashing it, and keeps it under its content hash.
+    Content that is already stored is not written twice: the new copy is dropped.
+    Args:
+        stream (file): Binary stream to read, e.g. the `stream` of an uploaded FileStorage.
+        filename (str): Original file name, only its extension is kept.
+        folder (str): Upload folder.
+    Returns:
+        str: Stored name to save in the database, '<sha256>.<extension>'.
+    """
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha256()
+    # Written next to its destination, so moving it in place is an atomic rename
+    with tempfile.NamedTemporaryFile(dir=folder, prefix='.upload-', delete=False) as temporary:
+        try:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                temporary.write(chunk)
+        except BaseException:
+            temporary.close()
+            os.unlink(temporary.name)
+            raise
+    extension = _extension(filename)
+    name = digest.hexdigest() + (f'.{extension}' if extension else '')
+    path = stored_path(name, folder)
+    if os.path.exists(path):
+        os.unlink(temporary.name)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.chmod(temporary.name, 0o644)
+        os.replace(temporary.name, path)
+    return name
+
+
+def store_file(path, folder):
+    """
+    Copies a file from disk into the upload folder, see `store_stream`.
+    Args:
+        path (str): File to copy.
+        folder (str): Upload folder.
+    Returns:
+        str: Stored name.
+    """
+    with open(path, 'rb') as file:
+        return store_stream(file, os.path.basename(path), folder)
+
+
+def upload_url(value):
+    """
+    Returns the address of an uploaded file. Stored names are served by /uploads/, legacy paths under
+    static/ are made absolute and external URLs are returned unchanged.
+    Args:
+        value (str): Value of Person.photo or Document.file.
+    Returns:
+        str: URL, or the value itself if it is empty.
+    """
+    if not value:
+        return value
+    if is_stored_name(value):
+        return f'/uploads/{value}'
+    if value.startswith('static/'):
+        return '/' + value
+    return value
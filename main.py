@@ -1,42 +1,96 @@
-from flask import Flask, render_template, request, abort, jsonify, redirect, session, url_for
-from flask_login import login_required
+from flask import (Flask, Blueprint, current_app, render_template, request, abort, jsonify, redirect, session, url_for,
+                   Response, stream_with_context, stream_template, send_from_directory)
+from flask_login import login_required, current_user
 from flask_babel import Babel, gettext as _
 from helper import (SECRET_KEY,
                     MULTIPLE_CHOICE_FIELDS,
                     FILE_FIELDS,
                     TITLE_CONVERTER_NEW_EDIT,
-                    CONNECTION_TYPE_MAPPING
+                    CONNECTION_TYPE_MAPPING,
+                    LIST_PAGE_SIZE,
+                    GENERATED_FIELDS,
+                    SUGGEST_LIMIT,
+                    SUGGEST_MAX_LIMIT,
+                    SUGGEST_MAX_AGE,
+                    PAGE_CACHE_SIZE,
+                    PAGE_CACHE_LOCAL_TTL,
+                    PAGE_CACHE_URL,
+                    PAGE_CACHE_TTL,
+                    METRICS_TOKEN,
+                    QUERY_DEBUG,
+                    QUERY_REPEAT_THRESHOLD,
+                    UPLOAD_FOLDER,
+                    UPLOAD_MAX_AGE,
+                    THUMBNAIL_WIDTHS,
+                    THUMBNAIL_WORKERS,
+                    PHOTO_DISPLAY_WIDTH,
+                    CACHE_MAX_AGE
                     )
-from helper.db.initialise_database import engine, Organization, Person, Document, FieldOfStudy
-from helper.db.initialise_database import (DocumentAuthorship,
-                                           OrganizationMembership,
-                                           PersonFieldOfStudy,
-                                           PersonEducation)
+from helper.db.initialise_database import get_engine, Organization, Person, Document, FieldOfStudy
+from helper.db.initialise_database import Region, PersonRegion, TableVersion
+from helper.db.connections import linked_records, sync_connections, delete_connections
+from helper.db.geography import region_key, sync_person_regions
+from helper.db.pool import pool_stats
+from helper.db.query_counter import init_query_counting
+from helper.db.pagination import encode_cursor
+from helper.db.queries import (OBJECT_MODELS, fulltext_statement, content_statement, person_search_statement,
+                               name_search_statement, list_statement, search_result, localized_display_columns)
 from helper.cleanup.htmlcleaner import clean_html
+from helper.cache.page_cache import create_page_cache
+from helper.cache.conditional import ConditionalGet, release_stamp
+from helper.metrics.request_metrics import RequestMetrics, init_metrics, search_mode
+from helper.listing.grouping import split_columns, group_by_letter, buffered
+from helper.search.suggest import SuggestService
+from helper.storage.uploads import is_stored_name, store_stream, stored_path, upload_url
+from helper.storage.thumbnails import ThumbnailPool, available_widths, responsive_image
 from helper.login.login import app_login, login_manager
-from sqlalchemy import select, func, extract, and_, inspect, text
+from sqlalchemy import select, func, inspect, text
+from sqlalchemy.exc import ProgrammingError
 from sqlalchemy.orm import Session
 from datetime import datetime
 from dateutil.parser import parse
+import hmac
+import json
+import os
 import re
 
 
-app = Flask(__name__)
-app.register_blueprint(app_login)
-app.config['SECRET_KEY'] = SECRET_KEY
-app.config['SESSION_COOKIE_DOMAIN'] = False
-app.config['MAX_CONTENT_LENGTH'] = 32 * 1024 * 1024
-app.config['MAX_FORM_MEMORY_SIZE'] = 32 * 1024 * 1024
+LANGUAGES = ['ru', 'en']
 
-login_manager.init_app(app)
-login_manager.login_view = 'app_login.login'
+views = Blueprint('views', __name__)
+babel = Babel()
+request_metrics = RequestMetrics()
 
-app.config.update(
-    BABEL_DEFAULT_LOCALE='ru',
-    BABEL_TRANSLATION_DIRECTORIES='translations'
-)
-LANGUAGES = ['ru', 'en']
-babel = Babel(app)
+
+def create_app():
+    """
+    Builds the application. Nothing is connected here: the database engine is created on the first query
+    and the OAuth provider is contacted on the first login, so preloading servers fork workers quickly
+    and every worker opens its own connections.
+    Returns:
+        Flask: The application.
+    """
+    app = Flask(__name__)
+    app.register_blueprint(views)
+    app.register_blueprint(app_login)
+    app.config['SECRET_KEY'] = SECRET_KEY
+    app.config['SESSION_COOKIE_DOMAIN'] = False
+    app.config['MAX_CONTENT_LENGTH'] = 32 * 1024 * 1024
+    app.config['MAX_FORM_MEMORY_SIZE'] = 32 * 1024 * 1024
+
+    login_manager.init_app(app)
+    login_manager.login_view = 'app_login.login'
+
+    app.config.update(
+        BABEL_DEFAULT_LOCALE='ru',
+        BABEL_TRANSLATION_DIRECTORIES='translations'
+    )
+    babel.init_app(app, locale_selector=get_locale)
+    app.jinja_env.add_extension('jinja2.ext.i18n')
+    app.add_template_filter(upload_url)
+    init_metrics(app, request_metrics)
+    init_query_counting(app, debug=QUERY_DEBUG, repeat_threshold=QUERY_REPEAT_THRESHOLD)
+    return app
 
 
 def get_locale():
@@ -53,33 +107,181 @@ def get_locale():
             return current_user.locale
     except Exception:
         pass
-    return app.config['BABEL_DEFAULT_LOCALE']
+    return current_app.config['BABEL_DEFAULT_LOCALE']
+
+
+suggest_service = SuggestService(max_age=SUGGEST_MAX_AGE)
+page_cache = create_page_cache(PAGE_CACHE_SIZE, shared_url=PAGE_CACHE_URL, shared_ttl=PAGE_CACHE_TTL,
+                               local_ttl=PAGE_CACHE_LOCAL_TTL)
+thumbnails = ThumbnailPool(UPLOAD_FOLDER, THUMBNAIL_WIDTHS, THUMBNAIL_WORKERS)
+
+
+def view_cache_key():
+    """
+    Returns the page cache key of the current /view request, or None if the page must not be cached.
+    Pages rendered for logged-in users carry edit controls and are never cached.
+    """
+    viewtype = request.args.get('type')
+    viewid = request.args.get('id')
+    if current_user.is_authenticated or not viewid:
+        return None
+    if viewtype == 'geography':
+        return page_cache.key(viewtype, viewid, get_locale())
+    if viewtype not in ['org', 'person', 'doc', 'field_of_study'] or not viewid.isdigit():
+        return None
+    return page_cache.key(viewtype, int(viewid), get_locale())
+
 
+def invalidate_pages(obj_type, obj_id, linked=()):
+    """
+    Drops the cached view pages of a changed record and of the records linked to it.
+    Args:
+        obj_type (str): Type of the changed record.
+        obj_id (int): ID of the changed record.
+        linked (iterable): (type, id) pairs of the records that list it.
+    """
+    page_cache.invalidate(obj_type, int(obj_id))
+    for linked_type, linked_id in linked:
+        page_cache.invalidate(linked_type, linked_id)
+    if obj_type == 'person':
+        # Geography pages list persons by their area of study
+        page_cache.invalidate_type('geography')
+
+
+# Set once table_version has been found missing, so requests stop looking for it
+_table_version_missing = False
+
+
+def table_versions(tables):
+    """
+    Reads the change versions of tables for conditional requests.
+    Args:
+        tables (tuple): Table names.
+    Returns:
+        tuple: ({table name: version}, time of the last change or None), or None before table_version exists.
+    """
+    global _table_version_missing
+    if _table_version_missing:
+        return None
+    stmt = select(TableVersion.table_name, TableVersion.version, TableVersion.modified_at).where(
+        TableVersion.table_name.in_(tables))
+    try:
+        with get_engine().connect() as connection:
+            rows = connection.execute(stmt).all()
+    except ProgrammingError:
+        _table_version_missing = True
+        print('WARNING: table_version is missing, conditional requests are answered in full until the tables '
+              'are upgraded (python -m helper) and the application is restarted')
+        return None
+    return {row[0]: row[1] for row in rows}, max((row[2] for row in rows), default=None)
 
-babel.init_app(app, locale_selector=get_locale)
-app.jinja_env.add_extension('jinja2.ext.i18n')
 
+# Row counts shown by /list: table name -> (table version, count)
+_row_counts = {}
 
-@app.context_processor
+
+def table_row_count(model):
+    """
+    Returns the number of records of a type, counted again only once its table has changed.
+    Args:
+        model (type): Model class.
+    Returns:
+        int: Number of rows.
+    """
+    table = model.__tablename__
+    result = table_versions((table,))
+    # Read before counting: a change committed in between makes the next request count again
+    version = result[0].get(table) if result is not None else None
+    cached = _row_counts.get(table)
+    if version is not None and cached is not None and cached[0] == version:
+        return cached[1]
+    with Session(get_engine()) as session:
+        count = session.execute(select(func.count()).select_from(model)).scalar_one()
+    if version is not None:
+        _row_counts[table] = (version, count)
+    return count
+
+
+def page_variant():
+    """Returns what a page depends on besides the data, and whether it is specific to the logged-in user."""
+    user_id = current_user.get_id() if current_user.is_authenticated else None
+    return (str(get_locale()), user_id), user_id is not None
+
+
+def view_variant():
+    """
+    Returns the variant of a /view page. Person pages also depend on the scaled-down copies of the photo,
+    which are written after the photo is saved.
+    """
+    variant, private = page_variant()
+    viewid = request.args.get('id', '')
+    if request.args.get('type') == 'person' and viewid.isdigit():
+        with get_engine().connect() as connection:
+            photo = connection.execute(select(Person.photo).where(Person.id == int(viewid))).scalar_one_or_none()
+        if photo:
+            variant += (tuple(available_widths(photo, UPLOAD_FOLDER, THUMBNAIL_WIDTHS)),)
+    return variant, private
+
+
+# Tables a /view page is built from: the record's own, its associations and the records they link to
+VIEW_TABLES = {
+    'person': ('person', 'person_field_of_study', 'field_of_study', 'person_education', 'organization_membership',
+               'organization', 'document_authorship', 'document'),
+    'org': ('organization', 'organization_membership', 'person_education', 'person'),
+    'doc': ('document', 'document_authorship', 'person'),
+    'field_of_study': ('field_of_study', 'person_field_of_study', 'person'),
+    'geography': ('region', 'person_region', 'person'),
+}
+
+
+def view_tables(args):
+    return VIEW_TABLES.get(args.get('type'))
+
+
+def list_tables(args):
+    model = OBJECT_MODELS.get(args.get('type'))
+    return (model.__tablename__,) if model is not None else None
+
+
+def list_custom_tables(args):
+    return ('region',) if args.get('type') == 'geography' else ('person',)
+
+
+def search_tables(args):
+    mode = search_mode(args)
+    if mode == 'form':
+        return None
+    if mode == 'name':
+        return list_tables(args)
+    return ('person',)
+
+
+# Validators change with the code, the templates and the translations as well as with the data
+conditional_get = ConditionalGet(table_versions, release_stamp(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    for path in ('main.py', 'helper', 'templates', 'translations')))
+
+
+@views.app_context_processor
 def inject_current_locale():
     """Expose the current locale to templates as `current_locale`."""
     try:
         from flask_babel import get_locale as _get_locale
         loc = str(_get_locale())
     except Exception:
-        loc = app.config.get('BABEL_DEFAULT_LOCALE', 'ru')
+        loc = current_app.config.get('BABEL_DEFAULT_LOCALE', 'ru')
     return {'current_locale': loc}
 
 
-@app.get('/set_language/<lang_code>')
+@views.get('/set_language/<lang_code>')
 def set_language(lang_code):
     if lang_code not in LANGUAGES:
         abort(404)
     session['lang'] = lang_code
-    return redirect(request.referrer or url_for('index'))
+    return redirect(request.referrer or url_for('.index'))
 
 
-@app.route('/')
+@views.route('/')
 def index():
     """
     Renders the 'Index' page.
@@ -94,7 +296,45 @@ def index():
     return render_template('index.html')
 
 
-@app.route('/about')
+@views.route('/health')
+def health():
+    """
+    Reports whether the database is reachable and how the connection pool of this worker is used.
+
+    Returns:
+    - JSON with 'status', 'database' and 'pool' (connections checked out and idle, overflow in use,
+      checkouts, timeouts, average and maximum checkout wait in milliseconds).
+    - The status code is 503 if the database cannot be reached.
+    """
+    try:
+        with get_engine().connect() as connection:
+            connection.execute(text('SELECT 1'))
+        database = 'ok'
+    except Exception as e:
+        database = f'error: {type(e).__name__}'
+    status = 'ok' if database == 'ok' else 'unavailable'
+    return jsonify(status=status, database=database, pool=pool_stats(get_engine())), 200 if status == 'ok' else 503
+
+
+@views.route('/metrics')
+def metrics():
+    """
+    Exports the request metrics of this worker in the Prometheus text format: latency and response size
+    histograms, responses by status and requests in flight, per route and search mode.
+
+    Returns:
+    - The metrics, to logged-in users or to requests carrying 'Authorization: Bearer <METRICS_TOKEN>'.
+    - Aborts with a 403 status code otherwise.
+    """
+    authorization = request.headers.get('Authorization', '')
+    token_valid = bool(METRICS_TOKEN) and hmac.compare_digest(authorization.encode(),
+                                                              f'Bearer {METRICS_TOKEN}'.encode())
+    if not (token_valid or current_user.is_authenticated):
+        abort(403)
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@views.route('/about')
 def about():
     """
     Renders the 'About' page.
@@ -109,7 +349,28 @@ def about():
     return render_template('about.html')
 
 
-@app.route('/view')
+@views.route('/uploads/<name>')
+def uploads(name):
+    """
+    Serves an uploaded file. Stored names are content hashes, so a name always means the same bytes
+    and browsers and proxies may keep the file for UPLOAD_MAX_AGE without revalidating.
+
+    Returns:
+    - The file.
+    - Aborts with a 404 status code if the name is not a stored name or the file does not exist.
+    """
+    if not is_stored_name(name):
+        abort(404)
+    response = send_from_directory(os.path.dirname(os.path.abspath(stored_path(name, UPLOAD_FOLDER))), name,
+                                   max_age=UPLOAD_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@views.route('/view')
+@conditional_get.conditional(view_tables, view_variant, CACHE_MAX_AGE['view'])
+@page_cache.cached(view_cache_key)
 def view():
     """
     Universal view for organization, person, and document.
@@ -131,37 +392,29 @@ def view():
         abort(404)
 
     if request.args.get('type') == 'geography':
-        place = request.args.get('id')
-        stmt = select(Person).filter(Person.area_of_study.ilike(f'%{place}%')).order_by(Person.surname, Person.name)
-        with Session(engine) as session:
-            people = session.execute(stmt).scalars().all()
+        region_stmt = select(Region).where(Region.key == region_key(request.args.get('id')))
+        use_en = get_locale() == 'en'
+        display_col, sort_col = localized_display_columns(use_en)
+        stmt = (select(Person.id, display_col).join(PersonRegion, PersonRegion.person_id == Person.id)
+                .order_by(sort_col, Person.id))
+        with Session(get_engine()) as session:
+            region = session.execute(region_stmt).scalar_one_or_none()
+            if region is None:
+                abort(404)
+            place = region.name
+            rows = session.execute(stmt.where(PersonRegion.region_id == region.id))
+            people = [['person', row[0], row[1]] for row in rows]
         # Localize keys for geography view
-        if get_locale() == 'en':
+        if use_en:
             data = {
                 "Geographic region": place,
-                "Related researchers": [
-                    [
-                        'person',
-                        person.id,
-                        (
-                            f"{person.surname_en or person.surname} "
-                            f"{person.name_en or person.name} "
-                            f"{person.patronymic_en or person.patronymic or ''}"
-                        )
-                    ] for person in people
-                ],
+                "Related researchers": people,
             }
             parameters = {'single': [], 'multiple': ['Related researchers']}
         else:
             data = {
                 "Географический регион": place,
-                "Связанные исследователи": [
-                    [
-                        'person',
-                        person.id,
-                        f"{person.surname} {person.name} {person.patronymic or ''}"
-                    ] for person in people
-                ],
+                "Связанные исследователи": people,
             }
             parameters = {'single': [], 'multiple': ['Связанные исследователи']}
 
@@ -189,8 +442,9 @@ def view():
     viewtype = request.args.get('type')
     viewid = int(request.args.get('id'))
     obj = viewtype_to_object[viewtype]
-    stmt = select(obj).where(obj.id == viewid)
-    with Session(engine) as session:
+    # Eager-load every relationship the values_* methods walk, so a page costs a fixed number of queries
+    stmt = select(obj).where(obj.id == viewid).options(*obj.view_options())
+    with Session(get_engine()) as session:
         obj_instance = session.execute(stmt).scalar_one_or_none()
         if obj_instance is None:
             abort(404)
@@ -212,12 +466,16 @@ def view():
         'id': viewid,
         'type': viewtype,
     }
-    # Photo rendering: handle localized key
+    # Photo rendering: handle localized key; the template shows the scaled-down copies when they exist
     photo_key = 'Photo' if get_locale() == 'en' else 'Фотография'
-    if photo_key in data:
-        photo_src = data[photo_key]
-        alt_text = _(photo_key)
-        data[photo_key] = f'<img src="{photo_src}" alt="{alt_text}" />'
+    page['photo_key'] = photo_key
+    photo = None
+    if data.get(photo_key):
+        photo = responsive_image(data[photo_key], UPLOAD_FOLDER, THUMBNAIL_WIDTHS, PHOTO_DISPLAY_WIDTH)
+        photo['alt'] = _(photo_key)
+    file_key = 'File' if get_locale() == 'en' else 'Файл'
+    if data.get(file_key):
+        data[file_key] = upload_url(data[file_key])
     # Insert derived birth date from comments if missing (comments text is Russian; regex remains RU)
     comments_key = 'Comments' if get_locale() == 'en' else 'Комментарии'
     fio_key = 'Full name' if get_locale() == 'en' else 'Фамилия Имя Отчество'
@@ -253,156 +511,111 @@ def view():
                     continue
             items.insert(insert_idx, (death_key, death_value))
             data = dict(items)
-    return render_template('view.html', data=data, page=page, parameters=parameters)
+    return render_template('view.html', data=data, page=page, parameters=parameters, photo=photo)
 
 
-@app.route('/search')
+@views.route('/search')
+@conditional_get.conditional(search_tables, page_variant, CACHE_MAX_AGE['search'])
 def search():
     page = {'heading': _('Поиск'), 'title': _('Search')}
-    # Choose localized name columns for person searches
+    # Person searches match and return the English names in the English interface
     use_en = (str(get_locale()) == 'en')
-    first_col = Person.name_en if use_en else Person.name
-    last_col = Person.surname_en if use_en else Person.surname
-    patr_col = Person.patronymic_en if use_en else Person.patronymic
     if len(request.args) == 0 or not request.args.get('type'):
         return render_template('search.html', page=page)
 
     # Quicksearch: /search?type=person&quicksearch=quicksearch&fullName=...
     if request.args.get('quicksearch') and request.args.get('type') == 'person':
         query = request.args.get('fullName')
-        where_stmt = []
         if query is None:
             return redirect('/search')
-        else:
-            parts = query.split()
-            if len(parts) == 1:
-                where_stmt.append(func.lower(last_col).startswith(parts[0].lower()))
-            elif len(parts) == 2:
-                where_stmt.append(
-                    (func.lower(last_col) == parts[0].lower())
-                    & (func.lower(first_col) == parts[1].lower())
-                )
-            elif len(parts) == 3:
-                where_stmt.append(
-                    (func.lower(last_col) == parts[0].lower())
-                    & (func.lower(first_col) == parts[1].lower())
-                    & (func.lower(patr_col) == parts[2].lower())
-                )
-
-        final_where = and_(*where_stmt) if where_stmt else True
-        stmt = (
-            select(Person.id, last_col, first_col, patr_col)
-            .where(final_where)
-            .order_by(last_col.collate('C'), first_col.collate('C'))
-        )
+        stmt = person_search_statement({'fullName': query}, use_en)
+        with Session(get_engine()) as session:
+            results = [search_result('person', row) for row in session.execute(stmt)]
+        return render_template('search.html', page=page, results=results)
 
+    # Full-text search over biographies and bibliographies — ranked JSON with highlighted snippets
+    elif request.args.get('fulltext'):
+        stmt = fulltext_statement(request.args.get('fulltext'), use_en)
         results = []
-        with Session(engine) as session:
+        with Session(get_engine()) as session:
             for row in session.execute(stmt):
-                # row: (id, surname, name, patronymic)
-                display = ' '.join(filter(None, (row[1], row[2], row[3])))
-                results.append(['person', row[0], display])
-        return render_template('search.html', page=page, results=results)
+                results.append(search_result('person', row) + [' '.join(row[2].split())])
+        return jsonify(results)
 
     # Content search (bibliography substring) — return compact JSON
     elif request.args.get('content'):
-        content = request.args.get('content')
-        stmt = (
-            select(Person.id, Person.surname, Person.name, Person.patronymic)
-            .where(Person.bibliography.ilike(f'%{content}%'))
-            .order_by(Person.surname.collate('C'), Person.name.collate('C'))
-        )
+        stmt = content_statement(request.args.get('content'))
         results = []
-        with Session(engine) as session:
+        with Session(get_engine()) as session:
             for row in session.execute(stmt):
-                display = ' '.join(filter(None, (row[1], row[2], row[3])))
-                results.append(['person', row[0], display])
+                results.append(search_result('person', row))
         return jsonify(results)
 
     # Person attribute search — return compact JSON
+    # With fuzzy=1 the surname is matched by trigram similarity (typos tolerated) and the other parts by prefix
     elif request.args.get('type') == 'person':
-        where_stmt = []
-        if len(set(request.args.keys()).intersection({'firstName', 'lastName', 'patronymic'})) == 0:
-            query = request.args.get('fullName')
-            if query is not None:
-                parts = query.split()
-                if len(parts) == 1:
-                    where_stmt.append(func.lower(last_col).startswith(parts[0].lower()))
-                elif len(parts) == 2:
-                    where_stmt.append(
-                        (func.lower(last_col) == parts[0].lower())
-                        & (func.lower(first_col) == parts[1].lower())
-                    )
-                elif len(parts) == 3:
-                    where_stmt.append(
-                        (func.lower(last_col) == parts[0].lower())
-                        & (func.lower(first_col) == parts[1].lower())
-                        & (func.lower(patr_col) == parts[2].lower())
-                    )
-        else:
-            firstname = request.args.get('firstName')
-            lastname = request.args.get('lastName')
-            patronymic = request.args.get('patronymic')
-            if firstname:
-                where_stmt.append(func.lower(first_col).startswith(firstname.lower()))
-            if lastname:
-                where_stmt.append(func.lower(last_col).startswith(lastname.lower()))
-            if patronymic:
-                where_stmt.append(func.lower(patr_col).startswith(patronymic.lower()))
-
-        year_query = request.args.get('birthYear')
-        if year_query is not None:
-            where_stmt.append(extract('year', Person.birth_date) == int(year_query))
-
-        final_where = and_(*where_stmt) if where_stmt else True
-        stmt = (
-            select(Person.id, last_col, first_col, patr_col)
-            .where(final_where)
-            .order_by(last_col.collate('C'), first_col.collate('C'))
-        )
-
+        stmt = person_search_statement(request.args, use_en)
         results = []
-        with Session(engine) as session:
+        with Session(get_engine()) as session:
             for row in session.execute(stmt):
-                display = ' '.join(filter(None, (row[1], row[2], row[3])))
-                results.append(['person', row[0], display])
+                results.append(search_result('person', row))
         return jsonify(results)
 
     # Name-only search for org/doc/field_of_study — already compact (id, name)
     elif request.args.get('type') in ['org', 'doc', 'field_of_study']:
         obj_type = request.args.get('type')
-        obj = {'org': Organization, 'doc': Document, 'field_of_study': FieldOfStudy}[obj_type]
-        query = request.args.get('name')
-        if query:
-            stmt = (
-                select(obj.id, obj.name)
-                .where(func.lower(obj.name).startswith(query.lower()))
-                .order_by(func.lower(obj.name).collate('C'))
-            )
-        else:
-            stmt = select(obj.id, obj.name).order_by(func.lower(obj.name).collate('C'))
+        stmt = name_search_statement(obj_type, request.args.get('name'))
         results = []
-        with Session(engine) as session:
+        with Session(get_engine()) as session:
             for row in session.execute(stmt):
-                results.append([obj_type, row[0], row[1]])
+                results.append(search_result(obj_type, row))
         return jsonify(results)
 
     else:
         abort(404)
 
 
-@app.route('/list')
+@views.route('/suggest')
+def suggest():
+    """
+    Autocomplete for the connection picker, served from an in-memory prefix index.
+
+    Query Parameters:
+    - type (str): The type of object to suggest ('person', 'org', 'doc', 'field_of_study').
+    - q (str): The typed text, matched against the beginning of the display name.
+    - limit (int): Maximum number of suggestions, capped at SUGGEST_MAX_LIMIT.
+
+    Returns:
+    - JSON list of [type, id, display name] in alphabetical order.
+    - Aborts with a 404 status code if the 'type' is not one of the expected values.
+    """
+    obj_type = request.args.get('type')
+    if obj_type not in ['person', 'org', 'doc', 'field_of_study']:
+        abort(404)
+    query = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', SUGGEST_LIMIT, type=int), SUGGEST_MAX_LIMIT))
+    if not query.strip():
+        return jsonify([])
+    suggest_service.ensure_loaded(lambda: Session(get_engine()))
+    return jsonify(suggest_service.suggest(obj_type, query, limit))
+
+
+@views.route('/list')
+@conditional_get.conditional(list_tables, page_variant, CACHE_MAX_AGE['list'])
 def list_view():
     """
     Renders a list view for organizations, persons, documents, or fields of study.
-    This route provides a list of all items of the specified type without pagination.
+    This route provides a keyset-paginated list of the items of the specified type.
     It supports sorting to display results in a consistent order.
     Query Parameters:
     - type (str): The type of objects to list ('org', 'person', 'doc', 'field_of_study')
     - sort (str): Field to sort by (default depends on object type)
+    - after (str): Cursor of the previous page, as returned in the 'next' link or JSON field
+    - limit (int): Page size, capped at LIST_PAGE_SIZE
+    - format (str): 'json' streams the rows as {"results": [...], "next": cursor}
     Returns:
-    - Renders the 'list.html' template with the results
-    - Aborts with a 404 status code if the type parameter is invalid
+    - Renders the 'list.html' template with the results, or streams them as JSON
+    - Aborts with a 404 status code if the type, sort or cursor parameter is invalid
     """
     if not request.args.get('type'):
         abort(404)
@@ -411,15 +624,6 @@ def list_view():
 
     obj_type = request.args.get('type')
 
-    obj_map = {
-        'org': Organization,
-        'person': Person,
-        'doc': Document,
-        'field_of_study': FieldOfStudy
-    }
-
-    obj = obj_map[obj_type]
-
     heading_map = {
         'org': _('Организации'),
         'person': _('Персоналии'),
@@ -427,41 +631,69 @@ def list_view():
         'field_of_study': _('Области исследования'),
     }
 
-    # Determine default sort field based on object type
-    if obj_type == 'person':
-        sort_field = request.args.get('sort', 'surname')
-        if sort_field == 'surname':
-            # Only select the necessary columns
-            stmt = select(Person.id, Person.surname, Person.name, Person.patronymic)\
-                .order_by(Person.surname.collate('C'), Person.name.collate('C'))
-        else:
-            stmt = select(Person.id, Person.surname, Person.name, Person.patronymic)\
-                .order_by(getattr(Person, sort_field))
-    else:
-        sort_field = request.args.get('sort', 'name')
-        stmt = select(obj.id, obj.name).order_by(func.lower(getattr(obj, sort_field)).collate('C'))
+    sort_field = request.args.get('sort', 'surname' if obj_type == 'person' else 'name')
+    limit = request.args.get('limit', type=int)
+    if limit is None and request.args.get('format') != 'json':
+        limit = LIST_PAGE_SIZE
+    try:
+        stmt, column_count, limit = list_statement(obj_type, sort_field, request.args.get('after'), limit)
+    except LookupError:
+        abort(404)
 
-    results = []
-    with Session(engine) as session:
-        data = session.execute(stmt)
-        for row in data:
-            if obj_type == 'person':
-                # row: (id, surname, name, patronymic)
-                person_str = ' '.join(filter(None, (row[1], row[2], row[3])))
-                results.append([obj_type, row[0], person_str])
-            else:
-                results.append([obj_type, row[0], row[1]])
+    def iter_page():
+        """Yields (result, cursor) pairs for the rows of the page, then (None, next cursor)."""
+        with Session(get_engine()) as session:
+            rows = session.execute(stmt, execution_options={'yield_per': 500})
+            last_row = None
+            for count, row in enumerate(rows):
+                if limit is not None and count == limit:
+                    yield None, encode_cursor(list(last_row[column_count:]))
+                    return
+                last_row = row
+                yield search_result(obj_type, row), None
+        yield None, None
+
+    if request.args.get('format') == 'json':
+        def generate():
+            yield '{"results": ['
+            separator = ''
+            for result, next_cursor in iter_page():
+                if result is None:
+                    break
+                yield separator + json.dumps(result, ensure_ascii=False)
+                separator = ','
+            yield '], "next": ' + json.dumps(next_cursor) + '}'
+        return Response(stream_with_context(generate()), mimetype='application/json')
 
     page_info = {
         'heading': heading_map[obj_type],
         'title': heading_map[obj_type],
-        'type': obj_type
+        'type': obj_type,
+        'next': None,
     }
 
-    return render_template('list.html', results=results, page=page_info, result_use_pagination=True)
+    def iter_results():
+        for result, next_cursor in iter_page():
+            if result is None:
+                # Read by the template after the last bucket has been rendered
+                if next_cursor:
+                    page_info['next'] = url_for('.list_view', type=obj_type, sort=sort_field, after=next_cursor)
+                break
+            yield result
+
+    # A full count is a scan of the table, so it is only repeated once the table has changed
+    results_count = table_row_count(OBJECT_MODELS[obj_type])
 
+    # Only the default sorts order the rows by display name
+    sorted_by_name = sort_field == ('surname' if obj_type == 'person' else 'name')
+    letter_buckets = group_by_letter(iter_results(), sorted_by_name=sorted_by_name)
+    return Response(buffered(stream_template('list.html', letter_buckets=letter_buckets,
+                                             results_count=results_count, page=page_info,
+                                             result_use_pagination=True)), mimetype='text/html')
 
-@app.route('/list_custom')
+
+@views.route('/list_custom')
+@conditional_get.conditional(list_custom_tables, page_variant, CACHE_MAX_AGE['list_custom'])
 def list_view_custom():
     if not request.args.get('type'):
         abort(404)
@@ -477,41 +709,17 @@ def list_view_custom():
     obj_type = request.args.get('type')
 
     if obj_type == 'geography':
-        query = text("""
-            WITH split_locations AS (
-            SELECT
-                trim(unnest(string_to_array(area_of_study, ','))) AS location
-            FROM
-                person
-            WHERE
-                area_of_study IS NOT NULL
-            ),
-            valid_locations AS (
-            SELECT
-                location
-            FROM
-                split_locations
-            WHERE
-                length(location) > 0
-            )
-            SELECT
-            location,
-            COUNT(*) AS frequency
-            FROM
-            valid_locations
-            GROUP BY
-            location
-            ORDER BY
-            frequency DESC
-            LIMIT :limit;
-        """)
+        # Region frequencies are maintained on every save, so this is a read of the top of an index
+        stmt = (select(Region.name, Region.person_count)
+                .where(Region.person_count > 0)
+                .order_by(Region.person_count.desc(), Region.name)
+                .limit(100))
         page_info = {
             'heading': _('Самые популярные географические регионы'),
             'title': _('Самые популярные географические регионы'),
         }
-        with Session(engine) as session:
-            result = session.execute(query, {"limit": 100})
-            results = result.fetchall()
+        with Session(get_engine()) as session:
+            results = session.execute(stmt).all()
         results = [
             [
                 'geography',
@@ -520,7 +728,8 @@ def list_view_custom():
             ]
             for row in results
         ]
-        use_pagination = False
+        return render_template('list.html', columns=split_columns(results), results_count=len(results),
+                               page=page_info, result_use_pagination=False)
     elif obj_type.startswith('acad_'):
         # DB filter labels (do not translate; must match stored values)
         degree_db_map = {
@@ -539,22 +748,27 @@ def list_view_custom():
             'acad_professors': _('профессор РАН')
         }
 
-        query = select(Person).filter(
-            Person.academic_degree == degree_db_map[obj_type]
-        ).order_by(Person.surname.collate('C'))
-        with Session(engine) as session:
-            result = session.execute(query)
-            results = [['person', person[0].id, str(person[0])] for person in result.fetchall()]
+        degree_filter = Person.academic_degree == degree_db_map[obj_type]
+        query = select(Person.id, Person.display_name).filter(degree_filter).order_by(Person.sort_name, Person.id)
+
+        def iter_results():
+            with Session(get_engine()) as session:
+                for row in session.execute(query, execution_options={'yield_per': 500}):
+                    yield search_result('person', row)
+
+        with Session(get_engine()) as session:
+            results_count = session.execute(select(func.count()).where(degree_filter)).scalar_one()
         degree_label = degree_label_map[obj_type]
         page_info = {
             'heading': _('Список академических степеней - %(degree)s', degree=degree_label),
             'title': _('Список академических степеней - %(degree)s', degree=degree_label),
         }
-        use_pagination = True
-    return render_template('list.html', results=results, page=page_info, result_use_pagination=use_pagination)
+        return Response(buffered(stream_template('list.html', letter_buckets=group_by_letter(iter_results()),
+                                                 results_count=results_count, page=page_info,
+                                                 result_use_pagination=True)), mimetype='text/html')
 
 
-@app.route('/new')
+@views.route('/new')
 @login_required
 def new():
     """
@@ -583,7 +797,7 @@ def new():
     data_fin = dict()
     for column in mapper.attrs:
         if column.key not in ['organizations', 'documents', 'members', 'authors', 'field_of_study',
-                              'education', 'alumni'] and column.key != 'id':
+                              'education', 'alumni', *GENERATED_FIELDS] and column.key != 'id':
             data_fin[column.key] = ''
     data2 = {}
     if obj_type == 'person':
@@ -598,7 +812,7 @@ def new():
                            connection_types=CONNECTION_TYPE_MAPPING)
 
 
-@app.route('/edit')
+@views.route('/edit')
 @login_required
 def edit():
     """
@@ -627,11 +841,13 @@ def edit():
     obj = {'org': Organization, 'person': Person, 'doc': Document, 'field_of_study': FieldOfStudy}[obj_type]
 
     stmt = select(obj).where(obj.id == obj_id)
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         data = session.execute(stmt).scalar_one_or_none()
         mapper = inspect(obj)
         data_fin = dict()
         for column in mapper.attrs:
+            if column.key in GENERATED_FIELDS:
+                continue
             if not isinstance(getattr(data, column.key), list):
                 data_fin[column.key] = getattr(data, column.key)
     data_fin2 = {}
@@ -646,7 +862,7 @@ def edit():
             data_fin2[k] = str(v)
 
     data2 = {}
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         obj_real = session.query(obj).filter(obj.id == obj_id).one_or_none()
         assert obj_real is not None
         if obj_type == 'person':
@@ -682,7 +898,7 @@ def edit():
                            connection_types=CONNECTION_TYPE_MAPPING)
 
 
-@app.route('/save', methods=['POST'])
+@views.route('/save', methods=['POST'])
 @login_required
 def save():
     """
@@ -708,9 +924,10 @@ def save():
     formdata = {key: (value if value != '' else None) for key, value in formdata.items()}
     for key in request.files:
         value = request.files[key]
-        upload_path = f'static/uploads/[{str(datetime.now())}]' + value.filename
-        formdata[key] = upload_path
-        value.save(upload_path)
+        # An empty file input keeps the current file
+        if not value.filename:
+            continue
+        formdata[key] = store_stream(value.stream, value.filename, UPLOAD_FOLDER)
     if 'bibliography' in formdata:
         formdata['bibliography'] = clean_html(formdata['bibliography'])
     if 'biography' in formdata:
@@ -718,73 +935,40 @@ def save():
     connections = request.form.getlist('connection')
     obj_type = request.args.get('type')
     obj = {'org': Organization, 'person': Person, 'doc': Document}[obj_type]
-    if formdata.get('id'):
-        obj_id = formdata.pop('id')
-        stmt = select(obj).where(obj.id == obj_id)
-        with Session(engine) as session:
-            data = session.execute(stmt).scalar_one_or_none()
+    # The record, its regions and its connections are written in one transaction
+    with Session(get_engine()) as session, session.begin():
+        if formdata.get('id'):
+            obj_id = int(formdata.pop('id'))
+            data = session.execute(select(obj).where(obj.id == obj_id)).scalar_one_or_none()
+            if data is None:
+                abort(404)
             for key, value in formdata.items():
                 if value == '' or value == 'None':
                     value = None
                 if key.endswith('date') and value is not None:
                     value = datetime.strptime(value, '%Y-%m-%d')
                 setattr(data, key, value)
-            session.commit()
-    else:
-        data = obj(**formdata)
-        with Session(engine) as session:
+        else:
+            data = obj(**formdata)
             session.add(data)
-            session.commit()
-            obj_id = data.id
-
-    with Session(engine) as session:
+        session.flush()
+        obj_id = data.id
+        display = str(data)
+        linked = linked_records(session, obj_type, obj_id)
         if obj_type == 'person':
-            session.query(DocumentAuthorship).filter(DocumentAuthorship.person_id == obj_id).delete()
-            session.query(OrganizationMembership).filter(OrganizationMembership.person_id == obj_id).delete()
-            session.query(PersonFieldOfStudy).filter(PersonFieldOfStudy.person_id == obj_id).delete()
-            session.query(PersonEducation).filter(PersonEducation.person_id == obj_id).delete()
-        elif obj_type == 'org':
-            session.query(OrganizationMembership).filter(OrganizationMembership.organization_id == obj_id).delete()
-            session.query(PersonEducation).filter(PersonEducation.organization_id == obj_id).delete()
-        elif obj_type == 'doc':
-            session.query(DocumentAuthorship).filter(DocumentAuthorship.document_id == obj_id).delete()
-        session.commit()
-
-        for connection in connections:
-            connection_parts = connection.split(':')
-            connection_type = connection_parts[0]
-            connection_id = connection_parts[1]
-            connection_category = connection_parts[2] if len(connection_parts) > 2 else None
-            if obj == Person:
-                if connection_type == 'doc':
-                    session.add(DocumentAuthorship(document_id=connection_id, person_id=obj_id))
-                    session.commit()
-                elif connection_type == 'org':
-                    if connection_category == 'education':
-                        # This is an education relationship
-                        session.add(PersonEducation(organization_id=connection_id, person_id=obj_id))
-                        session.commit()
-                    else:
-                        # This is a regular organization membership
-                        session.add(OrganizationMembership(organization_id=connection_id, person_id=obj_id))
-                        session.commit()
-                elif connection_type == 'field_of_study':
-                    session.add(PersonFieldOfStudy(field_of_study_id=connection_id, person_id=obj_id))
-                    session.commit()
-            elif obj == Organization:
-                if connection_category == 'alumni':
-                    session.add(PersonEducation(organization_id=obj_id, person_id=connection_id))
-                    session.commit()
-                else:
-                    session.add(OrganizationMembership(organization_id=obj_id, person_id=connection_id))
-                    session.commit()
-            elif obj == Document:
-                session.add(DocumentAuthorship(document_id=obj_id, person_id=connection_id))
-                session.commit()
+            sync_person_regions(session, obj_id, data.area_of_study)
+        sync_connections(session, obj_type, obj_id, connections)
+        # Both the records it was linked to and the ones it is linked to now show this record
+        linked |= linked_records(session, obj_type, obj_id)
+    suggest_service.put(obj_type, obj_id, display)
+    invalidate_pages(obj_type, obj_id, linked)
+    if obj_type == 'person' and 'photo' in request.files and request.files['photo'].filename:
+        # The page is rendered again with the scaled-down copies once they exist
+        thumbnails.submit(formdata['photo'], on_done=lambda: page_cache.invalidate('person', obj_id))
     return render_template('redirect.html', url=f'/view?type={obj_type}&id={obj_id}')
 
 
-@app.route('/delete')
+@views.route('/delete')
 @login_required
 def delete():
     """
@@ -809,27 +993,33 @@ def delete():
     obj_id = request.args.get('id')
     obj = {'org': Organization, 'person': Person, 'doc': Document}[obj_type]
     stmt = select(obj).where(obj.id == obj_id)
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         data = session.execute(stmt).scalar_one_or_none()
         if data:
+            linked = linked_records(session, obj_type, int(obj_id))
+            delete_connections(session, obj_type, int(obj_id))
             if obj_type == 'person':
-                session.query(DocumentAuthorship).filter(DocumentAuthorship.person_id == obj_id).delete()
-                session.query(OrganizationMembership).filter(OrganizationMembership.person_id == obj_id).delete()
-                session.query(PersonFieldOfStudy).filter(PersonFieldOfStudy.person_id == obj_id).delete()
-                session.query(PersonEducation).filter(PersonEducation.person_id == obj_id).delete()
-            elif obj_type == 'org':
-                session.query(OrganizationMembership).filter(OrganizationMembership.organization_id == obj_id).delete()
-            elif obj_type == 'doc':
-                session.query(DocumentAuthorship).filter(DocumentAuthorship.document_id == obj_id).delete()
+                sync_person_regions(session, int(obj_id), None)
             session.delete(data)
             session.commit()
+            suggest_service.remove(obj_type, int(obj_id))
+            invalidate_pages(obj_type, obj_id, linked)
         else:
             abort(404)
 
     return render_template('redirect.html', url='/search')
 
 
+def __getattr__(name):
+    # `main.app` (e.g. `gunicorn main:app`) builds the application on first access
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 if __name__ == '__main__':
+    app = create_app()
     app.jinja_env.auto_reload = True
     app.config['TEMPLATES_AUTO_RELOAD'] = True
     app.run(host='localhost', port=5000, debug=True, ssl_context='adhoc')
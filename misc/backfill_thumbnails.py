@@ -0,0 +1,37 @@
+import argparse
+import time
+from concurrent.futures import as_completed
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from helper import UPLOAD_FOLDER, THUMBNAIL_WIDTHS, THUMBNAIL_WORKERS
+from helper.db.initialise_database import get_engine, Person
+from helper.storage.thumbnails import ThumbnailPool
+
+
+def backfill(folder, workers, force):
+    with Session(get_engine()) as session:
+        photos = sorted(set(session.scalars(select(Person.photo).where(Person.photo.is_not(None)))))
+    pool = ThumbnailPool(folder, THUMBNAIL_WIDTHS, workers)
+    futures = [future for future in (pool.submit(photo, force=force) for photo in photos) if future is not None]
+    print(f"{len(futures)} stored photos of {len(photos)}, the others are external or not yet migrated "
+          f"(python -m misc.convert_files)")
+    started = time.perf_counter()
+    failed = 0
+    for done, future in enumerate(as_completed(futures), 1):
+        failed += not future.result()
+        if done % 100 == 0:
+            print(f"{done}/{len(futures)} photos, {done / (time.perf_counter() - started):.1f}/s")
+    print(f"Thumbnails done: {len(futures) - failed} photos, {failed} failed.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Make the scaled-down copies of every stored person photo.")
+    parser.add_argument('--folder', default=UPLOAD_FOLDER, help='Path to the uploads folder')
+    parser.add_argument('--workers', type=int, default=THUMBNAIL_WORKERS, help='Threads making thumbnails')
+    parser.add_argument('--force', action='store_true', help='Rewrite thumbnails that already exist')
+    args = parser.parse_args()
+    backfill(args.folder, args.workers, args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,12 @@ import sys
 import zipfile
 import os
 import io
+import time
+import argparse
+import multiprocessing
 from dotenv import load_dotenv
 from helper.cleanup.htmlcleaner import clean_html
+from helper.db.geography import rebuild_regions
 
 csv.field_size_limit(sys.maxsize)
 
@@ -23,10 +27,28 @@ postgres_connection_string = (
     f"{os.getenv('DATABASE_PORT')}/"
     f"{os.getenv('DATABASE_NAME')}"
 )
-engine = create_engine(postgres_connection_string)
 zip_file_path = os.path.join(os.path.dirname(__file__), 'data.zip')
-conn = psycopg2.connect(postgres_connection_string)
-cur = conn.cursor()
+# Opened by connect() when the script runs, so importing this module (as worker processes may) connects nowhere
+engine = None
+conn = None
+cur = None
+
+# Set from the command line: load with COPY in batches of batch_size rows instead of one INSERT per row
+bulk_mode = False
+batch_size = 5000
+# Set from the command line: processes cleaning up person rows, and rows handed to a process at a time
+workers = os.cpu_count() or 1
+chunk_size = 16
+
+
+def connect():
+    """
+    Opens the database connections used by the conversion.
+    """
+    global engine, conn, cur
+    engine = create_engine(postgres_connection_string)
+    conn = psycopg2.connect(postgres_connection_string)
+    cur = conn.cursor()
 
 
 def load_sources():
@@ -63,6 +85,75 @@ def insert_data(table, columns, values):
     cur.execute(query, values)
 
 
+class TableWriter:
+    """
+    Writes converted rows into one table and reports the load rate when closed.
+    In bulk mode rows are collected into batches and streamed with COPY, otherwise every row is
+    inserted with `insert_data`. All rows written to one table must have the same keys.
+    Args:
+        table (str): The name of the table where data will be inserted.
+        unique (bool): Skip rows repeating an earlier one, for tables with a unique constraint on all columns.
+    """
+
+    def __init__(self, table, unique=False):
+        self.table = table
+        self.seen = set() if unique else None
+        self.skipped = 0
+        self.columns = None
+        self.batch = []
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+            elapsed = time.perf_counter() - self.started
+            print(f'{self.table}: {self.rows} rows in {elapsed:.1f} s ({self.rows / max(elapsed, 1e-9):.0f} rows/s)'
+                  + (f', {self.skipped} repeated rows skipped' if self.skipped else ''))
+
+    def write(self, data):
+        if self.columns is None:
+            self.columns = list(data.keys())
+        if self.seen is not None:
+            key = tuple(data.values())
+            if key in self.seen:
+                self.skipped += 1
+                return
+            self.seen.add(key)
+        self.rows += 1
+        if not bulk_mode:
+            insert_data(self.table, data.keys(), data.values())
+            return
+        self.batch.append(list(data.values()))
+        if len(self.batch) >= batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(self.batch)
+        buffer.seek(0)
+        cur.copy_expert(f"COPY {self.table} ({', '.join(self.columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        self.batch = []
+
+
+def load_id_map(table):
+    """
+    Maps the old IDs of the rows imported into a table to their new IDs.
+    Built once per table, so resolving a link costs a dictionary lookup instead of a query.
+    Args:
+        table (str): The name of the table ('person', 'document', 'organization').
+    Returns:
+        dict: New IDs keyed by old ID.
+    """
+    cur.execute(f"SELECT _oldid, id FROM {table} WHERE _oldid IS NOT NULL")
+    return dict(cur.fetchall())
+
+
 def clean_name(name):
     """
     Cleans the input name string by removing unwanted characters and normalizing spaces.
@@ -83,50 +174,6 @@ def clean_name(name):
     return name
 
 
-def get_new_person_id(old_person_id):
-    """
-    Retrieve the new person ID based on the old person ID.
-    Args:
-        old_person_id (int): The old person ID to look up.
-    Returns:
-        int or None: The new person ID if found, otherwise None.
-    """
-    query = "SELECT id FROM person WHERE _oldid = %s"
-    cur.execute(query, (old_person_id,))
-    result = cur.fetchone()
-    return result[0] if result else None
-
-
-def get_new_document_id(old_document_id):
-    """
-    Retrieve the new document ID based on the old document ID.
-    This function executes a SQL query to fetch the new document ID from the
-    'document' table where the '_oldid' matches the provided old_document_id.
-    Args:
-        old_document_id (int): The old document ID to search for.
-    Returns:
-        int or None: The new document ID if found, otherwise None.
-    """
-    query = "SELECT id FROM document WHERE _oldid = %s"
-    cur.execute(query, (old_document_id,))
-    result = cur.fetchone()
-    return result[0] if result else None
-
-
-def get_new_org_id(old_org_id):
-    """
-    Retrieve the new organization ID based on the old organization ID.
-    Args:
-        old_org_id (int): The old organization ID to look up.
-    Returns:
-        int or None: The new organization ID if found, otherwise None.
-    """
-    query = "SELECT id FROM organization WHERE _oldid = %s"
-    cur.execute(query, (old_org_id,))
-    result = cur.fetchone()
-    return result[0] if result else None
-
-
 def clean_date(date_str):
     """
     Cleans and converts a given date string into a standardized datetime object.
@@ -207,6 +254,58 @@ def clean_date(date_str):
     return None, date_str
 
 
+def transform_person(row):
+    """
+    Converts one row of person.csv into the values of a person record.
+    Pure and CPU-bound (HTML cleanup, date parsing, transliteration), so it can run in worker processes.
+    Args:
+        row (list): CSV row.
+    Returns:
+        dict: Column values, empty strings replaced with None.
+    """
+    comment = row[21]
+
+    patronymic = row[5]
+    patronymic_en = translit_ru(patronymic, reversed=True)
+
+    birth_date, birth_date_str = clean_date(row[10])
+    death_date, death_date_str = clean_date(row[12])
+    if birth_date is None and birth_date_str is not None and birth_date_str != '':
+        comment += f'Дата рождения: {birth_date_str}. '
+    if death_date is None and death_date_str is not None and death_date_str != '':
+        comment += f'Дата смерти: {death_date_str}. '
+
+    surname = row[6]
+    if surname is None or surname == '':
+        surname = row[1].strip().split()[0]
+
+    photo = row[20]
+    if photo is not None:
+        if photo.startswith('/higeo/hosted-files') or photo.startswith('/hosted-files'):
+            photo = 'http://higeo.ginras.ru' + photo
+
+    data = {
+        '_oldid': int(row[0]),
+        'name': clean_name(row[4]),
+        'surname': clean_name(surname),
+        'patronymic': patronymic,
+        'name_en': clean_name(row[7]),
+        'surname_en': clean_name(row[8]),
+        'patronymic_en': patronymic_en,
+        'birth_date': birth_date,
+        'birth_place': row[11],
+        'death_date': death_date,
+        'death_place': row[13],
+        'academic_degree': row[14],
+        'area_of_study': row[16],
+        'biography': clean_html(row[18]),
+        'bibliography': clean_html(row[19]),
+        'photo': photo,
+        'comment': comment
+    }
+    return {k: (v if v != '' else None) for k, v in data.items()}
+
+
 def convert_person():
     """
     Extracts and processes person data from a zipped CSV file, then inserts the processed data into a database.
@@ -215,58 +314,24 @@ def convert_person():
     It also handles transliteration of the patronymic and formats comments based on the presence of birth and death
     dates.
     Finally, it inserts the cleaned and processed data into a database table named 'person'.
+    The import is split into three stages: this process reads the rows, `transform_person` runs on a pool of
+    `workers` processes fed `chunk_size` rows at a time, and this process writes the results in input order,
+    so the output is the same as a serial run. With a single worker everything runs in this process.
     Raises:
         FileNotFoundError: If the zip file or the CSV file within the zip does not exist.
         KeyError: If the expected columns are not found in the CSV file.
         ValueError: If there are issues with data conversion or insertion.
     """
-    with zipfile.ZipFile(zip_file_path, 'r') as z:
+    with zipfile.ZipFile(zip_file_path, 'r') as z, TableWriter('person') as writer:
         with z.open('person.csv') as file:
             reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8'))
-            for row in reader:
-                comment = row[21]
-
-                patronymic = row[5]
-                patronymic_en = translit_ru(patronymic, reversed=True)
-
-                birth_date, birth_date_str = clean_date(row[10])
-                death_date, death_date_str = clean_date(row[12])
-                if birth_date is None and birth_date_str is not None and birth_date_str != '':
-                    comment += f'Дата рождения: {birth_date_str}. '
-                if death_date is None and death_date_str is not None and death_date_str != '':
-                    comment += f'Дата смерти: {death_date_str}. '
-
-                surname = row[6]
-                if surname is None or surname == '':
-                    surname = row[1].strip().split()[0]
-
-                photo = row[20]
-                if photo is not None:
-                    if photo.startswith('/higeo/hosted-files') or photo.startswith('/hosted-files'):
-                        photo = 'http://higeo.ginras.ru' + photo
-
-                data = {
-                    '_oldid': int(row[0]),
-                    'name': clean_name(row[4]),
-                    'surname': clean_name(surname),
-                    'patronymic': patronymic,
-                    'name_en': clean_name(row[7]),
-                    'surname_en': clean_name(row[8]),
-                    'patronymic_en': patronymic_en,
-                    'birth_date': birth_date,
-                    'birth_place': row[11],
-                    'death_date': death_date,
-                    'death_place': row[13],
-                    'academic_degree': row[14],
-                    'area_of_study': row[16],
-                    'biography': clean_html(row[18]),
-                    'bibliography': clean_html(row[19]),
-                    'photo': photo,
-                    'comment': comment
-                }
-                data = {k: (v if v != '' else None) for k, v in data.items()}
-
-                insert_data('person', data.keys(), data.values())
+            if workers > 1:
+                with multiprocessing.Pool(workers) as pool:
+                    for data in pool.imap(transform_person, reader, chunksize=chunk_size):
+                        writer.write(data)
+            else:
+                for row in reader:
+                    writer.write(transform_person(row))
 
 
 def convert_org():
@@ -278,7 +343,7 @@ def convert_org():
     3. Parses the CSV file and extracts relevant data from each row.
     4. Maps the extracted data to a dictionary with specific keys.
     5. Replaces empty string values with None.
-    6. Inserts the data into the 'organization' table using the `insert_data` function.
+    6. Writes the data into the 'organization' table through a `TableWriter`.
     The CSV file is expected to have the following columns:
     - Column 0: Old ID (converted to integer)
     - Column 1: Name
@@ -287,11 +352,10 @@ def convert_org():
     - Column 7: Comment
     Note:
     - The `zip_file_path` variable should be defined and point to the ZIP file location.
-    - The `insert_data` function should be defined to handle the insertion of data into the database.
     Raises:
-    - Any exceptions raised by the `zipfile.ZipFile`, `csv.reader`, or `insert_data` functions.
+    - Any exceptions raised by the `zipfile.ZipFile`, `csv.reader`, or `TableWriter`.
     """
-    with zipfile.ZipFile(zip_file_path, 'r') as z:
+    with zipfile.ZipFile(zip_file_path, 'r') as z, TableWriter('organization') as writer:
         with z.open('org.csv') as file:
             reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8'))
             for row in reader:
@@ -305,7 +369,7 @@ def convert_org():
                 }
                 data = {k: (v if v != '' else None) for k, v in data.items()}
 
-                insert_data('organization', data.keys(), data.values())
+                writer.write(data)
 
 
 def convert_doc():
@@ -322,14 +386,14 @@ def convert_doc():
         The function assumes the existence of the following:
         - `load_sources()`: A function that loads and returns a dictionary of source data.
         - `zip_file_path`: A variable containing the path to the zip file.
-        - `insert_data(table, keys, values)`: A function that inserts data into the specified table.
+        - `TableWriter`: Writes the rows into the specified table.
     Raises:
         KeyError: If the source ID is not found in the sources dictionary.
         ValueError: If any of the data conversion (e.g., int) fails.
     """
     sources_dict = load_sources()
 
-    with zipfile.ZipFile(zip_file_path, 'r') as z:
+    with zipfile.ZipFile(zip_file_path, 'r') as z, TableWriter('document') as writer:
         with z.open('pub.csv') as file:
             reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8'))
             for row in reader:
@@ -347,7 +411,7 @@ def convert_doc():
                 }
                 data = {k: (v if v != '' else None) for k, v in data.items()}
 
-                insert_data('document', data.keys(), data.values())
+                writer.write(data)
 
 
 def convert_field_of_study():
@@ -418,29 +482,31 @@ def convert_document_authorship():
     1. Opens the ZIP file specified by `zip_file_path`.
     2. Reads the 'author.csv' file from the ZIP archive.
     3. Iterates over each row in the CSV file.
-    4. Converts old document and person IDs to new IDs using `get_new_document_id` and `get_new_person_id`.
-    5. If both new IDs are valid, inserts the data into the 'document_authorship' table.
+    4. Converts old document and person IDs to new IDs using maps built once by `load_id_map`.
+    5. If both new IDs are valid, inserts the data into the 'document_authorship' table, once per pair.
     Note:
     - The `zip_file_path` variable should be defined and point to the ZIP file location.
-    - The `get_new_document_id` and `get_new_person_id` functions should be implemented to return the new IDs.
-    - The `insert_data` function should be implemented to handle the database insertion.
+    - Rows are written through `TableWriter`, with COPY in bulk mode.
     """
-    with zipfile.ZipFile(zip_file_path, 'r') as z:
+    person_ids = load_id_map('person')
+    document_ids = load_id_map('document')
+
+    with zipfile.ZipFile(zip_file_path, 'r') as z, TableWriter('document_authorship', unique=True) as writer:
         with z.open('author.csv') as file:
             reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8'))
             for row in reader:
                 old_document_id = int(row[0])
                 old_person_id = int(row[1])
 
-                new_person_id = get_new_person_id(old_person_id)
-                new_document_id = get_new_document_id(old_document_id)
+                new_person_id = person_ids.get(old_person_id)
+                new_document_id = document_ids.get(old_document_id)
 
                 if new_person_id and new_document_id:
                     data = {
                         'document_id': new_document_id,
                         'person_id': new_person_id
                     }
-                    insert_data('document_authorship', data.keys(), data.values())
+                    writer.write(data)
 
 
 def convert_organization_membership():
@@ -456,30 +522,31 @@ def convert_organization_membership():
     1. Opens the ZIP file specified by `zip_file_path`.
     2. Reads the 'employ.csv' file from the ZIP archive.
     3. Iterates over each row in the CSV file.
-    4. Converts old person and organization IDs to new IDs using `get_new_person_id` and `get_new_org_id`.
-    5. If both new IDs are valid, inserts the data into the 'organization_membership' table.
+    4. Converts old person and organization IDs to new IDs using maps built once by `load_id_map`.
+    5. If both new IDs are valid, inserts the data into the 'organization_membership' table, once per pair.
     Note:
     - The `zip_file_path` variable should be defined and point to the ZIP file location.
-    - The `get_new_person_id` and `get_new_org_id` functions should be implemented to return the new IDs.
-    - The `insert_data` function should be implemented to handle the database insertion.
+    - Rows are written through `TableWriter`, with COPY in bulk mode.
     """
+    person_ids = load_id_map('person')
+    org_ids = load_id_map('organization')
 
-    with zipfile.ZipFile(zip_file_path, 'r') as z:
+    with zipfile.ZipFile(zip_file_path, 'r') as z, TableWriter('organization_membership', unique=True) as writer:
         with z.open('employ.csv') as file:
             reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8'))
             for row in reader:
                 old_person_id = int(row[0])
                 old_org_id = int(row[1])
 
-                new_person_id = get_new_person_id(old_person_id)
-                new_org_id = get_new_org_id(old_org_id)
+                new_person_id = person_ids.get(old_person_id)
+                new_org_id = org_ids.get(old_org_id)
 
                 if new_person_id and new_org_id:
                     data = {
                         'person_id': new_person_id,
                         'organization_id': new_org_id
                     }
-                    insert_data('organization_membership', data.keys(), data.values())
+                    writer.write(data)
 
 
 def convert_person_field_of_study():
@@ -489,7 +556,7 @@ def convert_person_field_of_study():
     This function:
     1. Gets the field of study from each person record in the zipped CSV file
     2. Processes the field_of_study string by splitting it by commas
-    3. For each field, looks up the corresponding field_of_study ID from the database
+    3. For each field, looks up the corresponding field_of_study ID, loaded once from the database
     4. Creates a relationship entry in person_field_of_study table
 
     The function assumes convert_field_of_study() has been called before to populate
@@ -499,8 +566,9 @@ def convert_person_field_of_study():
     cur.execute("SELECT id, name FROM field_of_study")
     for row in cur.fetchall():
         field_map[row[1]] = row[0]
+    person_ids = load_id_map('person')
 
-    with zipfile.ZipFile(zip_file_path, 'r') as z:
+    with zipfile.ZipFile(zip_file_path, 'r') as z, TableWriter('person_field_of_study', unique=True) as writer:
         with z.open('person.csv') as file:
             reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8'))
             for row in reader:
@@ -509,30 +577,39 @@ def convert_person_field_of_study():
                 if not field_of_study_text or field_of_study_text == '':
                     continue
 
-                new_person_id = get_new_person_id(old_person_id)
+                new_person_id = person_ids.get(old_person_id)
                 if not new_person_id:
                     continue
 
                 fields = [field.strip() for field in field_of_study_text.split(',')]
                 for field in fields:
-                    field_id = None
-                    for db_field, db_id in field_map.items():
-                        if field == db_field:
-                            field_id = db_id
-                            break
+                    field_id = field_map.get(field)
                     if field_id:
                         data = {
                             'person_id': new_person_id,
                             'field_of_study_id': field_id
                         }
-                        try:
-                            insert_data('person_field_of_study', data.keys(), data.values())
-                        except Exception as e:
-                            print(f"Error inserting field of study '{field}' for person {new_person_id}: {e}")
+                        writer.write(data)
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Imports the legacy HiGeo CSV export from misc/data.zip.')
+    parser.add_argument('--bulk', action='store_true',
+                        help='load rows with COPY in batches instead of one INSERT each')
+    parser.add_argument('--batch-size', type=int, default=batch_size,
+                        help='rows per COPY batch (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=workers,
+                        help='processes cleaning up person rows, 1 to run serially (default: %(default)s)')
+    parser.add_argument('--chunk-size', type=int, default=chunk_size,
+                        help='person rows handed to a worker at a time (default: %(default)s)')
+    args = parser.parse_args()
+    bulk_mode = args.bulk
+    batch_size = args.batch_size
+    workers = args.workers
+    chunk_size = args.chunk_size
+
     assert input('proceed with data conversion? (y/n) ') == 'y'
+    connect()
     cur.execute("TRUNCATE TABLE person CASCADE")
     cur.execute("TRUNCATE TABLE organization CASCADE")
     cur.execute("TRUNCATE TABLE document CASCADE")
@@ -540,6 +617,7 @@ if __name__ == '__main__':
     cur.execute("TRUNCATE TABLE organization_membership CASCADE")
     cur.execute("TRUNCATE TABLE document_authorship CASCADE")
     cur.execute("TRUNCATE TABLE person_field_of_study CASCADE")
+    cur.execute("TRUNCATE TABLE region CASCADE")
     conn.commit()
     convert_person()
     convert_org()
@@ -550,7 +628,9 @@ if __name__ == '__main__':
     convert_organization_membership()
     convert_person_field_of_study()
     conn.commit()
+    with engine.begin() as connection:
+        rebuild_regions(connection)
     print("Data has been successfully imported and transformed.")
-cur.close()
-conn.close()
-engine.dispose()
+    cur.close()
+    conn.close()
+    engine.dispose()
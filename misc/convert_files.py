@@ -1,11 +1,13 @@
 import os
 import re
-import shutil
 import argparse
-from datetime import datetime
+from concurrent.futures import wait
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from helper.db.initialise_database import engine, Person, Document
+from sqlalchemy import or_, select
+from helper import UPLOAD_FOLDER, THUMBNAIL_WIDTHS, THUMBNAIL_WORKERS
+from helper.db.initialise_database import get_engine, Person, Document
+from helper.storage.thumbnails import ThumbnailPool
+from helper.storage.uploads import store_file
 
 
 def migrate_file(filename, prefix, old_files_dir, new_files_dir):
@@ -13,26 +15,48 @@ def migrate_file(filename, prefix, old_files_dir, new_files_dir):
     if not match:
         return None, None
     oldid = int(match.group(1))
-    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-    new_filename = f"[{timestamp}]{filename}"
-    src = os.path.join(old_files_dir, filename)
-    dst = os.path.join(new_files_dir, new_filename)
-    shutil.copy2(src, dst)
-    return oldid, dst
+    stored_name = store_file(os.path.join(old_files_dir, filename), new_files_dir)
+    return oldid, stored_name
+
+
+def rehash_local_files(session, new_files_dir):
+    """Copies files uploaded before content-addressed storage (static/uploads/[<time>]<name>) into it."""
+    for model, column in ((Person, 'photo'), (Document, 'file')):
+        for obj in session.query(model).filter(or_(getattr(model, column).like('static/uploads/%'),
+                                                   getattr(model, column).like('/static/uploads/%'))).all():
+            value = getattr(obj, column)
+            path = value.lstrip('/')
+            if not os.path.isfile(path):
+                continue
+            stored_name = store_file(path, new_files_dir)
+            setattr(obj, column, stored_name)
+            print(f"Stored {model.__name__} {obj.id} {column}: {value} -> {stored_name}")
+
+
+def make_thumbnails(session, new_files_dir):
+    """Makes the scaled-down copies of the person photos migrated so far."""
+    pool = ThumbnailPool(new_files_dir, THUMBNAIL_WIDTHS, THUMBNAIL_WORKERS)
+    futures = [pool.submit(photo) for photo in session.scalars(select(Person.photo).where(Person.photo.is_not(None)))]
+    wait([future for future in futures if future is not None])
 
 
 def update_database(old_files_dir, new_files_dir):
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
+        rehash_local_files(session, new_files_dir)
+        if old_files_dir is None:
+            session.commit()
+            make_thumbnails(session, new_files_dir)
+            return
         # Migrate documents for Document
         for fname in os.listdir(old_files_dir):
             if fname.startswith('pub-fil-'):
-                oldid, new_path = migrate_file(fname, 'pub', old_files_dir, new_files_dir)
-                if oldid and new_path:
+                oldid, stored_name = migrate_file(fname, 'pub', old_files_dir, new_files_dir)
+                if oldid and stored_name:
                     doc = session.query(Document).filter_by(_oldid=oldid).first()
                     if doc:
-                        doc.file = new_path
-                        print(f"Updated Document {doc.id} file: {new_path}")
-        # Replace URLs in photo/file fields with new local path if file exists
+                        doc.file = stored_name
+                        print(f"Updated Document {doc.id} file: {stored_name}")
+        # Replace URLs in photo/file fields with the stored file if it exists
         for person in session.query(Person).filter(
             or_(
                 Person.photo.like('http://higeo.ginras.ru/hosted-files/photo-fil%'),
@@ -49,19 +73,17 @@ def update_database(old_files_dir, new_files_dir):
                 fname = f"photo-fil-{oldid}.{ext}"
                 src_path = os.path.join(old_files_dir, fname)
                 if os.path.exists(src_path):
-                    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-                    new_filename = f"[{timestamp}]{fname}"
-                    dst_path = os.path.join(new_files_dir, new_filename)
-                    shutil.copy2(src_path, dst_path)
-                    person.photo = f"/static/uploads/{new_filename}"
+                    person.photo = store_file(src_path, new_files_dir)
                     print(f"Replaced URL for Person {person.id} photo: {person.photo}")
         session.commit()
+        make_thumbnails(session, new_files_dir)
 
 
 def main():
-    parser = argparse.ArgumentParser(description="Migrate files and update database paths.")
-    parser.add_argument('input_folder', help='Path to the folder containing old files')
-    parser.add_argument('--output-folder', default='static/uploads', help='Path to the new uploads folder')
+    parser = argparse.ArgumentParser(description="Migrate files into content-addressed storage and update database "
+                                                 "references. Files uploaded before it are always moved into it.")
+    parser.add_argument('input_folder', nargs='?', help='Path to the folder containing old files')
+    parser.add_argument('--output-folder', default=UPLOAD_FOLDER, help='Path to the uploads folder')
     args = parser.parse_args()
 
     os.makedirs(args.output_folder, exist_ok=True)
@@ -0,0 +1,95 @@
+"""
+Tests touching the database use the one configured by the DATABASE_* environment variables, with the
+tables created (python -m helper), and are skipped when it is not configured or cannot be reached.
+Records they need are created by fixtures and deleted afterwards. Pages of new records are not in the page cache yet.
+"""
+import os
+import pytest
+from sqlalchemy import delete, text
+from sqlalchemy.exc import ArgumentError, OperationalError
+from sqlalchemy.orm import Session
+
+# helper reads its settings on import
+os.environ.setdefault('ADMIN_DATA', '{}')
+
+pytest_plugins = ['helper.db.pytest_plugin']
+
+ADMIN_ID = 'pytest-admin'
+
+
+@pytest.fixture(scope='session')
+def engine():
+    import helper
+    from helper.db.initialise_database import get_engine
+    missing = [name for name in ('DATABASE_NAME', 'DATABASE_HOST', 'DATABASE_PORT', 'DATABASE_USER')
+               if not getattr(helper, name)]
+    if missing:
+        pytest.skip(f'database not configured: {", ".join(missing)} not set')
+    try:
+        engine = get_engine()
+    except (ValueError, ArgumentError) as e:
+        pytest.skip(f'database not configured: {e}')
+    try:
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1 FROM person LIMIT 1'))
+    except OperationalError as e:
+        pytest.skip(f'database not available: {e.orig}')
+    return engine
+
+
+@pytest.fixture(scope='session')
+def app():
+    import main
+    app = main.create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_client(client, monkeypatch):
+    from helper import ADMIN_DATA
+    monkeypatch.setitem(ADMIN_DATA, ADMIN_ID, 'pytest@example.com')
+    with client.session_transaction() as session:
+        session['_user_id'] = ADMIN_ID
+    return client
+
+
+@pytest.fixture
+def linked_person(engine):
+    """
+    A person with five organizations, documents, places of education and fields of study, every organization
+    and document shared with five colleagues. Yields a dict of the IDs: 'person', 'colleagues', 'org', 'doc',
+    'field_of_study'.
+    """
+    from helper.db.initialise_database import (Person, Organization, Document, FieldOfStudy, OrganizationMembership,
+                                               PersonEducation, DocumentAuthorship, PersonFieldOfStudy, PersonRegion)
+    with Session(engine) as session, session.begin():
+        person = Person(surname='Тестов', name='Пётр', patronymic='Иванович')
+        colleagues = [Person(surname='Коллегов', name=f'Иван {i}') for i in range(5)]
+        orgs = [Organization(name=f'Тестовый институт {i}') for i in range(5)]
+        docs = [Document(name=f'Тестовая статья {i}', doc_type='Статья') for i in range(5)]
+        fields = [FieldOfStudy(name=f'Тестовая наука {i}') for i in range(5)]
+        session.add_all([person, *colleagues, *orgs, *docs, *fields])
+        session.flush()
+        for member in [person, *colleagues]:
+            session.add_all(OrganizationMembership(person_id=member.id, organization_id=org.id) for org in orgs)
+            session.add_all(DocumentAuthorship(person_id=member.id, document_id=doc.id) for doc in docs)
+        session.add_all(PersonEducation(person_id=person.id, organization_id=org.id) for org in orgs)
+        session.add_all(PersonFieldOfStudy(person_id=person.id, field_of_study_id=field.id) for field in fields)
+        ids = {'person': person.id, 'colleagues': [colleague.id for colleague in colleagues],
+               'org': [org.id for org in orgs], 'doc': [doc.id for doc in docs],
+               'field_of_study': [field.id for field in fields]}
+    yield ids
+    person_ids = [ids['person'], *ids['colleagues']]
+    with Session(engine) as session, session.begin():
+        for model in (OrganizationMembership, PersonEducation, DocumentAuthorship, PersonFieldOfStudy, PersonRegion):
+            session.execute(delete(model).where(model.person_id.in_(person_ids)))
+        session.execute(delete(Person).where(Person.id.in_(person_ids)))
+        session.execute(delete(Organization).where(Organization.id.in_(ids['org'])))
+        session.execute(delete(Document).where(Document.id.in_(ids['doc'])))
+        session.execute(delete(FieldOfStudy).where(FieldOfStudy.id.in_(ids['field_of_study'])))
@@ -0,0 +1,77 @@
+import random
+import pytest
+from bench.corpus.generate import (FIELDS_OF_STUDY, association_rows, copy_rows, document_rows, organization_rows,
+                                   person_rows)
+from bench.suite import compare, measure
+
+PERSON_COLUMNS = ['surname', 'name', 'patronymic', 'name_en', 'surname_en', 'patronymic_en', 'birth_date',
+                  'death_date', 'birth_place', 'death_place', 'academic_degree', 'area_of_study', 'biography',
+                  'bibliography', 'photo', 'comment']
+
+
+def test_corpus_is_reproducible():
+    first = list(person_rows(random.Random(3), 20))
+    assert first == list(person_rows(random.Random(3), 20))
+    assert first != list(person_rows(random.Random(4), 20))
+
+
+def test_persons_are_plausible():
+    for row in person_rows(random.Random(0), 200):
+        person = dict(zip(PERSON_COLUMNS, row))
+        assert len(row) == len(PERSON_COLUMNS)
+        assert person['surname'] and person['name'] and person['surname_en'].isascii()
+        assert person['death_date'] is None or person['birth_date'] < person['death_date']
+        assert person['biography'].startswith('<p class=GIN>')
+
+
+@pytest.mark.parametrize('low, high', [(0, 2), (1, 3), (5, 50)])
+def test_association_rows_are_unique_pairs(low, high):
+    rows = list(association_rows(random.Random(0), 100, 20, low, high))
+    assert len(rows) == len(set(rows))
+    for owner in range(1, 101):
+        others = [other for row_owner, other in rows if row_owner == owner]
+        assert low <= len(others) <= min(high, 20)
+        assert all(1 <= other <= 20 for other in others)
+
+
+def test_corpus_loads_into_the_schema(engine):
+    # Loaded into temporary copies of the tables, so the records of the database are left alone
+    rnd = random.Random(0)
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for table in ('field_of_study', 'person', 'organization', 'document', 'document_authorship'):
+            cursor.execute(f'CREATE TEMP TABLE {table} (LIKE public.{table} INCLUDING DEFAULTS INCLUDING IDENTITY '
+                           f'INCLUDING GENERATED INCLUDING CONSTRAINTS)')
+        assert copy_rows(cursor, 'pg_temp.field_of_study', ['name'], ((name,) for name in FIELDS_OF_STUDY)) == \
+            len(FIELDS_OF_STUDY)
+        assert copy_rows(cursor, 'pg_temp.person', PERSON_COLUMNS, person_rows(rnd, 50), batch_size=20) == 50
+        assert copy_rows(cursor, 'pg_temp.organization', ['name', 'org_type', 'history', 'comment'],
+                         organization_rows(rnd, 20)) == 20
+        assert copy_rows(cursor, 'pg_temp.document', ['name', 'doc_type', 'language', 'source', 'year', 'file',
+                                                      'comment'], document_rows(rnd, 100)) == 100
+        links = copy_rows(cursor, 'pg_temp.document_authorship', ['document_id', 'person_id'],
+                          association_rows(rnd, 100, 50, 1, 3))
+        cursor.execute('SELECT count(*), count(search_vector), count(death_date) FROM pg_temp.person')
+        persons, vectors, dead = cursor.fetchone()
+        assert persons == vectors == 50 and 0 < dead < 50
+        cursor.execute('SELECT count(DISTINCT (document_id, person_id)) FROM pg_temp.document_authorship')
+        assert cursor.fetchone()[0] == links
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+def test_measure_warms_up_and_repeats():
+    calls = []
+    result = measure(lambda: calls.append(1), 4)
+    assert len(calls) == 5 and result['runs'] == 4
+    assert result['min_ms'] <= result['median_ms'] <= result['max_ms']
+
+
+def test_compare_skips_failed_and_new_benchmarks(capsys):
+    old = {'results': {'a': {'median_ms': 2.0}, 'b': {'median_ms': 1.0}}}
+    new = {'results': {'a': {'median_ms': 1.0}, 'b': {'error': 'RuntimeError: boom'}, 'c': {'median_ms': 3.0}}}
+    compare(old, new)
+    lines = capsys.readouterr().out.strip().splitlines()
+    assert len(lines) == 2 and lines[1].split()[0] == 'a' and lines[1].endswith('0.50x')
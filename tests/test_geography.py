@@ -0,0 +1,94 @@
+import threading
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from helper.db import geography
+from helper.db.geography import region_key, sync_person_regions
+from helper.db.initialise_database import Region
+
+REGION = 'Тестовый регион для гонки'
+
+
+def region_count(engine):
+    with Session(engine) as session:
+        return session.scalar(select(Region.person_count).where(Region.key == region_key(REGION)))
+
+
+def save(engine, person_id, area_of_study):
+    with Session(engine) as session, session.begin():
+        sync_person_regions(session, person_id, area_of_study)
+
+
+def try_save(engine, person_id, area_of_study):
+    """Saves and returns the errors raised, for saves run in another thread."""
+    try:
+        save(engine, person_id, area_of_study)
+    except Exception as e:
+        return [e]
+    return []
+
+
+def save_in_background(engine, person_id, area_of_study, errors):
+    thread = threading.Thread(target=lambda: errors.extend(try_save(engine, person_id, area_of_study)))
+    thread.start()
+    return thread
+
+
+def race(engine, first, second):
+    """
+    Saves `first` (person ID, area of study) in a transaction that stays open while `second` is saved
+    in another thread, then commits it and waits for the other save.
+    """
+    errors = []
+    with Session(engine) as session, session.begin():
+        sync_person_regions(session, *first)
+        thread = save_in_background(engine, *second, errors)
+        thread.join(0.5)
+    thread.join(5)
+    assert not thread.is_alive()
+    assert not errors
+
+
+def test_concurrent_saves_count_every_person(engine, linked_person, monkeypatch):
+    existing, first, second = linked_person['colleagues'][:3]
+    save(engine, existing, REGION)
+    linked, resume, errors = threading.Event(), threading.Event(), []
+    update_counts = geography._update_counts
+
+    def paused_update_counts(session, region_ids):
+        # The background save has linked its person and recounts only once the other save has run
+        if threading.current_thread().name == 'paused':
+            linked.set()
+            resume.wait(5)
+        update_counts(session, region_ids)
+
+    monkeypatch.setattr(geography, '_update_counts', paused_update_counts)
+    try:
+        thread = threading.Thread(target=lambda: errors.extend(try_save(engine, second, REGION)), name='paused')
+        thread.start()
+        assert linked.wait(5)
+        threading.Timer(0.2, resume.set).start()
+        with Session(engine) as session, session.begin():
+            sync_person_regions(session, first, REGION)
+            # Still open while the background save recounts
+            thread.join(0.5)
+        thread.join(5)
+        assert not errors and not thread.is_alive()
+        assert region_count(engine) == 3
+    finally:
+        resume.set()
+        for person_id in (existing, first, second):
+            save(engine, person_id, None)
+    assert region_count(engine) is None
+
+
+def test_region_is_kept_while_a_concurrent_save_links_it(engine, linked_person):
+    leaving, joining = linked_person['colleagues'][:2]
+    save(engine, leaving, REGION)
+    try:
+        # The region loses its only person while another one is being linked to it
+        race(engine, (joining, REGION), (leaving, None))
+        assert region_count(engine) == 1
+    finally:
+        for person_id in (leaving, joining):
+            save(engine, person_id, None)
+    assert region_count(engine) is None
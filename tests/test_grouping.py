@@ -0,0 +1,10 @@
+from helper.db.initialise_database import sort_key
+from helper.listing.grouping import group_by_letter
+
+
+def test_yo_shares_the_ye_bucket():
+    names = ['Жданов', 'Ёлкин', 'Еловый', 'ёмкость', 'Яковлев', 'Егоров']
+    # The order the database returns with sort_key_expression
+    results = [['org', i, name] for i, name in enumerate(sorted(names, key=sort_key))]
+    letters = [letter for letter, _ in group_by_letter(results, num_cols=2)]
+    assert letters == ['Е', 'Ж', 'Я']
@@ -0,0 +1,18 @@
+import random
+import pytest
+from helper.cleanup.htmlcleaner import clean_html
+from bench.htmlcleaner.golden import FRAGMENTS, corpus_files, expected_path, read
+from bench.htmlcleaner.reference import clean_html_reference
+
+
+@pytest.mark.parametrize('path', corpus_files(), ids=lambda path: path.stem)
+def test_golden_output(path):
+    assert clean_html(read(path)) == read(expected_path(path))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_matches_the_reference_on_random_documents(seed):
+    rnd = random.Random(seed)
+    for _ in range(500):
+        doc = ''.join(rnd.choice(FRAGMENTS) for _ in range(rnd.randint(1, 80)))
+        assert clean_html(doc) == clean_html_reference(doc), doc
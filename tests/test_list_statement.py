@@ -0,0 +1,51 @@
+from datetime import datetime
+import pytest
+from helper.db.pagination import encode_cursor
+from helper.db.queries import LIST_SORT_FIELDS, list_statement
+
+
+@pytest.mark.parametrize('obj_type', sorted(LIST_SORT_FIELDS))
+def test_every_sort_field_builds(obj_type):
+    for sort_field in LIST_SORT_FIELDS[obj_type]:
+        stmt, column_count, limit = list_statement(obj_type, sort_field, limit=10)
+        assert column_count == 2 and limit == 10
+        assert 'ORDER BY' in str(stmt)
+
+
+@pytest.mark.parametrize('obj_type, sort_field', [
+    ('org', 'id'),
+    ('doc', 'comment'),
+    ('person', 'search_vector'),
+    ('person', 'biography'),
+    ('person', 'sort_name'),
+    ('field_of_study', '__class__'),
+])
+def test_unsortable_fields_are_rejected(obj_type, sort_field):
+    with pytest.raises(LookupError):
+        list_statement(obj_type, sort_field)
+
+
+@pytest.mark.parametrize('obj_type, sort_field, values', [
+    ('org', 'name', ['институт', 12]),
+    ('person', 'surname', ['иванов иван', 3]),
+    ('person', 'birth_date', [datetime(1850, 1, 1), 3]),
+    ('person', 'birth_date', [None, 3]),
+    ('doc', 'language', [None, 7]),
+])
+def test_cursor_of_the_sort_keys_is_accepted(obj_type, sort_field, values):
+    list_statement(obj_type, sort_field, after=encode_cursor(values))
+
+
+@pytest.mark.parametrize('obj_type, sort_field, cursor', [
+    ('org', 'name', encode_cursor([1, 12])),
+    ('org', 'name', encode_cursor(['институт', 'x'])),
+    ('org', 'name', encode_cursor(['институт', True])),
+    ('org', 'name', encode_cursor([None, 12])),
+    ('person', 'surname', encode_cursor(['иванов', 3, 4])),
+    ('person', 'birth_date', encode_cursor(['1850-01-01', 3])),
+    ('person', 'surname', encode_cursor({'a': 1})),
+    ('person', 'surname', 'not a cursor!'),
+])
+def test_tampered_cursor_is_rejected(obj_type, sort_field, cursor):
+    with pytest.raises(LookupError):
+        list_statement(obj_type, sort_field, after=cursor)
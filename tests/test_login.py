@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+from helper.login.provider import OAuthProvider, ProviderUnavailable
+
+
+class StandInProvider(BaseHTTPRequestHandler):
+    """Local identity provider answering the discovery, token and userinfo requests of the login flow."""
+
+    def do_GET(self):
+        server = self.server
+        path = urlparse(self.path).path
+        if path == '/.well-known/openid-configuration':
+            server.discovery_requests += 1
+            if server.down:
+                return self._send(503, {})
+            base = f'http://127.0.0.1:{server.server_port}'
+            self._send(200, {'issuer': base, 'authorization_endpoint': f'{base}/authorize',
+                             'token_endpoint': f'{base}/token', 'userinfo_endpoint': f'{base}/userinfo',
+                             'generation': server.discovery_requests})
+        elif path == '/userinfo' and self.headers.get('Authorization') == 'Bearer stand-in-token':
+            self._send(200, {'email': server.email, 'email_verified': True})
+        else:
+            self._send(404, {})
+
+    def do_POST(self):
+        body = parse_qs(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode())
+        if urlparse(self.path).path == '/token' and body.get('code') == ['stand-in-code']:
+            self._send(200, {'access_token': 'stand-in-token', 'token_type': 'Bearer', 'expires_in': 3600})
+        else:
+            self._send(400, {'error': 'invalid_grant'})
+
+    def _send(self, status, document):
+        payload = json.dumps(document).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def identity_provider():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInProvider)
+    server.discovery_requests = 0
+    server.down = False
+    server.email = 'stand-in-admin@example.com'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def discovery_url(server):
+    return f'http://127.0.0.1:{server.server_port}/.well-known/openid-configuration'
+
+
+def test_discovery_is_fetched_once_and_lazily(identity_provider):
+    provider = OAuthProvider(discovery_url(identity_provider))
+    assert identity_provider.discovery_requests == 0
+    assert provider.endpoint('token_endpoint').endswith('/token')
+    provider.endpoint('userinfo_endpoint')
+    assert identity_provider.discovery_requests == 1
+
+
+def test_expired_discovery_is_refreshed_in_the_background(identity_provider):
+    provider = OAuthProvider(discovery_url(identity_provider), ttl=0)
+    assert provider.config()['generation'] == 1
+    # The expired copy is returned while the new one is fetched
+    assert provider.config()['generation'] == 1
+    deadline = time.monotonic() + 5
+    while provider.config()['generation'] == 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert provider.config()['generation'] > 1
+
+
+def test_failed_refresh_keeps_the_old_copy(identity_provider):
+    provider = OAuthProvider(discovery_url(identity_provider))
+    provider.config()
+    identity_provider.down = True
+    with pytest.raises(ProviderUnavailable):
+        provider._discovery.refresh()
+    assert provider.endpoint('token_endpoint').endswith('/token')
+
+
+def test_unreachable_provider():
+    with pytest.raises(ProviderUnavailable):
+        OAuthProvider('http://127.0.0.1:9/.well-known/openid-configuration', timeout=1).config()
+
+
+def test_login_flow(app, identity_provider, monkeypatch):
+    from oauthlib.oauth2 import WebApplicationClient
+    from helper import ADMIN_DATA
+    from helper.login import login
+
+    # oauthlib refuses plain HTTP endpoints otherwise
+    monkeypatch.setenv('OAUTHLIB_INSECURE_TRANSPORT', '1')
+    monkeypatch.setattr(login, 'provider', OAuthProvider(discovery_url(identity_provider)))
+    monkeypatch.setattr(login, 'client', WebApplicationClient('stand-in-client'))
+    monkeypatch.setattr(login, 'GOOGLE_CLIENT_ID', 'stand-in-client')
+    monkeypatch.setattr(login, 'GOOGLE_CLIENT_SECRET', 'stand-in-secret')
+    monkeypatch.setitem(ADMIN_DATA, 'stand-in-admin', identity_provider.email)
+    client = app.test_client()
+
+    response = client.get('/login')
+    assert response.status_code == 302
+    assert response.location.startswith(f'http://127.0.0.1:{identity_provider.server_port}/authorize?')
+
+    response = client.get('/login/callback?code=stand-in-code')
+    assert response.status_code == 302 and response.location.endswith('/search')
+    with client.session_transaction() as session:
+        assert session['_user_id'] == 'stand-in-admin'
+
+    identity_provider.email = 'someone@example.com'
+    assert app.test_client().get('/login/callback?code=stand-in-code').status_code == 403
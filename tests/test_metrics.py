@@ -0,0 +1,66 @@
+from flask import Flask, send_file
+from werkzeug.test import EnvironBuilder
+from helper.metrics.request_metrics import RequestMetrics, init_metrics
+
+
+class FileWrapper:
+    """Stand-in for the file wrapper of a server that sends files with sendfile."""
+
+    def __init__(self, file, block_size=8192):
+        self.file = file
+        self.block_size = block_size
+
+    def __iter__(self):
+        return iter(lambda: self.file.read(self.block_size), b'')
+
+    def close(self):
+        self.file.close()
+
+
+def make_app(tmp_path):
+    upload = tmp_path / 'photo.jpg'
+    upload.write_bytes(b'x' * 5000)
+    app = Flask(__name__)
+    metrics = RequestMetrics()
+    init_metrics(app, metrics)
+
+    @app.route('/uploads/photo.jpg')
+    def uploaded():
+        return send_file(upload)
+
+    @app.route('/page')
+    def page():
+        return 'y' * 300
+    return app, metrics
+
+
+def call(app, path):
+    environ = EnvironBuilder(path=path).get_environ()
+    environ['wsgi.file_wrapper'] = FileWrapper
+    started = []
+    app_iter = app.wsgi_app(environ, lambda status, headers, exc_info=None: started.append(status))
+    return environ, app_iter
+
+
+def test_file_responses_reach_the_server_unwrapped(tmp_path):
+    app, metrics = make_app(tmp_path)
+    environ, app_iter = call(app, '/uploads/photo.jpg')
+    # The server compares the response with its own wrapper class to send it with sendfile
+    assert isinstance(app_iter, environ['wsgi.file_wrapper'])
+    assert b''.join(app_iter) == b'x' * 5000
+    app_iter.close()
+    text = metrics.render()
+    assert 'higeo_responses_total{route="/uploads/photo.jpg",mode="",status="200"} 1' in text
+    assert 'higeo_response_size_bytes_sum{route="/uploads/photo.jpg",mode=""} 5000.000000' in text
+    assert 'higeo_requests_in_flight{route="/uploads/photo.jpg",mode=""} 0' in text
+
+
+def test_other_responses_are_measured_when_sent(tmp_path):
+    app, metrics = make_app(tmp_path)
+    _, app_iter = call(app, '/page')
+    assert 'higeo_responses_total{route="/page"' not in metrics.render()
+    assert b''.join(app_iter) == b'y' * 300
+    app_iter.close()
+    text = metrics.render()
+    assert 'higeo_responses_total{route="/page",mode="",status="200"} 1' in text
+    assert 'higeo_response_size_bytes_sum{route="/page",mode=""} 300.000000' in text
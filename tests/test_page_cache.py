@@ -0,0 +1,60 @@
+import sys
+import pytest
+from helper.cache.page_cache import LRUBackend, PageCache, create_page_cache
+
+
+def test_redis_backend_without_the_package_is_a_configuration_error(monkeypatch):
+    # A None entry makes `import redis` fail as if the package were missing
+    monkeypatch.setitem(sys.modules, 'redis', None)
+    with pytest.raises(RuntimeError, match='redis package is not installed'):
+        create_page_cache(16, shared_url='redis://localhost:6379/0')
+
+
+def test_invalidation_drops_every_locale():
+    cache = PageCache(LRUBackend(4))
+    for locale in ('ru', 'en'):
+        cache.set(cache.key('person', 1, locale), locale)
+    cache.set(cache.key('person', 2, 'ru'), 'other')
+    cache.invalidate('person', 1)
+    assert cache.get(cache.key('person', 1, 'ru')) is None
+    assert cache.get(cache.key('person', 1, 'en')) is None
+    assert cache.get(cache.key('person', 2, 'ru')) == 'other'
+
+
+def test_page_rendered_during_a_change_is_not_kept():
+    cache = PageCache(LRUBackend(4))
+    renders = []
+
+    @cache.cached(lambda: cache.key('person', 1, 'ru'))
+    def view():
+        renders.append(1)
+        if len(renders) == 1:
+            # A save commits and invalidates while the first request is still rendering the old data
+            cache.invalidate('person', 1)
+            return 'stale'
+        return 'fresh'
+
+    assert view() == 'stale'
+    assert view() == 'fresh'
+    assert view() == 'fresh'
+    assert len(renders) == 2
+
+
+def test_type_invalidation_drops_every_object_of_the_type():
+    cache = PageCache(LRUBackend(8))
+    cache.set(cache.key('geography', 'Урал', 'ru'), 'urals')
+    cache.set(cache.key('geography', 'Крым', 'en'), 'crimea')
+    cache.set(cache.key('person', 1, 'ru'), 'person')
+    cache.invalidate_type('geography')
+    assert cache.get(cache.key('geography', 'Урал', 'ru')) is None
+    assert cache.get(cache.key('geography', 'Крым', 'en')) is None
+    assert cache.get(cache.key('person', 1, 'ru')) == 'person'
+
+
+def test_invalidation_reaches_the_local_copies_of_other_workers():
+    shared = LRUBackend(8)
+    first, second = PageCache(LRUBackend(4), shared=shared), PageCache(LRUBackend(4), shared=shared)
+    first.set(first.key('doc', 5, 'ru'), 'old')
+    assert second.get(second.key('doc', 5, 'ru')) == 'old'
+    first.invalidate('doc', 5)
+    assert second.get(second.key('doc', 5, 'ru')) is None
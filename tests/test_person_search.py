@@ -0,0 +1,25 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+from werkzeug.datastructures import MultiDict
+from helper.db.initialise_database import Person
+from helper.db.queries import person_search_statement
+
+
+def compiled(clause):
+    return str(clause.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+
+
+def index_expression(name):
+    index = next(index for index in Person.__table__.indexes if index.name == name)
+    return compiled(index.expressions[0])
+
+
+@pytest.mark.parametrize('args, index_name', [
+    ({'firstName': 'Ale'}, 'ix_person_name_en_or_ru_lower'),
+    ({'fullName': 'Ivanov Ivan'}, 'ix_person_surname_en_or_ru_lower'),
+    ({'lastName': 'Ivanof', 'fuzzy': '1'}, 'ix_person_surname_en_or_ru_trgm'),
+    ({'fullName': 'Ivanof', 'fuzzy': '1'}, 'ix_person_surname_en_or_ru_trgm'),
+])
+def test_english_filters_match_their_indexes(args, index_name):
+    # Word for word, or PostgreSQL cannot use the index
+    assert index_expression(index_name) in compiled(person_search_statement(MultiDict(args), True))
@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+
+# Statements of one page: the table versions, the photo of a person, the record and one per eager-loaded relationship
+VIEW_BUDGETS = {'person': 7, 'org': 4, 'doc': 3, 'field_of_study': 3}
+
+
+@pytest.mark.parametrize('obj_type', sorted(VIEW_BUDGETS))
+@pytest.mark.parametrize('lang', ['ru', 'en'])
+def test_view_stays_within_budget(client, query_budget, linked_person, obj_type, lang):
+    obj_id = linked_person['person'] if obj_type == 'person' else linked_person[obj_type][0]
+    # No statement may run twice: relationships are loaded once for all rows, never row by row
+    with query_budget(VIEW_BUDGETS[obj_type], max_repeats=2):
+        response = client.get(f'/view?type={obj_type}&id={obj_id}&lang={lang}')
+    assert response.status_code == 200
+
+
+def test_save_stays_within_budget(admin_client, query_budget, linked_person, engine):
+    from helper.db.initialise_database import DocumentAuthorship, OrganizationMembership
+
+    person_id = linked_person['person']
+    kept_docs = linked_person['doc'][:3]
+    connections = [f'org:{org_id}' for org_id in linked_person['org']] + [f'doc:{doc_id}' for doc_id in kept_docs]
+    # The links of every association table are read before and after the change and once to compare them
+    with query_budget(17, max_repeats=4):
+        response = admin_client.post('/save?type=person', data={
+            'id': person_id, 'surname': 'Тестов', 'name': 'Пётр', 'connection': connections})
+    assert response.status_code == 200
+    with Session(engine) as session:
+        docs = session.scalars(select(DocumentAuthorship.document_id)
+                               .where(DocumentAuthorship.person_id == person_id)).all()
+        orgs = session.scalars(select(OrganizationMembership.organization_id)
+                               .where(OrganizationMembership.person_id == person_id)).all()
+    assert sorted(docs) == sorted(kept_docs)
+    assert sorted(orgs) == sorted(linked_person['org'])
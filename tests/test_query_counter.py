@@ -0,0 +1,14 @@
+from flask import Flask
+from helper.db.query_counter import init_query_counting
+
+
+def make_app(debug):
+    app = Flask(__name__)
+    init_query_counting(app, debug=debug)
+    app.add_url_rule('/', 'index', lambda: 'ok')
+    return app
+
+
+def test_server_timing_is_only_sent_in_debug_mode():
+    assert 'Server-Timing' not in make_app(debug=False).test_client().get('/').headers
+    assert make_app(debug=True).test_client().get('/').headers['Server-Timing'] == 'db;desc="0 queries";dur=0.0'
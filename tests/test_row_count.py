@@ -0,0 +1,22 @@
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+
+def test_row_count_is_only_recounted_after_a_change(engine, query_budget):
+    import main
+    from helper.db.initialise_database import FieldOfStudy
+
+    before = main.table_row_count(FieldOfStudy)
+    # The table version alone
+    with query_budget(1):
+        assert main.table_row_count(FieldOfStudy) == before
+    with Session(engine) as session, session.begin():
+        field = FieldOfStudy(name='Тестовая наука для подсчёта')
+        session.add(field)
+        session.flush()
+        field_id = field.id
+    try:
+        assert main.table_row_count(FieldOfStudy) == before + 1
+    finally:
+        with Session(engine) as session, session.begin():
+            session.execute(delete(FieldOfStudy).where(FieldOfStudy.id == field_id))
@@ -0,0 +1,69 @@
+import threading
+from contextlib import contextmanager
+from helper.search.suggest import PrefixIndex, SuggestService
+
+
+def test_yo_is_found_as_ye():
+    index = PrefixIndex()
+    index.replace([('person', 1, 'Ёлкин Пётр'), ('person', 2, 'Елисеев Иван'), ('person', 3, 'Жуков Олег')])
+    assert [result[1] for result in index.search('person', 'елк', 10)] == [1]
+    assert [result[1] for result in index.search('person', 'ЁЛ', 10)] == [2, 1]
+    assert index.search('person', 'елкин  петр', 10) == [['person', 1, 'Ёлкин Пётр']]
+
+
+def test_put_and_remove_keep_the_entries_sorted():
+    index = PrefixIndex()
+    index.replace([('org', 1, 'Институт А'), ('org', 2, 'Институт В')])
+    index.put('org', 3, 'Институт Б')
+    index.put('org', 1, 'Институт Г')
+    index.remove('org', 2)
+    index.remove('org', 99)
+    assert index.search('org', 'инст', 10) == [['org', 3, 'Институт Б'], ['org', 1, 'Институт Г']]
+
+
+def test_changes_made_during_a_rebuild_are_kept():
+    index = PrefixIndex()
+    index.replace([('doc', 1, 'Старое название'), ('doc', 2, 'Удалённый')])
+
+    def snapshot():
+        # The data was read before these changes were saved
+        yield 'doc', 1, 'Старое название'
+        index.put('doc', 1, 'Новое название')
+        index.put('doc', 3, 'Добавленный')
+        index.remove('doc', 2)
+        yield 'doc', 2, 'Удалённый'
+
+    index.replace(snapshot())
+    assert index.search('doc', '', 10) == [['doc', 3, 'Добавленный'], ['doc', 1, 'Новое название']]
+
+
+class StubSession:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, stmt):
+        return self.rows.pop(0) if self.rows else []
+
+
+def test_stale_index_is_reloaded_without_blocking_requests():
+    service = SuggestService(max_age=0)
+    release, reloaded = threading.Event(), threading.Event()
+
+    @contextmanager
+    def first_session():
+        yield StubSession([[(1, 'Иванов Иван')]])
+
+    @contextmanager
+    def slow_session():
+        release.wait(5)
+        yield StubSession([[(1, 'Иванов Иван'), (2, 'Петров Пётр')]])
+        reloaded.set()
+
+    service.ensure_loaded(first_session)
+    # Returns at once with the old index while the reload waits for the database
+    service.ensure_loaded(slow_session)
+    assert service.suggest('person', 'п', 10) == []
+    release.set()
+    # Set once the session closes, after the new index is installed
+    assert reloaded.wait(5)
+    assert service.suggest('person', 'п', 10) == [['person', 2, 'Петров Пётр']]
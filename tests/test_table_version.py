@@ -0,0 +1,93 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+
+def versions(engine, *tables):
+    with engine.connect() as connection:
+        rows = connection.execute(text('SELECT table_name, version FROM table_version WHERE table_name IN :tables')
+                                  .bindparams(tables=tables)).all()
+    return dict(rows)
+
+
+def test_statements_changing_nothing_keep_the_version(engine):
+    before = versions(engine, 'person', 'organization_membership')
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE person SET comment = 'x' WHERE false"))
+        connection.execute(text('DELETE FROM organization_membership WHERE person_id = -1'))
+        connection.execute(text('INSERT INTO organization_membership (person_id, organization_id) '
+                                'SELECT person_id, organization_id FROM organization_membership WHERE false'))
+    assert versions(engine, 'person', 'organization_membership') == before
+
+
+def test_version_is_bumped_once_at_commit(engine, linked_person):
+    before = versions(engine, 'person', 'organization')
+    with engine.begin() as connection:
+        for person_id in linked_person['colleagues']:
+            connection.execute(text("UPDATE person SET comment = 'bumped' WHERE id = :id"), {'id': person_id})
+        # Not before the commit
+        assert versions(engine, 'person') == {'person': before['person']}
+    expected = {'person': before['person'] + 1, 'organization': before['organization']}
+    assert versions(engine, 'person', 'organization') == expected
+    with engine.connect() as connection:
+        assert connection.execute(text('SELECT count(*) FROM table_version_change')).scalar_one() == 0
+
+
+def test_rolled_back_changes_keep_the_version(engine, linked_person):
+    before = versions(engine, 'person')
+    with engine.connect() as connection:
+        connection.execute(text("UPDATE person SET comment = 'rolled back' WHERE id = :id"),
+                           {'id': linked_person['person']})
+        connection.rollback()
+    assert versions(engine, 'person') == before
+
+
+def test_writers_of_several_tables_do_not_wait_for_each_other(engine, linked_person):
+    before = versions(engine, 'person', 'organization')
+    first, second = engine.connect(), engine.connect()
+    try:
+        for connection in (first, second):
+            # Fails instead of hanging if a statement waits for the other transaction
+            connection.execute(text("SET lock_timeout = '2s'"))
+        first_person, second_person = linked_person['colleagues'][:2]
+        first_org, second_org = linked_person['org'][:2]
+        first.execute(text("UPDATE person SET comment = 'first' WHERE id = :id"), {'id': first_person})
+        second.execute(text("UPDATE organization SET comment = 'second' WHERE id = :id"), {'id': second_org})
+        first.execute(text("UPDATE organization SET comment = 'first' WHERE id = :id"), {'id': first_org})
+        second.execute(text("UPDATE person SET comment = 'second' WHERE id = :id"), {'id': second_person})
+        first.commit()
+        second.commit()
+    finally:
+        first.close()
+        second.close()
+    expected = {'person': before['person'] + 2, 'organization': before['organization'] + 2}
+    assert versions(engine, 'person', 'organization') == expected
+
+
+class MissingTableEngine:
+    """Engine whose queries fail as if table_version did not exist, counting the attempts."""
+
+    def __init__(self):
+        self.attempts = 0
+
+    def connect(self):
+        self.attempts += 1
+        raise ProgrammingError('SELECT ... FROM table_version', {},
+                               Exception('relation "table_version" does not exist'))
+
+
+@pytest.fixture
+def missing_table(monkeypatch):
+    import main
+    engine = MissingTableEngine()
+    monkeypatch.setattr(main, '_table_version_missing', False)
+    monkeypatch.setattr(main, 'get_engine', lambda: engine)
+    return engine
+
+
+def test_missing_table_version_is_reported_once(missing_table, capsys):
+    import main
+    for _ in range(3):
+        assert main.table_versions(('person',)) is None
+    assert missing_table.attempts == 1
+    assert capsys.readouterr().out.count('WARNING: table_version is missing') == 1
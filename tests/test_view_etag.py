@@ -0,0 +1,44 @@
+import os
+from sqlalchemy import text
+from helper.storage.thumbnails import derivative_name
+from helper.storage.uploads import stored_path
+
+PHOTO = 'ab' * 32 + '.jpg'
+
+
+def etag(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return response.headers['ETag']
+
+
+def update(engine, table, record_id):
+    with engine.begin() as connection:
+        connection.execute(text(f'UPDATE {table} SET name = name WHERE id = :id'), {'id': record_id})
+
+
+def test_view_etag_follows_the_tables_the_page_shows(client, engine, linked_person):
+    url = f'/view?type=doc&id={linked_person["doc"][0]}'
+    first = etag(client, url)
+    # Organizations and fields of study are not shown on document pages
+    update(engine, 'organization', linked_person['org'][0])
+    update(engine, 'field_of_study', linked_person['field_of_study'][0])
+    assert client.get(url, headers={'If-None-Match': first}).status_code == 304
+    # Authors are
+    update(engine, 'person', linked_person['colleagues'][0])
+    assert etag(client, url) != first
+
+
+def test_person_etag_changes_when_the_thumbnails_are_written(client, engine, linked_person, tmp_path, monkeypatch):
+    import main
+    monkeypatch.setattr(main, 'UPLOAD_FOLDER', str(tmp_path))
+    with engine.begin() as connection:
+        connection.execute(text('UPDATE person SET photo = :photo WHERE id = :id'),
+                           {'photo': PHOTO, 'id': linked_person['person']})
+    url = f'/view?type=person&id={linked_person["person"]}'
+    first = etag(client, url)
+    assert client.get(url, headers={'If-None-Match': first}).status_code == 304
+    derivative = stored_path(derivative_name(PHOTO, main.THUMBNAIL_WIDTHS[0], 'jpg'), str(tmp_path))
+    os.makedirs(os.path.dirname(derivative))
+    open(derivative, 'wb').close()
+    assert etag(client, url) != first